@@ -1,197 +1,286 @@
-from google import genai
-import glob
-import numpy as np
-from datascience import *
-import re
-import pandas as pd
 from helper_functions import *
-import json
-from datetime import datetime, timedelta
+from catalog import CATALOG_CSV, load_catalog
+from solver import solve_meal_plan, format_meal_plan
+from macro_index import load_macro_index
+from llm_cache import GEMINI_MODEL, stream_text
+from gemini_client import get_client
+from llm_transport import LLMUnavailableError
+from week_planner import WEEK_DAYS, plan_week
+from hydration import as_entries, to_runs, format_schedule, format_time, format_amount
+from schedule_store import DEFAULT_USER, get_schedule_store, next_date, upcoming_range
+from prompt_builder import build_meal_plan_prompt, get_prompt_builder
+from knowledge_index import get_knowledge_index, plan_query
+from tracing import span, traced
+from name_index import load_name_index
+from plan_check import check_plan, format_check
+from plan_parser import parse_plan
+from plan_session import DELTA_PASSAGES, PlanSession
+from datetime import date
+import time
 
+# --- Planning pipeline ---
+#
+# Importing this module has no side effects: nothing is read, prompted for
+# or sent until a function is called. pandas is only imported by the catalog
+# when a food frame is built, and google.genai only when get_client() is
+# first called, so the Kivy app and scripts can import the planning logic
+# cheaply. Reference documents in txts/ are never read whole; prompts get
+# the top passages from knowledge_index. Plans that come back from Gemini
+# are re-totalled against the catalog (plan_check) before they are shown as
+# final. The interactive CLI lives in main() below.
 
+_macro_index = None
+_name_index = None
 
 
-def save_to_weekly(day_name, meal_plan, water_schedule, calorie_intake, macros):
-    """Save the current plan to the weekly schedule"""
-    weekly_schedule[day_name] = {
+def get_macro_index(csv_path=CATALOG_CSV):
+    """Catalog-backed macro ratio index, built or refreshed on first use"""
+    global _macro_index
+    if _macro_index is None:
+        with span("catalog.load"):
+            _macro_index = load_macro_index(load_catalog(csv_path))
+    return _macro_index
+
+
+def get_name_index(csv_path=CATALOG_CSV):
+    """Food name -> catalog row lookups, over the same catalog as get_macro_index()"""
+    global _name_index
+    if _name_index is None:
+        _name_index = load_name_index(get_macro_index(csv_path).catalog)
+    return _name_index
+
+
+@traced()
+def verify_plan(plan, calorie_intake, macros):
+    """check_plan() of a parsed LLM plan against the catalog and the targets"""
+    return check_plan(plan, calorie_intake, macros, get_name_index())
+
+def plan_entry(meal_plan, water_schedule, calorie_intake, macros):
+    return {
         "meal_plan": meal_plan,
-        "water_schedule": water_schedule.tolist() if isinstance(water_schedule, np.ndarray) else water_schedule,
+        "water_schedule": to_runs(as_entries(water_schedule)),
         "calorie_intake": calorie_intake,
         "macros": macros
     }
-    
-    # Save to file
-    with open("weekly_schedule.json", "w") as f:
-        json.dump(weekly_schedule, f, indent=2)
-
-def load_weekly_schedule():
-    """Load existing weekly schedule from file"""
-    try:
-        with open("weekly_schedule.json", "r") as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
-
-weekly_schedule = make_array()
-weekly_schedule = load_weekly_schedule()
-profile = make_array();
-
-
-client = genai.Client(api_key="YOUR_API_KEY")
-
-txt_folder = "txts/"
-txt_files = glob.glob(txt_folder + "*.txt")
-combined_context = "".join(f"\n---\nContent from {txt}:\n{extract_text_from_txt(txt)}" for txt in txt_files)
-
-profile = get_user_profile()
-
-while True:
-    try:
-        exercise_minutes = float(input("Enter how many minutes you exercise each day: "))
-        if exercise_minutes < 0:
-            raise ValueError
-        break
-    except ValueError:
-        print("Please enter a valid number for exercise minutes.")
-
-water_schedule = get_water_schedule(get_water_sum(profile["weight"], exercise_minutes))
-activity_multiplier = get_activity_multiplier()
-calorie_intake = get_hb_BMR(profile, activity_multiplier)
-calorie_intake, goal = adjust_for_goal(calorie_intake)
-macros = get_macros(calorie_intake)
-
-print(f"\n🎯 Based on your goal to *{goal}*, here’s your adjusted intake:")
-print("✅ Your Recommended Daily Calorie Intake:", calorie_intake)
-print("✅ Your Recommended Daily Macronutrient Intake:")
-for key, value in macros.items():
-    print(f"{key}: {value}")
-print("\n✅ Your Recommended Water Intake Schedule:")
-print(water_schedule)
-
-food_data = pd.read_csv("full_branded_food_macros.csv", low_memory=False)
-food_data = food_data[["food_name", "Protein (g)", "Carbs (g)", "Fat (g)"]].dropna()
-food_data.columns = ["Description", "Protein (g)", "Carbohydrates (g)", "Fats (g)"]
-food_data["Calories"] = (
-    food_data["Protein (g)"] * 4 +
-    food_data["Carbohydrates (g)"] * 4 +
-    food_data["Fats (g)"] * 9
-).round(0)
-
-sampled_food_data = food_data.sample(n=100, random_state=42)
-food_list = "".join(
-    f"{row['Description']}: {row['Protein (g)']}g protein, {row['Carbohydrates (g)']}g carbs, "
-    f"{row['Fats (g)']}g fats, {row['Calories']} kcal\n"
-    for _, row in sampled_food_data.iterrows()
-)
-
-initial_meal_prompt = (
-    f"Based on the following daily macronutrient goals:\n"
-    f"Calories: {calorie_intake}\n"
-    f"Protein (g): {macros['Protein (g)']}\n"
-    f"Carbohydrates (g): {macros['Carbohydrates (g)']}\n"
-    f"Fats (g): {macros['Fats (g)']}\n"
-    f"Create a full day's meal plan (breakfast, lunch, dinner, snacks) that matches these targets.\n"
-    f"Use these foods:\n{food_list}\n\n"
-    f"Respond in **this exact format below**. Do not use JSON or markdown. Do not include any explanations, introductions notes, or additional texts like proposed adjustments, or alternative food choices, nor **Notes** or *Okay, here is a meal plan designed to meet your macronutrient goals, using only the provided food items. Please note that due to the limitations of the food list, achieving the exact target values is very difficult. This is an approximation.*.\n"
-    "Meal Plan:\n"
-    "Breakfast:\n- [Food] - Xg protein, Yg carbs, Zg fat, N kcal\n"
-    "Lunch:\n- [Food] - Xg protein, Yg carbs, Zg fat, N kcal\n"
-    "Dinner:\n- [Food] - Xg protein, Yg carbs, Zg fat, N kcal\n"
-    "Snacks:\n- [Food] - Xg protein, Yg carbs, Zg fat, N kcal\n\n"
-    "Total Macros:\n"
-    "Protein: Xg\nCarbs: Yg\nFats: Zg\nCalories: N kcal"
-)
-
-initial_meal_response = client.models.generate_content(
-    model="gemini-2.0-flash",
-    contents=initial_meal_prompt
-)
-
-print("\n🍽️ Gemini's Initial Suggested Meal Plan:")
-print(initial_meal_response.text)
-
-if input("\nWould you like to make adjustments? (Yes/No): ").strip().upper() == "YES":
-    customization = True
-else:
-    customization = False
-
-while customization:
-    custom_changes = input("\nDescribe adjustments (e.g., 'increase protein', 'make vegetarian'): ")
-
-    full_prompt = (
-        f"Current calorie intake: {calorie_intake}\n"
-        f"Current macros: Protein {macros['Protein (g)']}g, Carbs {macros['Carbohydrates (g)']}g, Fats {macros['Fats (g)']}g\n"
-        f"Current water schedule: {str(water_schedule)}\n\n"
-        f"User request: {custom_changes}\n\n"
-        f"Here are some available foods:\n{food_list}\n\n"
-        "Respond in **this exact format below**. Do not use JSON or markdown. Do not include any explanations, introductions notes, or additional texts like proposed adjustments, or alternative food choices, nor **Notes** or *Okay, here is a meal plan designed to meet your macronutrient goals, using only the provided food items. Please note that due to the limitations of the food list, achieving the exact target values is very difficult. This is an approximation.*.\n"
-        "Strictly follow this structure and return only this:\n\n"
-        "Calories: [number]\n"
-        "Protein (g): [number]\n"
-        "Carbohydrates (g): [number]\n"
-        "Fats (g): [number]\n\n"
-        "Water:\n"
-        "HH:MM - XXml\n"
-        "...\n\n"
-        "Meal Plan:\n"
-        "Breakfast:\n- [Food] - Xg protein, Yg carbs, Zg fat, N kcal\n"
-        "Lunch:\n- [Food] - Xg protein, Yg carbs, Zg fat, N kcal\n"
-        "Dinner:\n- [Food] - Xg protein, Yg carbs, Zg fat, N kcal\n"
-        "Snacks:\n- [Food] - Xg protein, Yg carbs, Zg fat, N kcal\n\n"
-        "Total Macros:\n"
-        "Protein: Xg\nCarbs: Yg\nFats: Zg\nCalories: N kcal"
-    )
-
-    try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=full_prompt
+
+@traced("store.save_day")
+def save_to_weekly(day_name, meal_plan, water_schedule, calorie_intake, macros, user=DEFAULT_USER):
+    """Save the current plan for the next day_name (today included)"""
+    day = next_date(day_name)
+    get_schedule_store().save_day(day, plan_entry(meal_plan, water_schedule, calorie_intake, macros), user)
+    return day
+
+@traced("store.save_week")
+def save_week_to_weekly(day_plans, water_schedule, calorie_intake, macros, user=DEFAULT_USER):
+    """Save several days in a single transaction"""
+    entries = {
+        next_date(day_name): plan_entry(meal_plan, water_schedule, calorie_intake, macros)
+        for day_name, meal_plan in day_plans.items()
+    }
+    get_schedule_store().save_days(entries, user)
+    return sorted(entries)
+
+@traced()
+def initial_plan(calorie_intake, macros, macro_index, goal=None):
+    """Prompt foods and local solution for a set of targets"""
+    with span("macro_query"):
+        # Foods whose protein/carb/fat split is close to (and spread around) the targets
+        prompt_food_data = macro_index.query_frame(macros, k=100)
+        # Solve locally first; only fall back to Gemini when the targets can't be met
+        solver_food_data = macro_index.query_frame(macros, k=1000)
+    with span("knowledge.search"):
+        passages = get_knowledge_index().passages(plan_query(macros, goal))
+    with span("prompt.build"):
+        prompt = build_meal_plan_prompt(calorie_intake, macros, prompt_food_data, passages=passages)
+    with span("solve") as solve_span:
+        local_plan = solve_meal_plan(solver_food_data, calorie_intake, macros)
+        solve_span.set(within_tolerance=local_plan["within_tolerance"])
+    return {
+        "prompt_food_data": prompt_food_data,
+        "prompt": prompt,
+        "solver_food_data": solver_food_data,
+        "local_plan": local_plan,
+    }
+
+@traced()
+def build_week_prompts(calorie_intake, macros, macro_index, goal=None):
+    """A different slice of the best-matching foods for each day"""
+    week_food_data = macro_index.query_frame(macros, k=300)
+    passages = get_knowledge_index().passages(plan_query(macros, goal))
+    return {
+        day_name: build_meal_plan_prompt(
+            calorie_intake,
+            macros,
+            week_food_data.sample(n=min(100, len(week_food_data)), random_state=i),
+            day_name,
+            passages
         )
+        for i, day_name in enumerate(WEEK_DAYS)
+    }
+
+@traced()
+def stream_to_terminal(client, prompt, calorie_intake, macros, water_schedule):
+    """Print the reply as it streams in; sections are parsed as soon as they complete"""
+    parser = IncrementalPlanParser(calorie_intake, macros, water_schedule)
+    for chunk in stream_text(client, prompt, model=GEMINI_MODEL):
+        print(chunk, end="", flush=True)
+        parser.feed(chunk)
+    print()
+    get_prompt_builder().record_reply(parser.text)
+    return parser
 
-        updated_text = response.text
-        calorie_intake, macros = parse_updated_values(updated_text, calorie_intake, macros)
-        water_schedule = parse_updated_water_schedule(updated_text, water_schedule)
-
-        print("\n✅ Updated Water Intake Schedule:")
-        print(water_schedule)
-        print("\n✅ Updated Calorie Intake:", calorie_intake)
-        print("✅ Updated Macronutrient Breakdown:")
-        for key, value in macros.items():
-            print(f"{key}: {value}")
-
-        print("\n🍽️ Gemini's Updated Meal Plan:")
-        print(updated_text)
-
-    except Exception as e:
-        print("⚠️ Error generating updated meal plan:", str(e))
-
-    if input("\nWould you like to make further adjustments? (Yes/No): ").strip().upper() != "YES":
-        customization = False
-
-current_day = datetime.now().strftime("%A")  # Or let user choose
-save_option = input(f"\nWould you like to save this plan for {current_day}? (Yes/No): ").strip().upper()
-if save_option == "YES":
-    save_to_weekly(
-        current_day,
-        initial_meal_response.text if not customization else updated_text,
-        water_schedule,
-        calorie_intake,
-        macros
-    )
-    print(f"✅ Plan saved for {current_day}!")
-
-# Add meal plan to weekly schedule
-if input("\nWould you like to view your weekly schedule? (Yes/No): ").strip().upper() == "YES":
+def print_weekly_schedule(weekly_schedule):
     print("\n📅 Weekly Schedule:")
     for day, plan in weekly_schedule.items():
-        print(f"\n--- {day} ---")
+        print(f"\n--- {day:%A} {day.isoformat()} ---")
         print("Water Schedule:")
-        if isinstance(plan["water_schedule"], list):
-            for i in range(0, len(plan["water_schedule"]), 2):
-                print(f"{plan['water_schedule'][i]}: {plan['water_schedule'][i+1]}")
-        else:
-            print(plan["water_schedule"])
+        for minute, ml in as_entries(plan["water_schedule"]).tolist():
+            print(f"{format_time(minute)}: {format_amount(ml)}")
         print(f"\nCalories: {plan['calorie_intake']}")
         print("Macros:", plan["macros"])
         print("\nMeal Plan:")
         print(plan["meal_plan"])
+
+def ask_exercise_minutes():
+    while True:
+        try:
+            exercise_minutes = float(input("Enter how many minutes you exercise each day: "))
+            if exercise_minutes < 0:
+                raise ValueError
+            return exercise_minutes
+        except ValueError:
+            print("Please enter a valid number for exercise minutes.")
+
+def ask_yes(question):
+    return input(question).strip().upper() == "YES"
+
+
+# --- CLI ---
+def main():
+    client = get_client()
+    profile = get_user_profile()
+    exercise_minutes = ask_exercise_minutes()
+
+    water_schedule = get_water_schedule(get_water_sum(profile["weight"], exercise_minutes), exercise_minutes)
+    activity_multiplier = get_activity_multiplier()
+    calorie_intake = get_hb_BMR(profile, activity_multiplier)
+    calorie_intake, goal = adjust_for_goal(calorie_intake)
+    macros = get_macros(calorie_intake)
+
+    print(f"\n🎯 Based on your goal to *{goal}*, here’s your adjusted intake:")
+    print("✅ Your Recommended Daily Calorie Intake:", calorie_intake)
+    print("✅ Your Recommended Daily Macronutrient Intake:")
+    for key, value in macros.items():
+        print(f"{key}: {value}")
+    print("\n✅ Your Recommended Water Intake Schedule:")
+    print(format_schedule(water_schedule, separator="\n"))
+
+    macro_index = get_macro_index()
+    # Loaded up front: checking a reply must not wait on a search index build
+    name_index = get_name_index()
+    plan = initial_plan(calorie_intake, macros, macro_index, goal)
+    local_plan = plan["local_plan"]
+
+    if local_plan["within_tolerance"]:
+        meal_plan_text = format_meal_plan(local_plan)
+        print("\n🍽️ Your Locally Optimized Meal Plan:")
+        print(meal_plan_text)
+    else:
+        print("\n🍽️ Gemini's Initial Suggested Meal Plan:")
+        try:
+            parser = stream_to_terminal(client, plan["prompt"], calorie_intake, macros, water_schedule)
+            meal_plan_text = parser.text
+            print("\n" + format_check(verify_plan(parser.plan, calorie_intake, macros)))
+        except Exception as e:
+            # Unavailable, or refused outright (e.g. a bad API key): either way there is a local plan
+            print(f"⚠️ Gemini unavailable ({e}); using the closest local plan instead.")
+            meal_plan_text = format_meal_plan(local_plan)
+            print(meal_plan_text)
+
+    # Later rounds work on the structured plan: simple requests are solved
+    # locally, the rest go to Gemini as a delta against the current plan
+    session = PlanSession(calorie_intake, macros, water_schedule, macro_index,
+                          plan["prompt_food_data"], plan["solver_food_data"], name_index=name_index)
+    session.load(meal_plan_text)
+    customization = ask_yes("\nWould you like to make adjustments? (Yes/No): ")
+
+    while customization:
+        custom_changes = input("\nDescribe adjustments (e.g., 'increase protein', 'make vegetarian'): ")
+
+        try:
+            with span("adjustment.local"):
+                change = session.apply_local(custom_changes)
+            if change is not None:
+                print(f"\n🍽️ Updated Meal Plan ({change}, solved locally):")
+                print(session.text())
+            else:
+                with span("adjustment.prompt"):
+                    passages = get_knowledge_index().passages(plan_query(session.macros, goal, custom_changes),
+                                                              top_k=DELTA_PASSAGES)
+                    delta_prompt = session.delta_prompt(custom_changes, passages)
+                print("\n🍽️ Gemini's Changes:")
+                parser = stream_to_terminal(client, delta_prompt, session.calorie_intake, session.macros,
+                                            session.water_schedule)
+                session.apply_reply(parser.text)
+                print("\n🍽️ Updated Meal Plan:")
+                print(session.text())
+                print(format_check(verify_plan(parse_plan(session.text()), session.calorie_intake, session.macros)))
+            meal_plan_text = session.text()
+            calorie_intake, macros, water_schedule = session.calorie_intake, session.macros, session.water_schedule
+
+            print("\n✅ Updated Water Intake Schedule:")
+            print(format_schedule(water_schedule, separator="\n"))
+            print("\n✅ Updated Calorie Intake:", calorie_intake)
+            print("✅ Updated Macronutrient Breakdown:")
+            for key, value in macros.items():
+                print(f"{key}: {value}")
+
+        except LLMUnavailableError as e:
+            print(f"⚠️ Gemini unavailable ({e}); re-solving the plan locally instead.")
+            session.resolve()
+            meal_plan_text = session.text()
+            print(meal_plan_text)
+        except Exception as e:
+            print("⚠️ Error generating updated meal plan:", str(e))
+
+        customization = ask_yes("\nWould you like to make further adjustments? (Yes/No): ")
+
+    current_day = date.today().strftime("%A")  # Or let user choose
+    if ask_yes(f"\nWould you like to save this plan for {current_day}? (Yes/No): "):
+        save_to_weekly(current_day, meal_plan_text, water_schedule, calorie_intake, macros)
+        print(f"✅ Plan saved for {current_day}!")
+
+    if ask_yes("\nWould you like to generate plans for the whole week? (Yes/No): "):
+        day_prompts = build_week_prompts(calorie_intake, macros, macro_index, goal)
+        week_start = time.perf_counter()
+        with span("plan_week", days=len(day_prompts)):
+            week_results = plan_week(client, day_prompts)
+        print(f"\n⏱️ Week planned in {time.perf_counter() - week_start:.1f}s")
+        for day_name, result in week_results.items():
+            if result["error"] is None:
+                get_prompt_builder().record_reply(result["text"])
+                flags = verify_plan(parse_plan(result["text"]), calorie_intake, macros)["flags"]
+                status = f"⚠️ {flags[0]}{f' (+{len(flags) - 1} more)' if len(flags) > 1 else ''}" if flags else "✅"
+            else:
+                status = f"⚠️ {result['error']}"
+            print(f"{day_name}: {result['latency']:.2f}s {status}")
+        save_week_to_weekly(
+            {day_name: result["text"] for day_name, result in week_results.items() if result["error"] is None},
+            water_schedule,
+            calorie_intake,
+            macros
+        )
+
+    if ask_yes("\nWould you like to view your weekly schedule? (Yes/No): "):
+        with span("store.load_week"):
+            week = get_schedule_store().range(*upcoming_range())
+        print_weekly_schedule(week)
+
+    tokens = get_prompt_builder().stats()
+    print(f"\n🧮 Prompts this session: {tokens['prompts']}, ~{tokens['total_tokens']} tokens "
+          f"({tokens['prompt_tokens']} sent, {tokens['reply_tokens']} received); "
+          f"adjustments: {session.rounds['local']} local, {session.rounds['llm']} via Gemini")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+from catalog import CATALOG_CSV, FoodCatalog, load_catalog
+from macro_index import load_macro_index
+from solver import SOLVER_FOODS, solve_meal_plan, format_meal_plan
+from profiles import build_tasks, validate
+
+# --- Headless batch planning ---
+#
+# Plans a whole client roster without prompts:
+#
+#   python batch_plan.py clients.jsonl plans.jsonl --workers 8
+#
+# Input is JSONL or CSV with one profile per record (profiles.PROFILE_FIELDS; the
+# hour fields are optional). Targets and water schedules for every profile
+# are computed up front in a few vectorized calls; meal plans are then
+# solved on a process pool. The catalog store is refreshed once by the
+# parent and every worker memory-maps the same files, so the catalog is
+# loaded into memory once no matter how many workers there are.
+#
+# Results are appended to the output JSONL as they complete, in completion
+# order. Re-running with the same output file skips every profile already
+# planned there, so an interrupted run resumes where it stopped; profiles
+# that failed are tried again and their new result appended.
+
+PROGRESS_SECONDS = 2.0
+
+_macro_index = None
+
+
+def read_profiles(path):
+    """Profile dicts from a .jsonl or .csv file; ids default to the record number"""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            records = list(csv.DictReader(f))
+        else:
+            records = [json.loads(line) for line in f if line.strip()]
+    for number, record in enumerate(records, 1):
+        record.setdefault("id", str(number))
+        record["id"] = str(record["id"] or number)
+    return records
+
+
+def init_worker(cache_dir):
+    # The store is already fresh, so this only maps the parent's files
+    global _macro_index
+    _macro_index = load_macro_index(FoodCatalog(cache_dir))
+
+
+def plan_task(task):
+    """Worker: solve the meal plan for one task"""
+    try:
+        food_data = _macro_index.query_frame(task["macros"], k=SOLVER_FOODS)
+        plan = solve_meal_plan(food_data, task["calorie_intake"], task["macros"])
+        return dict(task, meal_plan=format_meal_plan(plan), totals=plan["totals"],
+                    within_tolerance=plan["within_tolerance"], error=None)
+    except Exception as e:
+        return dict(task, error=f"{type(e).__name__}: {e}")
+
+
+def completed_ids(output_path):
+    """Ids already planned in the output; a torn last line from a crash is cut off"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    good_bytes = 0
+    with open(output_path, "rb") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+                record_id = result["id"]
+            except (ValueError, KeyError, TypeError):
+                break
+            # Failed profiles are retried on the next run
+            if result.get("error") is None:
+                done.add(record_id)
+            good_bytes += len(line)
+    if good_bytes < os.path.getsize(output_path):
+        os.truncate(output_path, good_bytes)
+    return done
+
+
+class Progress:
+    def __init__(self, total, stream=sys.stderr, every=PROGRESS_SECONDS):
+        self.total = total
+        self.stream = stream
+        self.every = every
+        self.done = 0
+        self.failed = 0
+        self.start = time.perf_counter()
+        self.last = 0.0
+
+    def update(self, failed=False):
+        self.done += 1
+        self.failed += failed
+        now = time.perf_counter()
+        if now - self.last >= self.every or self.done == self.total:
+            self.last = now
+            rate = self.done / max(now - self.start, 1e-9)
+            eta = (self.total - self.done) / rate if rate else 0.0
+            self.stream.write(
+                f"\r{self.done}/{self.total} profiles ({self.failed} failed), "
+                f"{rate:.1f}/s, eta {eta:.0f}s" + ("\n" if self.done == self.total else "")
+            )
+            self.stream.flush()
+
+
+def run_batch(input_path, output_path, workers=None, csv_path=CATALOG_CSV, chunksize=4, progress=True):
+    """Plan every profile in input_path not already in output_path; returns (planned, failed, skipped)"""
+    records = read_profiles(input_path)
+    done = completed_ids(output_path)
+    pending = [record for record in records if record["id"] not in done]
+
+    profiles, failed = [], []
+    for record in pending:
+        try:
+            profiles.append(validate(record))
+        except ValueError as e:
+            failed.append({"id": record["id"], "error": str(e)})
+
+    # Refresh the catalog and index once, before the workers map them
+    catalog = load_catalog(csv_path)
+    load_macro_index(catalog)
+    tracker = Progress(len(pending)) if progress else None
+    counts = {"planned": 0, "failed": 0}
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        def write(result):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            counts["failed" if result["error"] else "planned"] += 1
+            if tracker:
+                tracker.update(failed=result["error"] is not None)
+
+        for result in failed:
+            write(result)
+        if profiles:
+            with Pool(workers, initializer=init_worker, initargs=(catalog.cache_dir,)) as pool:
+                for result in pool.imap_unordered(plan_task, build_tasks(profiles), chunksize=chunksize):
+                    write(result)
+
+    return counts["planned"], counts["failed"], len(records) - len(pending)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plan meals for every profile in a JSONL or CSV file")
+    parser.add_argument("input", help="profiles (.jsonl or .csv)")
+    parser.add_argument("output", help="results (.jsonl); existing results are kept and skipped")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--catalog", default=CATALOG_CSV, help="food catalog CSV")
+    parser.add_argument("--chunksize", type=int, default=4)
+    parser.add_argument("--quiet", action="store_true", help="no progress output")
+    args = parser.parse_args()
+
+    planned, failed, skipped = run_batch(args.input, args.output, args.workers, args.catalog, args.chunksize,
+                                         progress=not args.quiet)
+    print(f"{planned} planned, {failed} failed, {skipped} already done", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+import numpy as np
+
+# --- Pipeline benchmarks ---
+#
+# Times every stage of the planning pipeline on synthetic data, offline and
+# reproducibly (fixed seed, everything written to a temporary directory):
+#
+#   python benchmarks.py --output bench.json               # run and save results
+#   python benchmarks.py --save-baseline                   # record benchmark_baseline.json
+#   python benchmarks.py --check                           # compare; exit 1 on regressions
+#
+# Each stage reports the median and best of --repeat runs after one warm-up
+# run. Results are compared stage by stage with the baseline file; a stage
+# whose median is more than --threshold slower is reported as a regression.
+# Kivy screens are constructed in a separate interpreter (as in
+# startup_benchmark.py) so the window setup does not leak into the others.
+#
+# Water schedules are timed through hydration.hydration_schedule, not
+# helper_functions.get_water_schedule: the latter prompts for wake and sleep
+# times with input() and only wraps the former.
+#
+# benchmark_baseline.json is committed and records the machine it was taken
+# on (MACHINE_KEYS in its "meta"). Timings only compare on like hardware, so
+# --check warns when the current machine differs; re-record the baseline
+# with --save-baseline on the machine that runs the check (e.g. the CI
+# runner) and commit it.
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+DEFAULT_FOODS = 100_000
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.20
+HISTORY_DAYS = [7, 365, 3650]
+KNOWLEDGE_FILES = 100
+SEED = 0
+MACHINE_KEYS = ("machine", "processor", "cpus", "platform", "python", "numpy")
+
+SCREENS = ["DashboardScreen", "ScheduleScreen", "ChatScreen", "ProfileScreen"]
+WORDS = ("organic chicken breast rolled oats brown rice greek yogurt plain whole wheat bread almond butter "
+         "salmon fillet black beans sweet potato cheddar cheese skim milk peanut granola bar spinach tofu "
+         "lentils quinoa turkey banana apple blueberry protein shake cottage egg whites avocado pasta").split()
+KNOWLEDGE_WORDS = ("protein carbohydrate fat fiber vegetarian vegan bulk cut maintain hydration water electrolyte "
+                   "sodium sugar breakfast lunch dinner snack calorie deficit surplus muscle recovery sleep").split()
+
+SCREEN_PROBE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+from kivy.core.window import Window
+import screens
+results = {{}}
+for name in {screens!r}:
+    cls = getattr(screens, name)
+    cls(name="warmup")
+    runs = []
+    for i in range({repeat}):
+        start = time.perf_counter()
+        cls(name=f"bench{{i}}")
+        runs.append(time.perf_counter() - start)
+    results[name] = runs
+print(json.dumps(results))
+"""
+
+
+def write_catalog_csv(path, foods, rng):
+    """Synthetic catalog in the same column layout as full_branded_food_macros.csv"""
+    names = [" ".join(rng.choice(WORDS, size=rng.integers(2, 6))).upper() for _ in range(foods)]
+    protein = np.round(rng.uniform(0, 40, foods), 2)
+    carbs = np.round(rng.uniform(0, 80, foods), 2)
+    fat = np.round(rng.uniform(0, 35, foods), 2)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("fdc_id,food_name,Protein (g),Carbs (g),Fat (g)\n")
+        f.writelines(f'{i},"{name}",{p},{c},{t}\n' for i, (name, p, c, t) in enumerate(zip(names, protein, carbs, fat)))
+
+
+def write_knowledge(folder, files, rng):
+    os.makedirs(folder, exist_ok=True)
+    for i in range(files):
+        paragraphs = (" ".join(rng.choice(KNOWLEDGE_WORDS, size=rng.integers(20, 150))) for _ in range(8))
+        with open(os.path.join(folder, f"notes{i}.txt"), "w", encoding="utf-8") as f:
+            f.write("\n\n".join(paragraphs))
+
+
+def measure(fn, repeat, setup=None):
+    """Seconds per run of fn(setup()) (or fn()), after one warm-up run"""
+    runs = []
+    for i in range(repeat + 1):
+        state = setup() if setup else None
+        start = time.perf_counter()
+        fn(state) if setup else fn()
+        if i:
+            runs.append(time.perf_counter() - start)
+    return runs
+
+
+def summarize(runs):
+    runs = sorted(runs)
+    return {"median_ms": runs[len(runs) // 2] * 1000, "best_ms": runs[0] * 1000, "runs": len(runs)}
+
+
+def pipeline_stages(workdir, foods, rng):
+    """(name, fn, setup) for every in-process stage"""
+    import pandas as pd
+    from catalog import clean_food_frame, refresh_catalog, load_catalog, SOURCE_COLUMNS
+    from macro_index import load_macro_index
+    from solver import solve_meal_plan
+    from prompt_builder import PromptBuilder, format_food_list
+    from helper_functions import parse_updated_values, parse_updated_water_schedule, get_water_sum, get_macros
+    from hydration import hydration_schedule, hydration_batch
+    from nutrition_batch import make_profiles, compute_targets
+    from knowledge_index import KnowledgeIndex, plan_query
+    from schedule_store import ScheduleStore, upcoming_range
+    from stub_llm_server import CANNED_ADJUSTMENT, CANNED_MEAL_PLAN
+    from name_index import load_name_index
+    from plan_check import check_plan
+    from plan_parser import parse_plan
+    from plan_session import PlanSession
+    from solver import format_meal_plan
+
+    csv_path = os.path.join(workdir, "foods.csv")
+    write_catalog_csv(csv_path, foods, rng)
+    raw = pd.read_csv(csv_path, usecols=SOURCE_COLUMNS)
+    catalog = load_catalog(csv_path)
+    macro_index = load_macro_index(catalog)
+    name_index = load_name_index(catalog)
+
+    calorie_intake = 2400
+    macros = get_macros(calorie_intake)
+    prompt_foods = macro_index.query_frame(macros, k=100)
+    solver_foods = macro_index.query_frame(macros, k=1000)
+    water_schedule = hydration_schedule(get_water_sum(180, 45), 7 * 60, 23 * 60)
+    builder = PromptBuilder()
+    local_text = format_meal_plan(solve_meal_plan(solver_foods, calorie_intake, macros))
+
+    def session_adjust(request):
+        session = PlanSession(calorie_intake, macros, water_schedule, macro_index, prompt_foods, solver_foods, builder)
+        session.load(local_text)
+        return session.apply_local(request)
+
+    def session_delta():
+        session = PlanSession(calorie_intake, macros, water_schedule, macro_index, prompt_foods, solver_foods, builder)
+        session.load(local_text)
+        return session.delta_prompt("make it vegetarian", passages[:1])
+
+    knowledge_dir = os.path.join(workdir, "txts")
+    write_knowledge(knowledge_dir, KNOWLEDGE_FILES, rng)
+    knowledge = KnowledgeIndex(knowledge_dir, os.path.join(workdir, "knowledge.sqlite3"), refresh_seconds=3600)
+    knowledge.refresh()
+    passages = knowledge.passages(plan_query(macros, "cut", "make it vegetarian"))
+
+    cohort = 10_000
+    profiles = make_profiles(
+        rng.choice(["male", "female"], cohort), rng.uniform(110, 260, cohort), rng.uniform(150, 200, cohort),
+        rng.integers(18, 70, cohort), rng.integers(1, 6, cohort), rng.integers(1, 4, cohort),
+        rng.choice([0, 30, 60], cohort),
+    )
+
+    def fresh_cache_dir():
+        cache_dir = os.path.join(workdir, "cold.catalog")
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        return cache_dir
+
+    stages = [
+        ("catalog_build", lambda cache_dir: refresh_catalog(csv_path, cache_dir), fresh_cache_dir),
+        ("catalog_load", lambda: load_catalog(csv_path), None),
+        ("calories_derivation", lambda: clean_food_frame(raw), None),
+        ("sample_food_list", lambda: format_food_list(catalog.sample(100, random_state=SEED)), None),
+        ("macro_query", lambda: macro_index.query_frame(macros, k=1000), None),
+        ("solve_meal_plan", lambda: solve_meal_plan(solver_foods, calorie_intake, macros), None),
+        ("prompt_meal_plan", lambda: builder.meal_plan(calorie_intake, macros, prompt_foods, passages=passages), None),
+        ("prompt_adjustment", lambda: builder.adjustment(calorie_intake, macros, water_schedule, "more protein",
+                                                         prompt_foods, passages), None),
+        ("prompt_delta", session_delta, None),
+        ("session_increase_protein", lambda: session_adjust("increase protein"), None),
+        ("session_swap_dinner", lambda: session_adjust("swap dinner"), None),
+        ("knowledge_search", lambda: knowledge.search(plan_query(macros, "cut", "make it vegetarian")), None),
+        ("parse_updated_values", lambda: parse_updated_values(CANNED_ADJUSTMENT, calorie_intake, macros), None),
+        ("parse_updated_water_schedule", lambda: parse_updated_water_schedule(CANNED_ADJUSTMENT, water_schedule),
+         None),
+        ("parse_meal_plan_x100", lambda: [parse_updated_values(CANNED_MEAL_PLAN, calorie_intake, macros)
+                                          for _ in range(100)], None),
+        ("plan_check", lambda: check_plan(parse_plan(CANNED_MEAL_PLAN), calorie_intake, macros, name_index), None),
+        ("water_schedule", lambda: hydration_schedule(get_water_sum(180, 45), 7 * 60, 23 * 60,
+                                                      workout_start=17 * 60, workout_minutes=45), None),
+        ("water_schedule_batch_10k", lambda: hydration_batch(compute_targets(profiles)["water_ml"], 420, 1380), None),
+        ("targets_batch_10k", lambda: compute_targets(profiles), None),
+    ]
+
+    entry = {"meal_plan": CANNED_MEAL_PLAN, "water_schedule": water_schedule, "calorie_intake": calorie_intake,
+             "macros": macros}
+    today = date.today()
+    for days in HISTORY_DAYS:
+        store = ScheduleStore(os.path.join(workdir, f"history{days}.sqlite3"), os.path.join(workdir, "none.json"))
+        store.save_days({today - timedelta(days=i): entry for i in range(days)})
+        stages += [
+            (f"save_day_history_{days}", lambda store=store: store.save_day(today, entry), None),
+            (f"load_week_history_{days}", lambda store=store: store.range(*upcoming_range(today)), None),
+        ]
+    return stages
+
+
+def screen_stages(repeat):
+    """{screen: [seconds, ...]} from a fresh interpreter, or {"error": message}"""
+    env = dict(os.environ, KIVY_NO_ARGS="1", KIVY_NO_CONSOLELOG="1")
+    root = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(
+        [sys.executable, "-c", SCREEN_PROBE.format(root=root, screens=SCREENS, repeat=repeat)],
+        cwd=root, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        return {"error": lines[-1] if lines else "screen probe failed"}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run(foods=DEFAULT_FOODS, repeat=DEFAULT_REPEAT, only=None, screens=True, seed=SEED):
+    rng = np.random.default_rng(seed)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "processor": platform.processor() or platform.machine(),
+            "cpus": os.cpu_count(),
+            "foods": foods,
+            "repeat": repeat,
+            "seed": seed,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "stages": {},
+    }
+    workdir = tempfile.mkdtemp(prefix="nutriai-bench-")
+    try:
+        for name, fn, setup in pipeline_stages(workdir, foods, rng):
+            if only and name not in only:
+                continue
+            report["stages"][name] = summarize(measure(fn, repeat, setup))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if screens:
+        for name, runs in screen_stages(repeat).items():
+            if name == "error":
+                report["meta"]["screen_error"] = runs
+            elif not only or f"screen_{name}" in only:
+                report["stages"][f"screen_{name}"] = summarize(runs)
+    return report
+
+
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD):
+    """{stage: comparison} of report against baseline medians"""
+    comparison = {}
+    for name, result in report["stages"].items():
+        before = baseline["stages"].get(name)
+        if before is None:
+            comparison[name] = {"status": "new", "median_ms": result["median_ms"]}
+            continue
+        ratio = result["median_ms"] / max(before["median_ms"], 1e-9)
+        status = "slower" if ratio > 1 + threshold else "faster" if ratio < 1 / (1 + threshold) else "same"
+        comparison[name] = {"status": status, "median_ms": result["median_ms"],
+                            "baseline_ms": before["median_ms"], "ratio": ratio}
+    for name in baseline["stages"]:
+        if name not in report["stages"]:
+            comparison[name] = {"status": "missing", "baseline_ms": baseline["stages"][name]["median_ms"]}
+    return comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the NutriAI pipeline on synthetic data")
+    parser.add_argument("stages", nargs="*", help="only run these stages (default: all)")
+    parser.add_argument("--foods", type=int, default=DEFAULT_FOODS, help="synthetic catalog size")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--no-screens", action="store_true", help="skip the Kivy screen stages")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline results to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 if any stage regressed")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="slowdown ratio that counts as a regression (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    report = run(args.foods, args.repeat, set(args.stages) or None, not args.no_screens)
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        report["comparison"] = compare(report, baseline, args.threshold)
+        differs = [key for key in MACHINE_KEYS if baseline["meta"].get(key) != report["meta"][key]]
+        if differs:
+            print(f"note: baseline was recorded with a different {', '.join(differs)}; "
+                  f"timings may not be comparable")
+
+    for path in filter(None, [args.output, args.baseline if args.save_baseline else None]):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if "screen_error" in report["meta"]:
+        print(f"screens skipped: {report['meta']['screen_error']}")
+    for name, result in report["stages"].items():
+        line = f"{name:30} {result['median_ms']:10.2f} ms median {result['best_ms']:10.2f} ms best"
+        if baseline is not None:
+            comparison = report["comparison"][name]
+            if "ratio" in comparison:
+                line += f"  {comparison['ratio']:5.2f}x baseline ({comparison['status']})"
+            else:
+                line += f"  ({comparison['status']})"
+        print(line)
+
+    regressions = [name for name, c in report.get("comparison", {}).items() if c["status"] == "slower"]
+    if regressions:
+        print(f"\n{len(regressions)} stage(s) slower than the baseline: {', '.join(regressions)}")
+    if args.check and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
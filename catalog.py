@@ -0,0 +1,362 @@
+import json
+import os
+import shutil
+import numpy as np
+
+# --- Food catalog cache ---
+#
+# The branded-foods CSV is ingested into a small columnar store next to it:
+#   macros.f32   float32 (rows, 4): protein, carbs, fats, calories
+#   offsets.i64  int64 (rows + 1): byte offsets into names.bin
+#   names.bin    utf-8 descriptions, back to back
+#   hashes.u64   uint64 per row: hash of the name plus macros
+#   keys.u64     uint64 per row: hash of the name alone
+#   live.u8      uint8 per row: 0 once the row has been deleted
+#   meta.json    row counts plus the size/mtime of the CSV it was built from
+# Later runs memory-map the arrays, so loading costs milliseconds and the
+# pages are shared between processes. meta.json is written last and acts as
+# the commit marker: a missing or stale meta.json means "re-ingest".
+#
+# Ingest streams the CSV in fixed-size chunks. Rows whose hash is already in
+# the store are only marked as seen; new rows are appended; stored rows that
+# were not seen are deleted, or overwritten in place when a new row carries
+# the same name (an update). Refreshing a mostly unchanged file therefore
+# costs one sequential scan and a handful of writes.
+
+CATALOG_CSV = "full_branded_food_macros.csv"
+CATALOG_VERSION = 2
+CHUNK_ROWS = 200_000
+# Rewrite the store once this fraction of its rows are tombstones
+COMPACT_RATIO = 0.25
+
+SOURCE_COLUMNS = ["food_name", "Protein (g)", "Carbs (g)", "Fat (g)"]
+COLUMNS = ["Description", "Protein (g)", "Carbohydrates (g)", "Fats (g)", "Calories"]
+MACRO_COLUMNS = COLUMNS[1:]
+
+MACROS_FILE = "macros.f32"
+OFFSETS_FILE = "offsets.i64"
+NAMES_FILE = "names.bin"
+HASHES_FILE = "hashes.u64"
+KEYS_FILE = "keys.u64"
+LIVE_FILE = "live.u8"
+META_FILE = "meta.json"
+
+# Fixed-width per-row files: (name, dtype, values per row)
+ROW_FILES = [
+    (MACROS_FILE, np.float32, 4),
+    (HASHES_FILE, np.uint64, 1),
+    (KEYS_FILE, np.uint64, 1),
+    (LIVE_FILE, np.uint8, 1),
+]
+
+
+def catalog_dir(csv_path):
+    """Directory holding the store built from csv_path"""
+    root, _ = os.path.splitext(csv_path)
+    return root + ".catalog"
+
+
+def source_stamp(csv_path):
+    st = os.stat(csv_path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def read_meta(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, META_FILE), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def write_meta(cache_dir, meta):
+    tmp_path = os.path.join(cache_dir, META_FILE + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(cache_dir, META_FILE))
+
+
+def invalidate(cache_dir):
+    try:
+        os.remove(os.path.join(cache_dir, META_FILE))
+    except FileNotFoundError:
+        pass
+
+
+def clean_food_frame(food_data):
+    """Same cleaning backend.py always did: keep four columns, dropna, derive Calories"""
+    food_data = food_data[SOURCE_COLUMNS].dropna()
+    food_data.columns = COLUMNS[:4]
+    food_data["Calories"] = (
+        food_data["Protein (g)"] * 4 +
+        food_data["Carbohydrates (g)"] * 4 +
+        food_data["Fats (g)"] * 9
+    ).round(0)
+    return food_data
+
+
+def row_hashes(food_data):
+    """Content hash (name + macros) and key hash (name only) of cleaned rows"""
+    import pandas as pd
+
+    hashes = pd.util.hash_pandas_object(food_data[COLUMNS[:4]], index=False).to_numpy(np.uint64)
+    keys = pd.util.hash_pandas_object(food_data["Description"], index=False).to_numpy(np.uint64)
+    return hashes, keys
+
+
+def map_file(cache_dir, name, dtype, shape, mode="r"):
+    if not shape[0]:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(os.path.join(cache_dir, name), dtype=dtype, mode=mode, shape=shape)
+
+
+def map_rows(cache_dir, name, rows, mode="r"):
+    for file_name, dtype, width in ROW_FILES:
+        if file_name == name:
+            return map_file(cache_dir, name, dtype, (rows, width) if width > 1 else (rows,), mode)
+    raise KeyError(name)
+
+
+def reset_store(cache_dir):
+    os.makedirs(cache_dir, exist_ok=True)
+    invalidate(cache_dir)
+    for name, _, _ in ROW_FILES:
+        open(os.path.join(cache_dir, name), "wb").close()
+    open(os.path.join(cache_dir, NAMES_FILE), "wb").close()
+    np.zeros(1, dtype=np.int64).tofile(os.path.join(cache_dir, OFFSETS_FILE))
+
+
+class StoreAppender:
+    """Appends cleaned rows to the end of every store file"""
+
+    def __init__(self, cache_dir, rows):
+        self.rows = rows
+        with open(os.path.join(cache_dir, OFFSETS_FILE), "rb") as f:
+            f.seek(rows * 8)
+            self.blob_end = int(np.frombuffer(f.read(8), dtype=np.int64)[0])
+        self.files = {
+            name: open(os.path.join(cache_dir, name), "ab")
+            for name in [f for f, _, _ in ROW_FILES] + [OFFSETS_FILE, NAMES_FILE]
+        }
+
+    def append(self, food_data, hashes, keys):
+        if not len(food_data):
+            return
+        encoded = [name.encode("utf-8") for name in food_data["Description"].astype(str)]
+        ends = self.blob_end + np.cumsum([len(b) for b in encoded], dtype=np.int64)
+
+        self.files[MACROS_FILE].write(food_data[MACRO_COLUMNS].to_numpy(dtype=np.float32).tobytes())
+        self.files[HASHES_FILE].write(hashes.tobytes())
+        self.files[KEYS_FILE].write(keys.tobytes())
+        self.files[LIVE_FILE].write(np.ones(len(food_data), dtype=np.uint8).tobytes())
+        self.files[NAMES_FILE].write(b"".join(encoded))
+        self.files[OFFSETS_FILE].write(ends.tobytes())
+
+        self.rows += len(food_data)
+        self.blob_end = int(ends[-1])
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+
+def rewrite_tail(cache_dir, start, total, keep, chunk_rows=CHUNK_ROWS):
+    """Drop rows in [start, total) where keep is False, streaming through temp files"""
+    offsets = map_file(cache_dir, OFFSETS_FILE, np.int64, (total + 1,))
+    names = map_file(cache_dir, NAMES_FILE, np.uint8, (int(offsets[total]),))
+    blob_start = int(offsets[start])
+    blob_end = blob_start
+
+    tmp_files = {
+        name: open(os.path.join(cache_dir, name + ".tmp"), "wb")
+        for name in [f for f, _, _ in ROW_FILES] + [OFFSETS_FILE, NAMES_FILE]
+    }
+    columns = {name: map_rows(cache_dir, name, total) for name, _, _ in ROW_FILES}
+    for lo in range(start, total, chunk_rows):
+        hi = min(lo + chunk_rows, total)
+        rows = np.flatnonzero(keep[lo - start:hi - start]) + lo
+        if not len(rows):
+            continue
+        for name, column in columns.items():
+            tmp_files[name].write(np.ascontiguousarray(column[rows]).tobytes())
+        tmp_files[NAMES_FILE].write(b"".join(names[offsets[i]:offsets[i + 1]].tobytes() for i in rows))
+        ends = blob_end + np.cumsum(offsets[rows + 1] - offsets[rows])
+        tmp_files[OFFSETS_FILE].write(ends.tobytes())
+        blob_end = int(ends[-1])
+    for f in tmp_files.values():
+        f.close()
+    del offsets, names, columns
+
+    cut = {name: start * np.dtype(dtype).itemsize * width for name, dtype, width in ROW_FILES}
+    cut[OFFSETS_FILE] = (start + 1) * 8
+    cut[NAMES_FILE] = blob_start
+    for name, size in cut.items():
+        path = os.path.join(cache_dir, name)
+        os.truncate(path, size)
+        with open(path, "ab") as dst, open(path + ".tmp", "rb") as src:
+            shutil.copyfileobj(src, dst)
+        os.remove(path + ".tmp")
+
+
+def refresh_catalog(csv_path=CATALOG_CSV, cache_dir=None, chunk_rows=CHUNK_ROWS):
+    """Stream the CSV into the store, applying only inserts, updates and deletes"""
+    # Fails fast on a missing CSV, before paying for the pandas import
+    stamp = source_stamp(csv_path)
+    import pandas as pd
+
+    cache_dir = cache_dir or catalog_dir(csv_path)
+    meta = read_meta(cache_dir)
+    if meta is None or meta.get("version") != CATALOG_VERSION:
+        reset_store(cache_dir)
+        meta = {"rows": 0, "deleted": 0}
+    invalidate(cache_dir)
+    rows = meta["rows"]
+
+    # Sorted content hashes of the live rows, for membership lookups
+    live_rows = np.flatnonzero(map_rows(cache_dir, LIVE_FILE, rows))
+    stored_hashes = map_rows(cache_dir, HASHES_FILE, rows)[live_rows]
+    order = np.argsort(stored_hashes)
+    stored_hashes, live_rows = stored_hashes[order], live_rows[order]
+    seen = np.zeros(rows, dtype=bool)
+
+    appender = StoreAppender(cache_dir, rows)
+    try:
+        for chunk in pd.read_csv(csv_path, usecols=SOURCE_COLUMNS, chunksize=chunk_rows, low_memory=False):
+            chunk = clean_food_frame(chunk)
+            hashes, keys = row_hashes(chunk)
+            found = np.zeros(len(chunk), dtype=bool)
+            if len(stored_hashes):
+                pos = np.minimum(np.searchsorted(stored_hashes, hashes), len(stored_hashes) - 1)
+                found = stored_hashes[pos] == hashes
+                seen[live_rows[pos[found]]] = True
+            appender.append(chunk[~found], hashes[~found], keys[~found])
+    finally:
+        appender.close()
+    total = appender.rows
+
+    # New rows: drop repeats of the same name + macros
+    tail_hashes = np.fromfile(os.path.join(cache_dir, HASHES_FILE), dtype=np.uint64, offset=rows * 8)
+    tail_keys = np.fromfile(os.path.join(cache_dir, KEYS_FILE), dtype=np.uint64, offset=rows * 8)
+    keep = np.zeros(total - rows, dtype=bool)
+    keep[np.unique(tail_hashes, return_index=True)[1]] = True
+
+    # Stored rows that vanished from the CSV; a new row with the same name
+    # overwrites one of them in place instead of being appended
+    gone = live_rows[~seen[live_rows]]
+    candidates = np.flatnonzero(keep)
+    _, gone_idx, new_idx = np.intersect1d(
+        map_rows(cache_dir, KEYS_FILE, rows)[gone], tail_keys[candidates], return_indices=True
+    )
+    targets, sources = gone[gone_idx], rows + candidates[new_idx]
+    if len(targets):
+        for name in (MACROS_FILE, HASHES_FILE):
+            column = map_rows(cache_dir, name, total, mode="r+")
+            column[targets] = column[sources]
+            column.flush()
+        keep[candidates[new_idx]] = False
+    deletes = np.setdiff1d(gone, targets)
+    if len(deletes):
+        live = map_rows(cache_dir, LIVE_FILE, total, mode="r+")
+        live[deletes] = 0
+        live.flush()
+
+    if not keep.all():
+        rewrite_tail(cache_dir, rows, total, keep, chunk_rows)
+    stats = {
+        "inserted": int(keep.sum()),
+        "updated": int(len(targets)),
+        "deleted": int(len(deletes)),
+        "unchanged": int(seen.sum()),
+    }
+    total = rows + stats["inserted"]
+    deleted = meta["deleted"] + stats["deleted"]
+
+    if deleted > COMPACT_RATIO * total:
+        rewrite_tail(cache_dir, 0, total, map_rows(cache_dir, LIVE_FILE, total).astype(bool), chunk_rows)
+        total, deleted = total - deleted, 0
+
+    write_meta(cache_dir, {
+        "version": CATALOG_VERSION,
+        "rows": total,
+        "deleted": deleted,
+        "source": stamp,
+        "last_refresh": stats,
+    })
+    return stats
+
+
+def build_catalog(csv_path=CATALOG_CSV, cache_dir=None):
+    """Ingest the CSV into an empty store"""
+    cache_dir = cache_dir or catalog_dir(csv_path)
+    reset_store(cache_dir)
+    refresh_catalog(csv_path, cache_dir)
+    return FoodCatalog(cache_dir)
+
+
+def is_fresh(csv_path, cache_dir=None):
+    meta = read_meta(cache_dir or catalog_dir(csv_path))
+    return (
+        meta is not None
+        and meta.get("version") == CATALOG_VERSION
+        and meta.get("source") == source_stamp(csv_path)
+    )
+
+
+def load_catalog(csv_path=CATALOG_CSV, cache_dir=None):
+    """Memory-map the catalog store, refreshing it first if the CSV changed"""
+    cache_dir = cache_dir or catalog_dir(csv_path)
+    if not is_fresh(csv_path, cache_dir):
+        refresh_catalog(csv_path, cache_dir)
+    return FoodCatalog(cache_dir)
+
+
+class FoodCatalog:
+    """Read-only, memory-mapped view of the cleaned food catalog"""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.meta = read_meta(cache_dir)
+        rows = self.meta["rows"]
+        self.macros = map_rows(cache_dir, MACROS_FILE, rows)
+        self.offsets = map_file(cache_dir, OFFSETS_FILE, np.int64, (rows + 1,))
+        self.names = map_file(cache_dir, NAMES_FILE, np.uint8, (int(self.offsets[-1]),))
+        # Row ids that are still live; deleted rows keep their slot until compaction
+        if self.meta.get("deleted"):
+            self.rows = np.flatnonzero(map_rows(cache_dir, LIVE_FILE, rows))
+        else:
+            self.rows = np.arange(rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def description(self, i):
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.names[start:end].tobytes().decode("utf-8")
+
+    def descriptions(self, rows):
+        return [self.description(i) for i in rows]
+
+    def frame(self, rows=None):
+        """pandas DataFrame with the columns backend.py has always used"""
+        import pandas as pd
+
+        rows = self.rows if rows is None else np.asarray(rows)
+        food_data = pd.DataFrame(np.asarray(self.macros[rows], dtype=np.float64), columns=MACRO_COLUMNS, index=rows)
+        food_data.insert(0, "Description", self.descriptions(rows))
+        # float32 storage; round back to the precision of the source data
+        food_data[MACRO_COLUMNS[:3]] = food_data[MACRO_COLUMNS[:3]].round(2)
+        return food_data
+
+    def sample(self, n, random_state=None):
+        rng = np.random.default_rng(random_state)
+        rows = np.sort(rng.choice(self.rows, size=min(n, len(self)), replace=False))
+        return self.frame(rows)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    start = time.perf_counter()
+    stats = refresh_catalog(sys.argv[1] if len(sys.argv) > 1 else CATALOG_CSV)
+    print(f"Catalog refreshed in {time.perf_counter() - start:.2f}s: {stats}")
@@ -1,9 +1,26 @@
+import time
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.button import Button
 from kivy.uix.label import Label
 from kivy.graphics import Color, Ellipse, Rectangle, RoundedRectangle
 from kivy.metrics import dp
 from kivy.properties import NumericProperty
+from kivy.clock import Clock
+from kivy.core.text import Label as CoreLabel
+from kivy.metrics import sp
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
+
+CHAT_FONT_SIZE = sp(15)
+CHAT_MIN_ROW_HEIGHT = dp(40)
+CHAT_BOTTOM_SLACK = 0.01
+CHAT_HISTORY_LIMIT = 5000
+# Seconds of re-measuring per frame after a width change
+CHAT_REMEASURE_BUDGET = 0.004
+DAY_TITLE_HEIGHT = dp(30)
+DAY_ROW_HEIGHT = dp(25)
+DAY_CARD_PADDING = dp(10)
 
 class ProfileIconButton(Button):
     def __init__(self, **kwargs):
@@ -129,3 +146,225 @@ class NavBar(BoxLayout):
         for name, btn in buttons.items():
             btn.background_color = (0.2, 0.6, 0.8, 1) if name == current_screen else (0, 0, 0, 0)
             btn.color = (1, 1, 1, 1) if name == current_screen else (0.2, 0.2, 0.2, 1)
+
+
+def wrapped_lines(paragraph, per_line):
+    """Lines a paragraph takes when greedily word-wrapped at per_line characters"""
+    lines, used = 1, 0
+    for word in paragraph.split(" "):
+        if used and used + 1 + len(word) > per_line:
+            lines, used = lines + 1, 0
+        used += len(word) + (1 if used else 0)
+        while used > per_line:
+            lines, used = lines + 1, used - per_line
+    return lines
+
+
+class ChatRow(Label):
+    """Recycled view for one chat message; all its state comes from the data dict"""
+    min_height = NumericProperty(0)
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.size_hint_y = None
+        self.valign = 'top'
+        self.font_size = CHAT_FONT_SIZE
+
+
+class ChatHistoryView(RecycleView):
+    """Chat history backed by a list of dicts; only visible rows get widgets"""
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.padding_x = dp(15)
+        layout = RecycleBoxLayout(
+            orientation='vertical',
+            size_hint_y=None,
+            default_size_hint=(1, None),
+            spacing=dp(10),
+            padding=[self.padding_x, dp(15)])
+        layout.bind(minimum_height=layout.setter('height'))
+        self.add_widget(layout)
+        # viewclass is stored on the layout manager, so set it once attached
+        self.viewclass = ChatRow
+        self.measured_width = None
+        # Message ids stay valid when the oldest rows are trimmed
+        self.first_id = 0
+        # Streamed updates are coalesced: one re-measure per message per frame
+        self.pending = {}
+        self._flush_trigger = Clock.create_trigger(self._flush_updates)
+        # Rows [0, stale_rows) still carry heights measured at an older width
+        self.stale_rows = 0
+        self._remeasure_trigger = Clock.create_trigger(self._remeasure_rows)
+        # (unwrapped label, line height, padding) for height estimates
+        self.text_metrics = None
+        self.bind(width=self._remeasure)
+    
+    def _text_width(self):
+        return max(self.width - 2 * self.padding_x, dp(50))
+    
+    def _measure(self, text, width, halign='left'):
+        label = CoreLabel(text=text or ' ', font_size=CHAT_FONT_SIZE, text_size=(width, None), halign=halign)
+        label.refresh()
+        return label.texture.size[1]
+    
+    def _estimate(self, text, width):
+        """Height of text from its unwrapped extents and a greedy word wrap; no rendering"""
+        if self.text_metrics is None:
+            one_line = self._measure("X", width)
+            line_height = self._measure("X\nX", width) - one_line
+            self.text_metrics = (CoreLabel(font_size=CHAT_FONT_SIZE), line_height, one_line - line_height)
+        label, line_height, padding = self.text_metrics
+        lines = 0
+        for paragraph in text.split("\n"):
+            char_width = label.get_extents(paragraph)[0] / len(paragraph) if paragraph else 1
+            lines += wrapped_lines(paragraph, max(1, int(width / char_width)))
+        return lines * line_height + padding
+    
+    def _row(self, text, halign, min_height, color, streaming=False):
+        # Text height is measured once here, not on every relayout; a message
+        # still streaming gets an estimate until its final update
+        width = self._text_width()
+        height = self._estimate(text, width) if streaming else self._measure(text, width, halign)
+        return {
+            'text': text,
+            'halign': halign,
+            'color': color,
+            'text_size': (width, None),
+            'height': max(min_height, height),
+            'min_height': min_height,
+        }
+    
+    def add_message(self, text, halign='left', min_height=CHAT_MIN_ROW_HEIGHT, color=(0.2, 0.2, 0.2, 1)):
+        """Append a message and return its id for later updates"""
+        if len(self.data) >= CHAT_HISTORY_LIMIT:
+            trimmed = len(self.data) - CHAT_HISTORY_LIMIT + 1
+            del self.data[:trimmed]
+            self.first_id += trimmed
+            self.stale_rows = max(0, self.stale_rows - trimmed)
+        self.data.append(self._row(text, halign, min_height, color))
+        Clock.schedule_once(self.scroll_to_bottom)
+        return self.first_id + len(self.data) - 1
+    
+    def message_text(self, message_id):
+        if message_id in self.pending:
+            return self.pending[message_id][0]
+        index = message_id - self.first_id
+        return self.data[index]['text'] if index >= 0 else ''
+    
+    def update_message(self, message_id, text, streaming=False):
+        """Replace a message's text on the next frame (later updates win); streaming ones aren't measured"""
+        if message_id < self.first_id:
+            return  # Already trimmed from the history
+        self.pending[message_id] = (text, streaming)
+        self._flush_trigger()
+    
+    def _flush_updates(self, *args):
+        # Follow the reply only if the user hasn't scrolled up to read
+        follow = self.at_bottom()
+        pending, self.pending = self.pending, {}
+        for message_id, (text, streaming) in pending.items():
+            index = message_id - self.first_id
+            if index < 0:
+                continue
+            row = self.data[index]
+            self.data[index] = self._row(text, row['halign'], row['min_height'], row['color'], streaming)
+        if follow:
+            Clock.schedule_once(self.scroll_to_bottom)
+    
+    def at_bottom(self):
+        content = self.layout_manager
+        return content is None or content.height <= self.height or self.scroll_y <= CHAT_BOTTOM_SLACK
+    
+    def scroll_to_bottom(self, *args):
+        self.scroll_y = 0
+    
+    def _remeasure(self, instance, width):
+        # Only a width change invalidates the measured heights; re-measuring
+        # them all at once would stall a long history, so it is spread out
+        if self.measured_width == width:
+            return
+        self.measured_width = width
+        self.stale_rows = len(self.data)
+        self._remeasure_trigger()
+    
+    def _remeasure_rows(self, *args):
+        # Newest rows first (where the view usually is), as many per frame as the budget allows
+        end = start = self.stale_rows
+        rows = []
+        deadline = time.perf_counter() + CHAT_REMEASURE_BUDGET
+        while start and (not rows or time.perf_counter() < deadline):
+            start -= 1
+            row = self.data[start]
+            rows.append(self._row(row['text'], row['halign'], row['min_height'], row['color']))
+        self.data[start:end] = rows[::-1]
+        self.stale_rows = start
+        if start:
+            self._remeasure_trigger()
+
+
+class DayCard(RecycleDataViewBehavior, BoxLayout):
+    """Recycled view for one stored day; rows are reused between days"""
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.orientation = 'vertical'
+        self.spacing = dp(5)
+        self.padding = DAY_CARD_PADDING
+        self.title = Label(
+            size_hint_y=None,
+            height=DAY_TITLE_HEIGHT,
+            color=(0.2, 0.6, 0.8, 1),
+            bold=True
+        )
+        self.add_widget(self.title)
+        self.row_widgets = []
+    
+    def _make_row(self):
+        row = BoxLayout(orientation='horizontal', size_hint_y=None, height=DAY_ROW_HEIGHT)
+        row.name_label = Label(size_hint_x=0.3, halign='left')
+        row.value_label = Label(size_hint_x=0.7, halign='left', shorten=True, color=(0.4, 0.4, 0.4, 1))
+        row.value_label.bind(size=lambda label, size: setattr(label, 'text_size', size))
+        row.add_widget(row.name_label)
+        row.add_widget(row.value_label)
+        return row
+    
+    def refresh_view_attrs(self, rv, index, data):
+        self.title.text = data['day']
+        rows = data['rows']
+        while len(self.row_widgets) < len(rows):
+            self.row_widgets.append(self._make_row())
+            self.add_widget(self.row_widgets[-1])
+        while len(self.row_widgets) > len(rows):
+            self.remove_widget(self.row_widgets.pop())
+        for widget, (name, value) in zip(self.row_widgets, rows):
+            widget.name_label.text = name
+            widget.value_label.text = value
+        return super().refresh_view_attrs(rv, index, {'height': data['height']})
+
+
+class ScheduleView(RecycleView):
+    """Stored days as recycled cards; only cards on screen get widgets"""
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        layout = RecycleBoxLayout(
+            orientation='vertical',
+            size_hint_y=None,
+            default_size_hint=(1, None),
+            spacing=dp(15),
+            padding=dp(15))
+        layout.bind(minimum_height=layout.setter('height'))
+        self.add_widget(layout)
+        self.viewclass = DayCard
+    
+    @staticmethod
+    def card(day, rows):
+        height = DAY_TITLE_HEIGHT + len(rows) * (DAY_ROW_HEIGHT + dp(5)) + 2 * DAY_CARD_PADDING
+        return {'day': day, 'rows': rows, 'height': height}
+    
+    def show_days(self, days):
+        """Replace the cards; days is an ordered list of (day, rows)"""
+        self.data = [self.card(day, rows) for day, rows in days]
+    
+    def update_days(self, days):
+        """Re-render only the given (index, day, rows) cards"""
+        for index, day, rows in days:
+            self.data[index] = self.card(day, rows)
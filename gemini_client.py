@@ -0,0 +1,25 @@
+import os
+
+# --- Shared Gemini client ---
+#
+# Created on first use so importing this module (e.g. from the Kivy app)
+# does not pull in google.genai until a request is actually made.
+
+API_KEY = os.environ.get("GEMINI_API_KEY", "YOUR_API_KEY")
+# Point at a local stand-in (see stub_llm_server.py) to test offline
+BASE_URL = os.environ.get("GEMINI_BASE_URL")
+
+_client = None
+
+
+def get_client():
+    global _client
+    if _client is None:
+        from google import genai
+        from google.genai import types
+        from llm_transport import CALL_DEADLINE_SECONDS
+        # Requests give up at the transport's deadline too, so a hung call
+        # can't keep holding one of the transport's threads after it
+        http_options = types.HttpOptions(base_url=BASE_URL, timeout=int(CALL_DEADLINE_SECONDS * 1000))
+        _client = genai.Client(api_key=API_KEY, http_options=http_options)
+    return _client
@@ -1,73 +1,124 @@
 import numpy as np
-from datascience import *
-import re
+import json
+from plan_parser import PlanParser, parse_plan
+from hydration import hydration_schedule
 
 # --- Helper functions ---
 #    
 def parse_updated_values(text, calorie_intake, macros):
-    calorie_match = re.search(r'(?i)calories?:?\s*(\d+)', text)
-    if calorie_match:
-        calorie_intake = int(calorie_match.group(1))
-
-    protein_match = re.search(r'(?i)protein\s*\(?.*g\)?:?\s*(\d+)', text)
-    carbs_match = re.search(r'(?i)carb(?:s|ohydrates)?\s*\(?.*g\)?:?\s*(\d+)', text)
-    fats_match = re.search(r'(?i)fat(?:s)?\s*\(?.*g\)?:?\s*(\d+)', text)
-
-    if protein_match:
-        macros["Protein (g)"] = int(protein_match.group(1))
-    if carbs_match:
-        macros["Carbohydrates (g)"] = int(carbs_match.group(1))
-    if fats_match:
-        macros["Fats (g)"] = int(fats_match.group(1))
-
-    return calorie_intake, macros
+    return parse_plan(text).targets.apply(calorie_intake, macros)
 
 def parse_updated_water_schedule(text, water_schedule):
-    matches = re.findall(r'(\d{1,2}:\d{2})\s*[-:]\s*(\d+)\s*ml', text, re.IGNORECASE)
-    if matches:
-        updated_schedule = make_array()
-        for time, amount in matches:
-            updated_schedule = np.append(updated_schedule, time)
-            updated_schedule = np.append(updated_schedule, f"{amount}ml")
-        return updated_schedule
+    plan = parse_plan(text)
+    if plan.water:
+        return plan.water_schedule()
     else:
         return water_schedule
 
+WEEKLY_SCHEDULE_PATH = "weekly_schedule.json"
+
+def load_weekly_schedule(path=WEEKLY_SCHEDULE_PATH):
+    """Load the legacy day-name keyed schedule file (imported by schedule_store)"""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+class IncrementalPlanParser:
+    """Parse a streamed reply line by line as the chunks arrive"""
+
+    def __init__(self, calorie_intake, macros, water_schedule):
+        self.calorie_intake = calorie_intake
+        self.macros = dict(macros)
+        self.water_schedule = water_schedule
+        self.parser = PlanParser()
+        self.text = ""
+        self.pending = ""
+
+    @property
+    def plan(self):
+        return self.parser.plan
+
+    def feed(self, chunk):
+        self.text += chunk
+        self.pending += chunk
+        *lines, self.pending = self.pending.split("\n")
+        for line in lines:
+            self.parser.feed_line(line)
+
+    def close(self):
+        if self.pending:
+            self.parser.feed_line(self.pending)
+            self.pending = ""
+        self.calorie_intake, self.macros = self.plan.targets.apply(self.calorie_intake, self.macros)
+        if self.plan.water:
+            self.water_schedule = self.plan.water_schedule()
+        return self.calorie_intake, self.macros, self.water_schedule
+
+def build_chat_prompt(message):
+    return (
+        "You are NutriAI, a friendly nutrition assistant. Answer the user's question "
+        "in a few short sentences of plain text, without markdown.\n\n"
+        f"User: {message}"
+    )
+
 def extract_text_from_txt(txt_path):
     with open(txt_path, 'r', encoding='utf-8') as file:
         return file.read()
 
+# Shared by the interactive functions below and nutrition_batch
+ACTIVITY_MULTIPLIERS = {1: 1.2, 2: 1.375, 3: 1.55, 4: 1.725, 5: 1.9}
+GOAL_NAMES = {1: "bulk", 2: "cut", 3: "maintain"}
+GOAL_FACTORS = {1: 1.15, 2: 0.80, 3: None}
+MACRO_SPLIT = {"protein": 0.30, "carbs": 0.45, "fats": 0.25}
+ML_PER_OZ = 29.5735
+KG_PER_LB = 0.453592
+# Harris-Benedict: base + per_kg * weight + per_cm * height - per_year * age
+HB_MALE = (66.5, 13.75, 5.003, 6.75)
+HB_FEMALE = (655.1, 9.563, 1.850, 4.676)
+
 def get_water_sum(bodyweight, exercise_minutes):
     water_oz = (bodyweight / 2) + ((exercise_minutes / 30) * 12)
-    return water_oz * 29.5735
+    return water_oz * ML_PER_OZ
+
+def get_exercise_water(exercise_minutes):
+    """The part of get_water_sum that comes from exercise, in ml"""
+    return ((exercise_minutes / 30) * 12) * ML_PER_OZ
 
-def get_water_schedule(water_sum):
+def ask_hour(question, allow_blank=False):
     while True:
+        answer = input(question).strip()
+        if allow_blank and not answer:
+            return None
         try:
-            wakeup_hour = int(input("What time do you usually wake up? (24-hour format): "))
-            if not 0 <= wakeup_hour <= 23:
+            hour = int(answer)
+            if not 0 <= hour <= 23:
                 raise ValueError
-            break
+            return hour
         except ValueError:
             print("Invalid input. Please enter a valid hour (0–23).")
 
+def get_water_schedule(water_sum, exercise_minutes=0):
+    wakeup_hour = ask_hour("What time do you usually wake up? (24-hour format): ")
     while True:
-        try:
-            bedtime_hour = int(input("What time do you usually sleep? (24-hour format): "))
-            if not 0 <= bedtime_hour <= 23 or bedtime_hour <= wakeup_hour:
-                raise ValueError
+        bedtime_hour = ask_hour("What time do you usually sleep? (24-hour format): ")
+        if bedtime_hour != wakeup_hour:
             break
-        except ValueError:
-            print("Invalid input. Please enter a valid hour later than wake-up time (0–23).")
+        print("Invalid input. Bedtime must differ from wake-up time (it may be after midnight).")
 
-    water_schedule = make_array()
-    avg_water = water_sum / (bedtime_hour - wakeup_hour)
+    workout_hour = None
+    if exercise_minutes > 0:
+        workout_hour = ask_hour("What time do you usually work out? (24-hour format, blank to skip): ", allow_blank=True)
 
-    for i in np.arange(wakeup_hour, bedtime_hour):
-        water_schedule = np.append(water_schedule, f"{i}:00")
-        water_schedule = np.append(water_schedule, f"{np.round(avg_water)}ml")
-
-    return water_schedule
+    return hydration_schedule(
+        water_sum,
+        wakeup_hour * 60,
+        bedtime_hour * 60,
+        exercise_ml=get_exercise_water(exercise_minutes),
+        workout_start=None if workout_hour is None else workout_hour * 60,
+        workout_minutes=exercise_minutes,
+    )
 
 def get_activity_multiplier():
     print("\nChoose your activity level:")
@@ -86,13 +137,12 @@ def get_activity_multiplier():
         except ValueError:
             print("Invalid input. Please choose a number from 1 to 5.")
 
-    return {1: 1.2, 2: 1.375, 3: 1.55, 4: 1.725, 5: 1.9}[level]
+    return ACTIVITY_MULTIPLIERS[level]
 
 def get_user_profile():
     print("\n--- User Profile Setup ---")
     gender_input = input("Enter your gender: ").strip().lower()
-    if gender_input == "male" :
-        gender = "male" 
+    gender = "male" if gender_input == "male" else "female"
 
     while True:
         try:
@@ -125,14 +175,12 @@ def get_user_profile():
 
 def get_hb_BMR(profile, activity_multiplier):
     gender = profile["gender"]
-    weight_kg = profile["weight"] * 0.453592
+    weight_kg = profile["weight"] * KG_PER_LB
     height = profile["height"]
     age = profile["age"]
 
-    if gender == "male":
-        bmr = 66.5 + (13.75 * weight_kg) + (5.003 * height) - (6.75 * age)
-    else:
-        bmr = 655.1 + (9.563 * weight_kg) + (1.850 * height) - (4.676 * age)
+    base, per_kg, per_cm, per_year = HB_MALE if gender == "male" else HB_FEMALE
+    bmr = base + (per_kg * weight_kg) + (per_cm * height) - (per_year * age)
 
     return int(np.round(bmr * activity_multiplier))
 
@@ -153,18 +201,21 @@ def adjust_for_goal(calorie_intake):
 
     if goal_choice == 1:
         print("⚡ Goal: Bulk – increasing calories by 15%")
-        return int(calorie_intake * 1.15), "bulk"
     elif goal_choice == 2:
         print("🔥 Goal: Cut – reducing calories by 20%")
-        return int(calorie_intake * 0.80), "cut"
     else:
         print("🎯 Goal: Maintain – keeping calorie intake unchanged")
-        return calorie_intake, "maintain"
+    return apply_goal(calorie_intake, goal_choice), GOAL_NAMES[goal_choice]
+
+def apply_goal(calorie_intake, goal_choice):
+    """Calorie target for goal 1 (bulk), 2 (cut) or 3 (maintain)"""
+    factor = GOAL_FACTORS[goal_choice]
+    return calorie_intake if factor is None else int(calorie_intake * factor)
 
 def get_macros(calorie_intake):
-    protein = (calorie_intake * 0.30) / 4
-    carbs = (calorie_intake * 0.45) / 4
-    fats = (calorie_intake * 0.25) / 9
+    protein = (calorie_intake * MACRO_SPLIT["protein"]) / 4
+    carbs = (calorie_intake * MACRO_SPLIT["carbs"]) / 4
+    fats = (calorie_intake * MACRO_SPLIT["fats"]) / 9
     return {
         "Protein (g)": round(protein),
         "Carbohydrates (g)": round(carbs),
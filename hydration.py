@@ -0,0 +1,150 @@
+import re
+import numpy as np
+
+# --- Hydration schedules ---
+#
+# A schedule is a WATER_DTYPE array of (minute, ml) drinks, where minute is
+# minutes after midnight. Schedules for many users are generated together:
+# hydration_batch() returns one flat array plus CSR offsets (schedule i is
+# entries[offsets[i]:offsets[i + 1]]), built with a handful of array
+# operations and no per-slot Python work.
+#
+# Wake/sleep windows may cross midnight (wake 20:00, sleep 06:00) and slots
+# can be any number of minutes apart. Water for exercise can be weighted
+# towards the slots during and just after the workout instead of being
+# spread over the whole day.
+#
+# Saved plans store schedules as run-length "runs" ([start, step, count, ml]
+# per run of equally spaced, equal drinks); the flat ["8:00", "210.0ml", ...]
+# lists written by older versions are still read by as_entries().
+
+WATER_DTYPE = np.dtype([("minute", "<i2"), ("ml", "<f4")])
+MINUTES_PER_DAY = 24 * 60
+DEFAULT_INTERVAL = 60
+WORKOUT_RECOVERY_MINUTES = 60
+
+LEGACY_TIME = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*$")
+
+
+def hydration_batch(water_ml, wake_minute, sleep_minute, interval=DEFAULT_INTERVAL, exercise_ml=0.0,
+                    workout_start=None, workout_minutes=0):
+    """(entries, offsets) for many users at once; every argument may be a scalar or an array"""
+    water_ml, wake, sleep, interval, exercise_ml, workout_minutes = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(value, dtype=np.float64))
+          for value in (water_ml, wake_minute, sleep_minute, interval, exercise_ml, workout_minutes))
+    )
+    n = len(water_ml)
+    window = (sleep - wake) % MINUTES_PER_DAY
+    if np.any(window == 0) or np.any(interval <= 0):
+        raise ValueError("wake and sleep times must differ and the interval must be positive")
+    counts = np.ceil(window / interval).astype(np.int64)
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+
+    # Slot k of user i is k * interval[i] minutes after they wake up
+    user = np.repeat(np.arange(n), counts)
+    slot = np.arange(offsets[-1]) - offsets[user]
+    elapsed = slot * interval[user]
+    minute = (wake[user] + elapsed) % MINUTES_PER_DAY
+
+    base = (water_ml - exercise_ml) / counts
+    amount = base[user]
+    if workout_start is None:
+        amount = amount + (exercise_ml / counts)[user]
+    else:
+        start = np.broadcast_to(np.asarray(workout_start, dtype=np.float64), (n,))
+        since_workout = (minute - start[user]) % MINUTES_PER_DAY
+        weighted = since_workout < (workout_minutes + WORKOUT_RECOVERY_MINUTES)[user]
+        weighted_counts = np.bincount(user, weights=weighted, minlength=n)
+        # Users whose workout misses every slot get the exercise water spread evenly
+        spread = weighted_counts == 0
+        share = np.where(spread, exercise_ml / counts, exercise_ml / np.maximum(weighted_counts, 1))
+        amount = amount + np.where(weighted | spread[user], share[user], 0.0)
+
+    entries = np.empty(offsets[-1], dtype=WATER_DTYPE)
+    entries["minute"] = minute
+    entries["ml"] = np.round(amount)
+    return entries, offsets
+
+
+def hydration_schedule(water_ml, wake_minute, sleep_minute, interval=DEFAULT_INTERVAL, exercise_ml=0.0,
+                       workout_start=None, workout_minutes=0):
+    """WATER_DTYPE schedule for one user"""
+    entries, _ = hydration_batch(water_ml, wake_minute, sleep_minute, interval, exercise_ml,
+                                 workout_start, workout_minutes)
+    return entries
+
+
+def format_time(minute):
+    return f"{int(minute) // 60}:{int(minute) % 60:02d}"
+
+
+def format_amount(ml):
+    return f"{float(ml):g}ml"
+
+
+def to_runs(entries):
+    """Compact [[start, step, count, ml], ...] form of a schedule"""
+    runs = []
+    for minute, ml in zip(entries["minute"].tolist(), entries["ml"].tolist()):
+        if runs:
+            run = runs[-1]
+            step = (minute - run[0]) % MINUTES_PER_DAY if run[2] == 1 else run[1]
+            if ml == run[3] and (run[0] + step * run[2]) % MINUTES_PER_DAY == minute:
+                run[1], run[2] = step, run[2] + 1
+                continue
+        runs.append([minute, 0, 1, ml])
+    return runs
+
+
+def from_runs(runs):
+    runs = np.asarray(runs, dtype=np.float64).reshape(-1, 4)
+    counts = runs[:, 2].astype(np.int64)
+    run = np.repeat(np.arange(len(runs)), counts)
+    slot = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    entries = np.empty(len(run), dtype=WATER_DTYPE)
+    entries["minute"] = (runs[run, 0] + runs[run, 1] * slot) % MINUTES_PER_DAY
+    entries["ml"] = runs[run, 3]
+    return entries
+
+
+def from_legacy(flat):
+    """Schedule from a flat [time, amount, time, amount, ...] list"""
+    times, amounts = list(flat[0::2]), list(flat[1::2])
+    entries = np.empty(len(amounts), dtype=WATER_DTYPE)
+    for i, (time, amount) in enumerate(zip(times, amounts)):
+        match = LEGACY_TIME.match(str(time))
+        if match is None:
+            raise ValueError(f"not a water schedule time: {time!r}")
+        entries[i] = (int(match.group(1)) * 60 + int(match.group(2)), float(re.sub(r"[^\d.]", "", str(amount)) or 0))
+    return entries
+
+
+def as_entries(water_schedule):
+    """WATER_DTYPE schedule from any stored or in-memory form"""
+    if water_schedule is None:
+        return np.empty(0, dtype=WATER_DTYPE)
+    if isinstance(water_schedule, np.ndarray) and water_schedule.dtype.names:
+        return water_schedule.astype(WATER_DTYPE, copy=False)
+    water_schedule = list(water_schedule)
+    if not water_schedule:
+        return np.empty(0, dtype=WATER_DTYPE)
+    if isinstance(water_schedule[0], (list, tuple)):
+        return from_runs(water_schedule)
+    return from_legacy(water_schedule)
+
+
+def format_schedule(water_schedule, separator=", "):
+    entries = as_entries(water_schedule)
+    return separator.join(f"{format_time(minute)} - {format_amount(ml)}" for minute, ml in entries.tolist())
+
+
+def summarize(water_schedule):
+    """One-line summary for lists and cards"""
+    entries = as_entries(water_schedule)
+    if not len(entries):
+        return "No water schedule"
+    return (
+        f"{len(entries)} drinks, {format_time(entries['minute'][0])} to {format_time(entries['minute'][-1])} "
+        f"({entries['ml'].sum():.0f}ml)"
+    )
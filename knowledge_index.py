@@ -0,0 +1,210 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+import numpy as np
+from helper_functions import extract_text_from_txt
+
+# --- Knowledge index ---
+#
+# BM25 over the reference documents in txts/, so prompts carry the few
+# passages relevant to a request instead of the whole folder. Files are cut
+# into chunks of at most CHUNK_WORDS words (paragraphs are kept together
+# where they fit, long ones are split with a little overlap) and each chunk's
+# term counts go into a SQLite postings table next to this module.
+#
+# refresh() compares each file's mtime and size with what was indexed and
+# re-chunks only the files that changed, appeared or disappeared, so an
+# unchanged corpus costs one directory scan. Searches refresh at most every
+# REFRESH_SECONDS and read only the posting lists of the query's terms, and
+# every prompt gets at most top_k chunks, so prompt size stays the same
+# however large the folder grows.
+
+KNOWLEDGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "txts")
+KNOWLEDGE_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "knowledge_index.sqlite3")
+CHUNK_WORDS = 120
+OVERLAP_WORDS = 20
+TOP_K = 3
+REFRESH_SECONDS = 5.0
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have how i if in into is it its me my of on or so such that the "
+    "their them then there these they this to was we what when which while who will with you your".split()
+)
+
+
+def tokenize(text):
+    """Lower-case terms without stopwords; a trailing plural s is dropped"""
+    terms = []
+    for term in TOKEN.findall(text.lower()):
+        if term in STOPWORDS:
+            continue
+        if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+            term = term[:-1]
+        terms.append(term)
+    return terms
+
+
+def chunk_text(text, chunk_words=CHUNK_WORDS, overlap=OVERLAP_WORDS):
+    """Passages of at most chunk_words words, packed from whole paragraphs"""
+    chunks, current = [], []
+    for paragraph in re.split(r"\n\s*\n", text):
+        words = paragraph.split()
+        if current and len(current) + len(words) > chunk_words:
+            chunks.append(" ".join(current))
+            current = []
+        if len(words) <= chunk_words:
+            current += words
+            continue
+        step = chunk_words - overlap
+        for start in range(0, len(words) - overlap, step):
+            chunks.append(" ".join(words[start:start + chunk_words]))
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+class KnowledgeIndex:
+    def __init__(self, folder=KNOWLEDGE_DIR, path=KNOWLEDGE_DB_PATH, refresh_seconds=REFRESH_SECONDS):
+        self.folder = folder
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        self.lock = threading.Lock()
+        self.last_refresh = None
+        self.stats = None  # (chunks, average chunk length in terms)
+        self._db = None
+
+    @property
+    def db(self):
+        # Opened on first search so importing the index reads nothing
+        if self._db is None:
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, stamp TEXT NOT NULL)")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS chunks (id INTEGER PRIMARY KEY, path TEXT NOT NULL, "
+                "position INTEGER NOT NULL, text TEXT NOT NULL, length INTEGER NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS chunks_path ON chunks (path)")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS postings (term TEXT NOT NULL, chunk INTEGER NOT NULL, "
+                "tf INTEGER NOT NULL, PRIMARY KEY (term, chunk)) WITHOUT ROWID"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS postings_chunk ON postings (chunk)")
+            self._db = db
+        return self._db
+
+    def _scan(self):
+        """{path: stamp} for every .txt file in the folder"""
+        try:
+            entries = list(os.scandir(self.folder))
+        except FileNotFoundError:
+            return {}
+        files = {}
+        for entry in entries:
+            if entry.name.endswith(".txt") and entry.is_file():
+                stat = entry.stat()
+                files[os.path.abspath(entry.path)] = f"{stat.st_mtime_ns}:{stat.st_size}"
+        return files
+
+    def refresh(self):
+        """Re-index changed files; returns the number of files (re)indexed or dropped"""
+        with self.lock:
+            db = self.db
+            current = self._scan()
+            indexed = dict(db.execute("SELECT path, stamp FROM files"))
+            changed = [path for path, stamp in current.items() if indexed.get(path) != stamp]
+            removed = [path for path in indexed if path not in current]
+            if changed or removed:
+                db.execute("BEGIN IMMEDIATE")
+                try:
+                    for path in changed + removed:
+                        self._drop(path)
+                    for path in changed:
+                        self._add(path, current[path])
+                except BaseException:
+                    db.execute("ROLLBACK")
+                    raise
+                db.execute("COMMIT")
+            # Read back every time: another process may have done the re-indexing
+            count, average = db.execute("SELECT COUNT(*), AVG(length) FROM chunks").fetchone()
+            self.stats = (count, average or 0.0)
+            self.last_refresh = time.monotonic()
+            return len(changed) + len(removed)
+
+    def _drop(self, path):
+        self._db.execute("DELETE FROM postings WHERE chunk IN (SELECT id FROM chunks WHERE path = ?)", (path,))
+        self._db.execute("DELETE FROM chunks WHERE path = ?", (path,))
+        self._db.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def _add(self, path, stamp):
+        for position, text in enumerate(chunk_text(extract_text_from_txt(path))):
+            counts = Counter(tokenize(text))
+            chunk = self._db.execute(
+                "INSERT INTO chunks (path, position, text, length) VALUES (?, ?, ?, ?)",
+                (path, position, text, sum(counts.values())),
+            ).lastrowid
+            self._db.executemany("INSERT INTO postings (term, chunk, tf) VALUES (?, ?, ?)",
+                                 [(term, chunk, tf) for term, tf in counts.items()])
+        self._db.execute("INSERT INTO files (path, stamp) VALUES (?, ?)", (path, stamp))
+
+    def search(self, query, top_k=TOP_K):
+        """Up to top_k (score, source file name, passage) for query, best first"""
+        if self.last_refresh is None or time.monotonic() - self.last_refresh >= self.refresh_seconds:
+            self.refresh()
+        terms = sorted(set(tokenize(query)))
+        if not terms or not self.stats[0]:
+            return []
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT p.term, p.chunk, p.tf, c.length FROM postings p JOIN chunks c ON c.id = p.chunk "
+                f"WHERE p.term IN ({','.join('?' * len(terms))})",
+                terms,
+            ).fetchall()
+        if not rows:
+            return []
+
+        count, average = self.stats
+        term_names, chunk_ids, tf, length = zip(*rows)
+        term_codes = np.unique(term_names, return_inverse=True)[1]
+        chunk_ids, chunk_codes = np.unique(chunk_ids, return_inverse=True)
+        df = np.bincount(term_codes)
+        idf = np.log1p((count - df + 0.5) / (df + 0.5))
+        tf = np.asarray(tf, dtype=np.float64)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * np.asarray(length, dtype=np.float64) / max(average, 1e-9))
+        scores = np.bincount(chunk_codes, weights=idf[term_codes] * tf * (BM25_K1 + 1) / (tf + norm))
+
+        best = np.argsort(-scores, kind="stable")[:top_k]
+        ids = [int(chunk_ids[i]) for i in best]
+        with self.lock:
+            passages = dict((row[0], row[1:]) for row in self.db.execute(
+                f"SELECT id, path, text FROM chunks WHERE id IN ({','.join('?' * len(ids))})", ids
+            ))
+        return [(float(scores[i]), os.path.basename(passages[chunk][0]), passages[chunk][1])
+                for i, chunk in zip(best, ids)]
+
+    def passages(self, query, top_k=TOP_K):
+        """Just the passage texts of search()"""
+        return [text for _, _, text in self.search(query, top_k)]
+
+
+_default_index = None
+
+
+def get_knowledge_index():
+    global _default_index
+    if _default_index is None:
+        _default_index = KnowledgeIndex()
+    return _default_index
+
+
+def plan_query(macros, goal=None, request=None):
+    """Search text for a plan or adjustment: the user's words, the goal and the dominant macro"""
+    kcal = {"protein": macros["Protein (g)"] * 4, "carbohydrate": macros["Carbohydrates (g)"] * 4,
+            "fat": macros["Fats (g)"] * 9}
+    return " ".join(filter(None, [request, goal, f"high {max(kcal, key=kcal.get)}", "meal plan"]))
@@ -0,0 +1,238 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from llm_transport import get_transport
+from tracing import get_tracer
+
+# --- Gemini response cache ---
+#
+# Two tiers keyed on sha256(model + whitespace-normalized prompt):
+#   memory  an OrderedDict LRU, evicted by total text size
+#   disk    a SQLite table, evicted least-recently-used first by total size
+# Entries older than the TTL are treated as misses and dropped. A hit never
+# touches the network, so repeated profiles and repeated adjustment requests
+# cost nothing in API quota.
+#
+# The database is in WAL mode, since the CLI, the service and every batch
+# worker open the same file: readers never wait on a writer. A hit doesn't
+# write; its last-use time is queued and written with the next put(), or
+# in one transaction once TOUCH_BATCH hits are pending, so reads stay free
+# of commits and fsyncs.
+
+GEMINI_MODEL = "gemini-2.0-flash"
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_cache.sqlite3")
+MEMORY_MAX_BYTES = 8 * 1024 * 1024
+DISK_MAX_BYTES = 64 * 1024 * 1024
+TTL_SECONDS = 7 * 24 * 3600
+TOUCH_BATCH = 64
+
+
+def normalize_prompt(prompt):
+    """Whitespace differences should not change the cache key; case does (it can change the answer)"""
+    return " ".join(str(prompt).split())
+
+
+def cache_key(model, prompt):
+    return hashlib.sha256(f"{model}\0{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path=CACHE_PATH, memory_max_bytes=MEMORY_MAX_BYTES,
+                 disk_max_bytes=DISK_MAX_BYTES, ttl=TTL_SECONDS):
+        self.path = path
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.ttl = ttl
+
+        self.memory = OrderedDict()  # key -> (text, created)
+        self.memory_bytes = 0
+        self.counters = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self.lock = threading.Lock()
+        self._db = None
+        self.disk_bytes = 0
+        self.touched = {}  # key -> last use not yet written to disk
+
+    @property
+    def db(self):
+        # Opened on first use so importing the cache costs nothing
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, text TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+            self.disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        return self._db
+
+    def _remember(self, key, text, created):
+        if key in self.memory:
+            self.memory_bytes -= len(self.memory.pop(key)[0])
+        self.memory[key] = (text, created)
+        self.memory_bytes += len(text)
+        while self.memory_bytes > self.memory_max_bytes and len(self.memory) > 1:
+            _, (old_text, _) = self.memory.popitem(last=False)
+            self.memory_bytes -= len(old_text)
+            self.counters["evictions"] += 1
+
+    def get(self, model, prompt):
+        key = cache_key(model, prompt)
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None and now - entry[1] <= self.ttl:
+                self.memory.move_to_end(key)
+                self._touch(key, now)
+                self.counters["hits"] += 1
+                self.counters["memory_hits"] += 1
+                return entry[0]
+
+            row = self.db.execute("SELECT text, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] <= self.ttl:
+                self._touch(key, now)
+                self._remember(key, row[0], row[1])
+                self.counters["hits"] += 1
+                self.counters["disk_hits"] += 1
+                return row[0]
+
+            if entry is not None or row is not None:
+                self._drop(key)
+            self.counters["misses"] += 1
+            return None
+
+    def put(self, model, prompt, text):
+        # No text (e.g. a blocked response): nothing worth serving again
+        if text is None:
+            return
+        key = cache_key(model, prompt)
+        now = time.time()
+        size = len(text.encode("utf-8"))
+        with self.lock:
+            self._remember(key, text, now)
+            old = self.db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses (key, text, size, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, text, size, now, now),
+            )
+            self.disk_bytes += size - (old[0] if old else 0)
+            # Pending last-use times first, so eviction sees them
+            self._write_touched()
+            self._evict_disk()
+            self.db.commit()
+
+    def _touch(self, key, now):
+        self.touched[key] = now
+        if len(self.touched) >= TOUCH_BATCH:
+            self._write_touched()
+            self.db.commit()
+
+    def _write_touched(self):
+        if self.touched:
+            self.db.executemany("UPDATE responses SET last_used = ? WHERE key = ?",
+                                [(used, key) for key, used in self.touched.items()])
+            self.touched.clear()
+
+    def flush(self):
+        """Write any queued last-use times"""
+        with self.lock:
+            if self.touched:
+                self._write_touched()
+                self.db.commit()
+
+    def _drop(self, key):
+        self.touched.pop(key, None)
+        if key in self.memory:
+            self.memory_bytes -= len(self.memory.pop(key)[0])
+        row = self.db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.db.commit()
+            self.disk_bytes -= row[0]
+
+    def _evict_disk(self):
+        expired = self.db.execute(
+            "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM responses WHERE created < ?", (time.time() - self.ttl,)
+        ).fetchone()
+        if expired[1]:
+            self.db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+            self.disk_bytes -= expired[0]
+            self.counters["evictions"] += expired[1]
+        while self.disk_bytes > self.disk_max_bytes:
+            row = self.db.execute("SELECT key, size FROM responses ORDER BY last_used LIMIT 1").fetchone()
+            if row is None:
+                break
+            self.db.execute("DELETE FROM responses WHERE key = ?", (row[0],))
+            self.disk_bytes -= row[1]
+            self.counters["evictions"] += 1
+
+    def stats(self):
+        with self.lock:
+            total = self.counters["hits"] + self.counters["misses"]
+            return dict(
+                self.counters,
+                hit_rate=self.counters["hits"] / total if total else 0.0,
+                memory_entries=len(self.memory),
+                memory_bytes=self.memory_bytes,
+                disk_bytes=self.disk_bytes,
+            )
+
+
+_default_cache = None
+
+
+def get_response_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResponseCache()
+    return _default_cache
+
+
+def generate_text(client, contents, model=GEMINI_MODEL, cache=None, transport=None):
+    """Text of client.models.generate_content, served from the cache when possible"""
+    cache = cache or get_response_cache()
+    start = time.perf_counter()
+    text = cache.get(model, contents)
+    cached = text is not None
+    if text is None:
+        transport = transport or get_transport()
+        try:
+            text = transport.call(client.models.generate_content, model=model, contents=contents).text
+        except Exception as e:
+            get_tracer().record_llm("generate", start, contents, None, False, error=type(e).__name__)
+            raise
+        cache.put(model, contents, text)
+    get_tracer().record_llm("generate", start, contents, text, cached)
+    return text
+
+
+def stream_text(client, contents, model=GEMINI_MODEL, cache=None, transport=None):
+    """Yield the response text as it is generated; a cache hit yields it in one piece"""
+    cache = cache or get_response_cache()
+    start = time.perf_counter()
+    text = cache.get(model, contents)
+    if text is not None:
+        get_tracer().record_llm("stream", start, contents, text, True, first_chunk=time.perf_counter() - start)
+        yield text
+        return
+    transport = transport or get_transport()
+    parts = []
+    first_chunk = None
+    try:
+        for chunk in transport.stream(client.models.generate_content_stream, model=model, contents=contents):
+            if chunk.text:
+                if first_chunk is None:
+                    first_chunk = time.perf_counter() - start
+                parts.append(chunk.text)
+                yield chunk.text
+    except (Exception, GeneratorExit) as e:
+        # GeneratorExit: the caller stopped reading (e.g. a superseded chat reply)
+        get_tracer().record_llm("stream", start, contents, "".join(parts), False, first_chunk, type(e).__name__)
+        raise
+    get_tracer().record_llm("stream", start, contents, "".join(parts), False, first_chunk)
+    cache.put(model, contents, "".join(parts))
@@ -0,0 +1,241 @@
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+# --- Resilient LLM transport ---
+#
+# Every Gemini call goes through LLMTransport, which gives it:
+#   - a deadline for the whole call, retries included
+#   - bounded retries with full-jitter exponential backoff, for errors that
+#     are worth retrying (timeouts, connection errors, 408/429/5xx)
+#   - a circuit breaker: after FAILURE_THRESHOLD failed attempts in a row
+#     calls fail fast with CircuitOpenError for RESET_TIMEOUT seconds, then a
+#     single trial call decides whether to close it again
+# Callers catch LLMUnavailableError and fall back to a cached or locally
+# solved plan instead of stalling the session.
+
+CALL_DEADLINE_SECONDS = 30.0
+MAX_RETRIES = 3
+BASE_DELAY_SECONDS = 0.5
+MAX_DELAY_SECONDS = 8.0
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT_SECONDS = 30.0
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class LLMUnavailableError(Exception):
+    """The LLM could not produce an answer in time; use a fallback"""
+
+
+class DeadlineExceededError(LLMUnavailableError, TimeoutError):
+    pass
+
+
+class RetriesExhaustedError(LLMUnavailableError):
+    pass
+
+
+class CircuitOpenError(LLMUnavailableError):
+    pass
+
+
+def is_retryable(error):
+    if isinstance(error, (TimeoutError, ConnectionError, asyncio.TimeoutError)):
+        return True
+    status = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if status is None:
+        # httpx.HTTPStatusError keeps the status on its response
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS
+    # httpx transport errors (connect/read timeouts, resets) carry no status
+    try:
+        import httpx
+    except ImportError:
+        return False
+    return isinstance(error, httpx.TransportError)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT_SECONDS, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def release(self):
+        """End a trial call without a verdict (the error said nothing about the service's health)"""
+        with self.lock:
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+            self.trial_running = False
+
+
+class LLMTransport:
+    def __init__(self, deadline=CALL_DEADLINE_SECONDS, max_retries=MAX_RETRIES, base_delay=BASE_DELAY_SECONDS,
+                 max_delay=MAX_DELAY_SECONDS, breaker=None, sleep=time.sleep, rng=random.random):
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.sleep = sleep
+        self.rng = rng
+        # Blocking SDK calls can't be interrupted, so they run here and the
+        # caller stops waiting at the deadline
+        self.executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm")
+        # Bumped from the executor, UI workers and event loops alike
+        self.counters_lock = threading.Lock()
+        self.counters = {"calls": 0, "retries": 0, "failures": 0, "short_circuits": 0, "deadlines": 0}
+
+    def count(self, *names):
+        with self.counters_lock:
+            for name in names:
+                self.counters[name] += 1
+
+    def stats(self):
+        with self.counters_lock:
+            return dict(self.counters, breaker=self.breaker.state)
+
+    def backoff(self, attempt):
+        return min(self.max_delay, self.base_delay * 2 ** attempt) * self.rng()
+
+    def _enter(self):
+        self.count("calls")
+        if not self.breaker.allow():
+            self.count("short_circuits")
+            raise CircuitOpenError("LLM circuit breaker is open")
+        return time.monotonic() + self.deadline
+
+    def _failed(self, error, attempt, deadline_at):
+        """Record a failed attempt; returns the backoff delay or raises"""
+        if not is_retryable(error):
+            # The service answered (e.g. a 400); that says nothing about its health
+            self.breaker.release()
+            raise error
+        self.count("failures")
+        self.breaker.record_failure()
+        remaining = deadline_at - time.monotonic()
+        if attempt >= self.max_retries:
+            raise RetriesExhaustedError(f"gave up after {attempt + 1} attempts: {error}") from error
+        delay = self.backoff(attempt)
+        if delay >= remaining:
+            self.count("deadlines")
+            raise DeadlineExceededError(f"deadline of {self.deadline:.0f}s exceeded: {error}") from error
+        self.count("retries")
+        return delay
+
+    def _wait(self, fn, deadline_at):
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceededError(f"deadline of {self.deadline:.0f}s exceeded")
+        future = self.executor.submit(fn)
+        try:
+            return future.result(timeout=remaining)
+        except FutureTimeoutError:
+            # Still queued: never start it. Already running: the client's own
+            # HTTP timeout (gemini_client) ends it, freeing the thread.
+            future.cancel()
+            raise DeadlineExceededError(f"deadline of {self.deadline:.0f}s exceeded") from None
+
+    def call(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) under the deadline, retry and breaker policy"""
+        deadline_at = self._enter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = self._wait(lambda: fn(*args, **kwargs), deadline_at)
+            except DeadlineExceededError:
+                self.count("deadlines", "failures")
+                self.breaker.record_failure()
+                raise
+            except Exception as e:
+                self.sleep(self._failed(e, attempt, deadline_at))
+                continue
+            self.breaker.record_success()
+            return result
+
+    def stream(self, fn, *args, **kwargs):
+        """Iterate fn(*args, **kwargs); retried until the first chunk arrives, then deadline-bound"""
+        def first_chunk():
+            iterator = iter(fn(*args, **kwargs))
+            return iterator, next(iterator, None)
+
+        iterator, chunk = self.call(first_chunk)
+        deadline_at = time.monotonic() + self.deadline
+        while chunk is not None:
+            yield chunk
+            try:
+                chunk = self._wait(lambda: next(iterator, None), deadline_at)
+            except LLMUnavailableError:
+                self.count("failures")
+                self.breaker.record_failure()
+                raise
+            except Exception as e:
+                # Too late to retry: part of the reply has already been shown
+                self.count("failures")
+                self.breaker.record_failure()
+                raise LLMUnavailableError(f"stream interrupted: {e}") from e
+
+    async def acall(self, coro_fn, *args, **kwargs):
+        """Async counterpart of call() for client.aio coroutines"""
+        deadline_at = self._enter()
+        for attempt in range(self.max_retries + 1):
+            remaining = deadline_at - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                result = await asyncio.wait_for(coro_fn(*args, **kwargs), remaining)
+            except asyncio.TimeoutError:
+                self.count("deadlines", "failures")
+                self.breaker.record_failure()
+                raise DeadlineExceededError(f"deadline of {self.deadline:.0f}s exceeded") from None
+            except Exception as e:
+                await asyncio.sleep(self._failed(e, attempt, deadline_at))
+                continue
+            self.breaker.record_success()
+            return result
+
+
+_default_transport = None
+
+
+def get_transport():
+    global _default_transport
+    if _default_transport is None:
+        _default_transport = LLMTransport()
+    return _default_transport
@@ -0,0 +1,146 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from urllib.parse import urlsplit
+
+# --- Service load test ---
+#
+# Drives service.py with a mix of requests over keep-alive connections and
+# reports throughput, latency percentiles and status codes per endpoint.
+# Fully offline with the stand-in LLM:
+#
+#   python stub_llm_server.py --port 8765 --latency 0.3 &
+#   GEMINI_BASE_URL=http://127.0.0.1:8765 python service.py --port 8080 &
+#   python load_test.py --url http://127.0.0.1:8080 --concurrency 100 --requests 5000
+#
+# Adjustment requests carry a request counter so they miss the response
+# cache and really reach the LLM; 503s from backpressure are counted, not
+# retried.
+
+DEFAULT_MIX = {"targets": 4, "plan": 4, "adjust": 1, "schedule": 1}
+
+PROFILE = {"gender": "female", "weight": 150, "height": 165, "age": 30, "activity": 3, "goal": 3,
+           "exercise_minutes": 30, "wake_hour": 7, "sleep_hour": 23}
+TARGETS = {"calorie_intake": 2100, "macros": {"Protein (g)": 158, "Carbohydrates (g)": 210, "Fats (g)": 70}}
+
+
+def make_request(kind, number, rng):
+    """(method, path, body) for request number of the given kind"""
+    if kind == "targets":
+        return "POST", "/targets", dict(PROFILE, weight=rng.randint(110, 260), age=rng.randint(18, 70))
+    if kind == "plan":
+        calories = rng.randrange(1600, 3200, 50)
+        macros = {"Protein (g)": calories * 3 // 40, "Carbohydrates (g)": calories // 10, "Fats (g)": calories // 30}
+        return "POST", "/plan", {"calorie_intake": calories, "macros": macros}
+    if kind == "adjust":
+        return "POST", "/adjust", dict(TARGETS, water_schedule=[[420, 60, 16, 240.0]],
+                                       request=f"make it vegetarian (load test {number})")
+    return "GET", "/schedule", None
+
+
+async def send(reader, writer, host, method, path, body):
+    payload = json.dumps(body).encode("utf-8") if body is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(payload)}\r\n\r\n".encode("latin-1") + payload
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def client(host, port, jobs, results, rng):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while jobs:
+            number, kind = jobs.pop()
+            method, path, body = make_request(kind, number, rng)
+            start = time.perf_counter()
+            try:
+                status = await send(reader, writer, host, method, path, body)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                status = 0
+                writer.close()
+                reader, writer = await asyncio.open_connection(host, port)
+            results.append((kind, status, time.perf_counter() - start))
+    finally:
+        writer.close()
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+def summarize(results, elapsed):
+    report = {"requests": len(results), "seconds": elapsed, "rps": len(results) / elapsed, "endpoints": {}}
+    for kind in sorted({kind for kind, _, _ in results}):
+        latencies = sorted(seconds for k, _, seconds in results if k == kind)
+        statuses = {}
+        for k, status, _ in results:
+            if k == kind:
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+        report["endpoints"][kind] = {
+            "count": len(latencies),
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "status": statuses,
+        }
+    return report
+
+
+async def run(url, concurrency, requests, mix, seed):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    rng = random.Random(seed)
+    kinds = rng.choices(list(mix), weights=list(mix.values()), k=requests)
+    jobs = list(enumerate(kinds))
+    results = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(host, port, jobs, results, random.Random(seed + i)) for i in range(concurrency)))
+    return summarize(results, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the NutriAI planning service")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--concurrency", type=int, default=50, help="open connections")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--mix", default=",".join(f"{kind}={weight}" for kind, weight in DEFAULT_MIX.items()),
+                        help="endpoint weights, e.g. targets=4,plan=4,adjust=1,schedule=1")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    try:
+        mix = {kind: float(weight) for kind, weight in (item.split("=") for item in args.mix.split(","))}
+    except ValueError:
+        parser.error("--mix must look like targets=4,plan=4")
+    unknown = set(mix) - set(DEFAULT_MIX)
+    if unknown:
+        parser.error(f"unknown endpoints in --mix: {', '.join(sorted(unknown))}")
+
+    report = asyncio.run(run(args.url, args.concurrency, args.requests, mix, args.seed))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['requests']} requests in {report['seconds']:.1f}s ({report['rps']:.0f} req/s)")
+    for kind, stats in report["endpoints"].items():
+        statuses = ", ".join(f"{status}: {count}" for status, count in sorted(stats["status"].items()))
+        print(f"{kind:>9}  p50 {stats['p50_ms']:7.1f}ms  p95 {stats['p95_ms']:7.1f}ms  "
+              f"p99 {stats['p99_ms']:7.1f}ms  [{statuses}]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import json
+import os
+import numpy as np
+
+# --- Macro-ratio nearest-neighbour index ---
+#
+# Every food with calories is a point in the (protein, carbs, fats) share of
+# its kcal. The shares sum to one, so two of them (protein, fats) place a
+# food on a plane; that plane is cut into a GRID_SIZE x GRID_SIZE grid and
+# the catalog rows are stored sorted by cell (CSR layout: order + starts).
+# A query walks outward ring by ring from the target's cell until it has
+# enough candidates, then ranks them by distance, taking the closest food of
+# each cell before the second-closest of any, so the result spreads around
+# the target ratio instead of piling up on near-duplicates.
+
+GRID_SIZE = 64
+OVERSAMPLE = 4
+
+ORDER_FILE = "ratio_order.i64"
+STARTS_FILE = "ratio_starts.i64"
+INDEX_META_FILE = "ratio_index.json"
+
+KCAL_PER_GRAM = np.array([4, 4, 9], dtype=np.float64)
+
+
+def macro_fractions(macros):
+    """Per-kcal protein/carb/fat shares of (n, 3) gram rows; NaN rows when kcal is 0"""
+    kcal = np.asarray(macros, dtype=np.float64) * KCAL_PER_GRAM
+    total = kcal.sum(axis=-1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(total > 0, kcal / total, np.nan)
+
+
+def target_fractions(macros):
+    """Shares implied by a get_macros() result"""
+    return macro_fractions([macros["Protein (g)"], macros["Carbohydrates (g)"], macros["Fats (g)"]])
+
+
+def grid_cells(fractions, grid=GRID_SIZE):
+    coords = np.clip((fractions[..., [0, 2]] * grid).astype(np.int64), 0, grid - 1)
+    return coords[..., 0] * grid + coords[..., 1]
+
+
+class MacroRatioIndex:
+    def __init__(self, catalog, order, starts, grid=GRID_SIZE):
+        self.catalog = catalog
+        self.order = order
+        self.starts = starts
+        self.grid = grid
+
+    @classmethod
+    def build(cls, catalog, grid=GRID_SIZE):
+        rows = catalog.rows
+        fractions = macro_fractions(catalog.macros[rows, :3])
+        valid = ~np.isnan(fractions).any(axis=1)
+        rows, cells = rows[valid], grid_cells(fractions[valid], grid)
+
+        by_cell = np.argsort(cells, kind="stable")
+        order = rows[by_cell].astype(np.int64)
+        starts = np.searchsorted(cells[by_cell], np.arange(grid * grid + 1)).astype(np.int64)
+        return cls(catalog, order, starts, grid)
+
+    def save(self):
+        cache_dir = self.catalog.cache_dir
+        self.order.tofile(os.path.join(cache_dir, ORDER_FILE))
+        self.starts.tofile(os.path.join(cache_dir, STARTS_FILE))
+        with open(os.path.join(cache_dir, INDEX_META_FILE), "w") as f:
+            json.dump({"grid": self.grid, "catalog": self.catalog.meta}, f)
+
+    def _ring(self, cell_p, cell_f, radius):
+        """Row ids in the cells at Chebyshev distance `radius` from (cell_p, cell_f)"""
+        grid = self.grid
+        chunks = []
+        for p in range(cell_p - radius, cell_p + radius + 1):
+            if not 0 <= p < grid:
+                continue
+            edge = abs(p - cell_p) == radius
+            for f in (range(cell_f - radius, cell_f + radius + 1) if edge else (cell_f - radius, cell_f + radius)):
+                if 0 <= f < grid:
+                    cell = p * grid + f
+                    chunks.append(self.order[self.starts[cell]:self.starts[cell + 1]])
+        return chunks
+
+    def query(self, macros, k=100):
+        """Row ids of k foods whose macro ratios best match a get_macros() target"""
+        target = target_fractions(macros)
+        cell = int(grid_cells(target, self.grid))
+        cell_p, cell_f = divmod(cell, self.grid)
+
+        chunks, found = [], 0
+        for radius in range(self.grid):
+            ring = self._ring(cell_p, cell_f, radius)
+            chunks += ring
+            found += sum(len(c) for c in ring)
+            if found >= OVERSAMPLE * k:
+                break
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        candidates = np.concatenate(chunks)
+
+        fractions = macro_fractions(self.catalog.macros[candidates, :3])
+        distance = np.linalg.norm(fractions - target, axis=1)
+        cells = grid_cells(fractions, self.grid)
+
+        # Rank inside each cell, then interleave cells by that rank
+        by_cell = np.lexsort((distance, cells))
+        sorted_cells = cells[by_cell]
+        first = np.r_[0, np.flatnonzero(np.diff(sorted_cells)) + 1]
+        rank = np.arange(len(by_cell)) - np.repeat(first, np.diff(np.r_[first, len(by_cell)]))
+        picked = by_cell[np.lexsort((distance[by_cell], rank))[:k]]
+        return candidates[picked]
+
+    def query_frame(self, macros, k=100):
+        return self.catalog.frame(self.query(macros, k))
+
+
+def load_macro_index(catalog, grid=GRID_SIZE):
+    """Load the persisted index for this catalog, rebuilding it when stale"""
+    cache_dir = catalog.cache_dir
+    try:
+        with open(os.path.join(cache_dir, INDEX_META_FILE), "r") as f:
+            meta = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        meta = None
+
+    if meta is None or meta.get("grid") != grid or meta.get("catalog") != catalog.meta:
+        index = MacroRatioIndex.build(catalog, grid)
+        index.save()
+        return index
+
+    order = np.fromfile(os.path.join(cache_dir, ORDER_FILE), dtype=np.int64)
+    starts = np.fromfile(os.path.join(cache_dir, STARTS_FILE), dtype=np.int64)
+    return MacroRatioIndex(catalog, order, starts, grid)
@@ -35,6 +35,11 @@ class MainApp(App):
         
         return main_layout
     
+    def on_stop(self):
+        # Streaming replies stop at their next chunk, so the worker threads
+        # (which the interpreter waits for) exit instead of running to the deadline
+        self.sm.get_screen('chat').workers.shutdown(cancel=True)
+    
     def switch_screen(self, screen_name):
         self.sm.current = screen_name
         # Update button colors
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import numpy as np
+from catalog import map_file
+from search_index import normalize_description, load_search_index
+
+# --- Food name index ---
+#
+# Exact lookups from a food name, as the LLM wrote it in a plan, to its
+# catalog row. Normalized descriptions (search_index.normalize_description)
+# are hashed to 64 bits and stored in an open-addressing table with linear
+# probing, sized to at most LOAD_FACTOR full and persisted next to the
+# catalog:
+#   name_keys.u64   hash of the name in each slot (0 = empty)
+#   name_rows.i64   catalog row of each slot (-1 = empty)
+# A lookup is one hash and, almost always, one or two slot reads; the hit
+# is confirmed against the stored description so a hash collision can't
+# return the wrong food. Repeated names keep their first row.
+#
+# Names the model reworded ("Chicken breast, grilled" for "GRILLED CHICKEN
+# BREAST") miss the table and fall back to the trigram search index. That
+# index is loaded (or built, which takes seconds on a full catalog) by
+# load_name_index() together with the table, at startup, so no request
+# ever builds it and concurrent checks share the one copy. A fuzzy match is
+# accepted when its score reaches FUZZY_MIN_SCORE.
+
+KEYS_FILE = "name_keys.u64"
+ROWS_FILE = "name_rows.i64"
+INDEX_META_FILE = "name_index.json"
+
+LOAD_FACTOR = 0.5
+FUZZY_MIN_SCORE = 0.6
+
+
+def name_hash(name):
+    """64-bit hash of an (already normalized) name; never 0, which marks an empty slot"""
+    return int.from_bytes(hashlib.blake2b(name.encode("ascii"), digest_size=8).digest(), "little") or 1
+
+
+def table_size(n):
+    return 1 << max(3, int(np.ceil(np.log2(max(n, 1) / LOAD_FACTOR))))
+
+
+def build_table(hashes, rows, size):
+    """Insert every (hash, row) by linear probing, a round of probes at a time"""
+    mask = size - 1
+    keys = np.zeros(size, dtype=np.uint64)
+    slot_rows = np.full(size, -1, dtype=np.int64)
+    position = (hashes & np.uint64(mask)).astype(np.int64)
+    pending = np.arange(len(hashes))
+    while len(pending):
+        slots = position[pending]
+        free = slot_rows[slots] < 0
+        # One winner per free slot; everyone else moves on to the next slot
+        taken, first = np.unique(slots[free], return_index=True)
+        winners = pending[free][first]
+        keys[taken] = hashes[winners]
+        slot_rows[taken] = rows[winners]
+        placed = np.zeros(len(hashes), dtype=bool)
+        placed[winners] = True
+        pending = pending[~placed[pending]]
+        position[pending] = (position[pending] + 1) & mask
+    return keys, slot_rows
+
+
+class FoodNameIndex:
+    def __init__(self, catalog, keys, slot_rows, search_index=None):
+        self.catalog = catalog
+        self.keys = np.asarray(keys)
+        self.slot_rows = np.asarray(slot_rows)
+        self.mask = len(self.keys) - 1
+        # None: exact lookups only
+        self.search_index = search_index
+
+    @classmethod
+    def build(cls, catalog, search_index=None):
+        rows = np.asarray(catalog.rows, dtype=np.int64)
+        hashes = np.fromiter((name_hash(normalize_description(catalog.description(i))) for i in rows),
+                             dtype=np.uint64, count=len(rows))
+        # First row of each name
+        hashes, first = np.unique(hashes, return_index=True)
+        keys, slot_rows = build_table(hashes, rows[first], table_size(len(hashes)))
+        return cls(catalog, keys, slot_rows, search_index)
+
+    def save(self):
+        cache_dir = self.catalog.cache_dir
+        self.keys.tofile(os.path.join(cache_dir, KEYS_FILE))
+        self.slot_rows.tofile(os.path.join(cache_dir, ROWS_FILE))
+        with open(os.path.join(cache_dir, INDEX_META_FILE), "w") as f:
+            json.dump({"catalog": self.catalog.meta, "size": len(self.keys)}, f)
+
+    def get(self, name):
+        """Catalog row whose normalized description equals name's, or None"""
+        query = normalize_description(name)
+        if not query:
+            return None
+        key = name_hash(query)
+        slot = key & self.mask
+        while True:
+            row = int(self.slot_rows[slot])
+            if row < 0:
+                return None
+            if self.keys[slot] == key and normalize_description(self.catalog.description(row)) == query:
+                return row
+            slot = (slot + 1) & self.mask
+
+    def resolve(self, name, fuzzy=True):
+        """(catalog row, "exact" or "fuzzy"), or (None, None) when nothing matches well enough"""
+        row = self.get(name)
+        if row is not None:
+            return row, "exact"
+        if fuzzy and self.search_index is not None:
+            results = self.search_index.search(name, limit=1)
+            if results and results[0]["score"] >= FUZZY_MIN_SCORE:
+                return results[0]["row"], "fuzzy"
+        return None, None
+
+
+def load_name_index(catalog, fuzzy=True):
+    """Memory-map the persisted index for this catalog, rebuilding it when stale; fuzzy loads the search index too"""
+    cache_dir = catalog.cache_dir
+    search_index = load_search_index(catalog) if fuzzy else None
+    try:
+        with open(os.path.join(cache_dir, INDEX_META_FILE), "r") as f:
+            meta = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        meta = None
+
+    if meta is None or meta.get("catalog") != catalog.meta:
+        index = FoodNameIndex.build(catalog, search_index)
+        index.save()
+        return index
+
+    size = meta["size"]
+    return FoodNameIndex(
+        catalog,
+        map_file(cache_dir, KEYS_FILE, np.uint64, (size,)),
+        map_file(cache_dir, ROWS_FILE, np.int64, (size,)),
+        search_index,
+    )
@@ -0,0 +1,103 @@
+import numpy as np
+from helper_functions import (ACTIVITY_MULTIPLIERS, GOAL_FACTORS, MACRO_SPLIT, ML_PER_OZ, KG_PER_LB,
+                              HB_MALE, HB_FEMALE)
+
+# --- Batch nutrition targets ---
+#
+# Column-at-a-time versions of get_hb_BMR, adjust_for_goal, get_macros and
+# get_water_sum for cohort reports. Every formula is evaluated with the same
+# float64 operations in the same order as the scalar functions, and rounds
+# the same way (np.round and Python round are both round-half-to-even, and
+# the goal factor truncates like int()), so a row of the batch result is
+# identical to what the interactive path would print for that profile.
+
+PROFILE_DTYPE = np.dtype([
+    ("male", "?"),
+    ("weight", "f8"),            # lb
+    ("height", "f8"),            # cm
+    ("age", "f8"),               # years
+    ("activity", "u1"),          # 1-5, as in get_activity_multiplier
+    ("goal", "u1"),              # 1 bulk, 2 cut, 3 maintain
+    ("exercise_minutes", "f8"),
+])
+TARGETS_DTYPE = np.dtype([
+    ("calories", "i8"),
+    ("protein", "i8"),
+    ("carbs", "i8"),
+    ("fats", "i8"),
+    ("water_ml", "f8"),
+])
+
+# Lookup tables indexed by the 1-based activity level / goal choice
+ACTIVITY_TABLE = np.array([np.nan] + [ACTIVITY_MULTIPLIERS[level] for level in range(1, 6)])
+GOAL_TABLE = np.array([np.nan] + [GOAL_FACTORS[goal] or 1.0 for goal in range(1, 4)])
+GOAL_ADJUSTS = np.array([False] + [GOAL_FACTORS[goal] is not None for goal in range(1, 4)])
+
+
+def make_profiles(gender, weight, height, age, activity, goal, exercise_minutes):
+    """Structured profile array from columns; gender may be strings or booleans (True = male)"""
+    gender = np.asarray(gender)
+    profiles = np.empty(len(gender), dtype=PROFILE_DTYPE)
+    profiles["male"] = np.char.lower(gender.astype(str)) == "male" if gender.dtype.kind in "US" else gender
+    profiles["weight"] = weight
+    profiles["height"] = height
+    profiles["age"] = age
+    profiles["activity"] = activity
+    profiles["goal"] = goal
+    profiles["exercise_minutes"] = exercise_minutes
+    return profiles
+
+
+def lookup(table, codes, name):
+    codes = np.asarray(codes, dtype=np.int64)
+    if codes.size and (codes.min() < 1 or codes.max() >= len(table)):
+        raise ValueError(f"{name} must be between 1 and {len(table) - 1}")
+    return table[codes]
+
+
+def bmr_batch(male, weight, height, age, activity):
+    """get_hb_BMR for arrays: activity-adjusted calories as int64"""
+    weight_kg = np.asarray(weight, dtype=np.float64) * KG_PER_LB
+    height = np.asarray(height, dtype=np.float64)
+    age = np.asarray(age, dtype=np.float64)
+    coefficients = np.where(np.asarray(male, dtype=bool)[:, None], HB_MALE, HB_FEMALE)
+    bmr = coefficients[:, 0] + (coefficients[:, 1] * weight_kg) + (coefficients[:, 2] * height) - (coefficients[:, 3] * age)
+    return np.round(bmr * lookup(ACTIVITY_TABLE, activity, "activity")).astype(np.int64)
+
+
+def goal_batch(calories, goal):
+    """adjust_for_goal for arrays, without the prompt"""
+    calories = np.asarray(calories, dtype=np.int64)
+    factors = lookup(GOAL_TABLE, goal, "goal")
+    adjusted = np.trunc(calories * factors).astype(np.int64)
+    return np.where(GOAL_ADJUSTS[np.asarray(goal, dtype=np.int64)], adjusted, calories)
+
+
+def macros_batch(calories):
+    """get_macros for arrays: (protein, carbs, fats) grams as int64"""
+    calories = np.asarray(calories, dtype=np.int64)
+    return (
+        np.round((calories * MACRO_SPLIT["protein"]) / 4).astype(np.int64),
+        np.round((calories * MACRO_SPLIT["carbs"]) / 4).astype(np.int64),
+        np.round((calories * MACRO_SPLIT["fats"]) / 9).astype(np.int64),
+    )
+
+
+def water_batch(weight, exercise_minutes):
+    """get_water_sum for arrays: daily water in ml"""
+    weight = np.asarray(weight, dtype=np.float64)
+    exercise_minutes = np.asarray(exercise_minutes, dtype=np.float64)
+    return ((weight / 2) + ((exercise_minutes / 30) * 12)) * ML_PER_OZ
+
+
+def compute_targets(profiles):
+    """TARGETS_DTYPE array with one row of daily targets per profile"""
+    calories = goal_batch(
+        bmr_batch(profiles["male"], profiles["weight"], profiles["height"], profiles["age"], profiles["activity"]),
+        profiles["goal"],
+    )
+    targets = np.empty(len(profiles), dtype=TARGETS_DTYPE)
+    targets["calories"] = calories
+    targets["protein"], targets["carbs"], targets["fats"] = macros_batch(calories)
+    targets["water_ml"] = water_batch(profiles["weight"], profiles["exercise_minutes"])
+    return targets
@@ -0,0 +1,101 @@
+import numpy as np
+from solver import MACRO_COLUMNS, TOLERANCE, target_vector
+
+# --- Plan check ---
+#
+# The LLM's per-food macros and its "Total Macros" block are its own
+# arithmetic, and either can be wrong. check_plan() resolves every food line
+# of a parsed plan to its catalog row through the name index, recomputes
+# each item from the catalog's per-100 g macros and the stated portion,
+# sums meals and the day with vectorized adds, and flags, without another
+# LLM call:
+#   - daily totals more than `tolerance` away from the targets
+#   - a stated total that doesn't match what the foods add up to
+#   - items whose stated kcal are off from the catalog's for that portion
+#   - foods that aren't in the catalog (their stated macros are kept)
+# An item without a portion gets the portion its stated kcal imply.
+
+LABELS = {"Protein (g)": "Protein", "Carbohydrates (g)": "Carbs", "Fats (g)": "Fats", "Calories": "Calories"}
+UNITS = {"Protein (g)": "g", "Carbohydrates (g)": "g", "Fats (g)": "g", "Calories": " kcal"}
+TOTAL_NAMES = ("protein", "carbs", "fats", "calories")
+
+
+def macro_dict(values):
+    protein, carbs, fats, kcal = np.asarray(values, dtype=np.float64).tolist()
+    return {"Protein (g)": round(protein, 2), "Carbohydrates (g)": round(carbs, 2),
+            "Fats (g)": round(fats, 2), "Calories": round(kcal)}
+
+
+def format_amount(key, value):
+    return f"{value:g}{UNITS[key]}"
+
+
+def check_plan(plan, calorie_intake, macros, name_index, tolerance=TOLERANCE, fuzzy=True):
+    """Catalog-based totals and flags for a ParsedPlan"""
+    meal_names = list(plan.meals)
+    items = [(meal_index, item) for meal_index, meal in enumerate(plan.meals.values()) for item in meal.items]
+    matches = [name_index.resolve(item.name, fuzzy) for _, item in items]
+    rows = np.array([-1 if row is None else row for row, _ in matches], dtype=np.int64)
+    matched = rows >= 0
+
+    stated = plan.food_macros()
+    per_100g = np.zeros((len(items), 4))
+    per_100g[matched] = name_index.catalog.macros[rows[matched]]
+    grams = np.array([np.nan if item.grams is None else item.grams for _, item in items], dtype=np.float64)
+    infer = np.isnan(grams) & matched & (per_100g[:, 3] > 0)
+    grams[infer] = stated[infer, 3] * 100 / per_100g[infer, 3]
+
+    computed = matched & ~np.isnan(grams)
+    actual = np.where(computed[:, None], per_100g * np.nan_to_num(grams)[:, None] / 100, stated)
+    per_meal = np.zeros((len(meal_names), 4))
+    np.add.at(per_meal, np.array([meal_index for meal_index, _ in items], dtype=np.int64), actual)
+    totals = actual.sum(axis=0)
+    target = target_vector(calorie_intake, macros)
+    deviation = (totals - target) / np.maximum(target, 1)
+
+    flags = []
+    for (key, total), goal, off in zip(macro_dict(totals).items(), target, deviation):
+        if abs(off) > tolerance:
+            flags.append(f"{LABELS[key]} adds up to {format_amount(key, total)}, "
+                         f"{off:+.0%} off the {format_amount(key, goal)} target")
+    for key, name, total in zip(MACRO_COLUMNS, TOTAL_NAMES, macro_dict(totals).values()):
+        claimed = getattr(plan.totals, name)
+        if claimed is not None and abs(claimed - total) > tolerance * max(total, 1):
+            flags.append(f"Stated total {LABELS[key].lower()} {format_amount(key, claimed)}, "
+                         f"but the foods add up to {format_amount(key, total)}")
+    kcal_off = np.abs(stated[:, 3] - actual[:, 3]) > tolerance * np.maximum(actual[:, 3], 1)
+    for i in np.flatnonzero(computed & kcal_off):
+        flags.append(f"{items[i][1].name}: stated {stated[i, 3]:g} kcal, "
+                     f"the catalog gives {actual[i, 3]:.0f} kcal for {grams[i]:.0f}g")
+    for i in np.flatnonzero(~matched):
+        flags.append(f"{items[i][1].name}: not in the catalog, stated macros used")
+
+    return {
+        "items": [
+            {
+                "food": item.name,
+                "meal": meal_names[meal_index],
+                "catalog_food": name_index.catalog.description(row) if row is not None else None,
+                "match": method,
+                "grams": None if np.isnan(g) else round(float(g)),
+                **macro_dict(values),
+            }
+            for (meal_index, item), (row, method), g, values in zip(items, matches, grams, actual)
+        ],
+        "meals": {meal: macro_dict(values) for meal, values in zip(meal_names, per_meal)},
+        "totals": macro_dict(totals),
+        "deviation": {key: round(float(off), 4) for key, off in zip(MACRO_COLUMNS, deviation)},
+        "flags": flags,
+        "within_tolerance": bool((np.abs(deviation) <= tolerance).all()),
+    }
+
+
+def format_check(check):
+    """Recomputed totals and any flags, for the terminal"""
+    totals = check["totals"]
+    lines = ["Catalog totals: " + ", ".join(f"{LABELS[key]} {format_amount(key, value)}"
+                                              for key, value in totals.items())]
+    lines += [f"⚠️ {flag}" for flag in check["flags"]]
+    if not check["flags"]:
+        lines.append("✅ Matches the catalog and the targets")
+    return "\n".join(lines)
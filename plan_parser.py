@@ -0,0 +1,251 @@
+import re
+import numpy as np
+from hydration import WATER_DTYPE
+
+# --- Meal plan parser ---
+#
+# One compiled, line-anchored pattern classifies every line of a reply as a
+# section header, a target/total value, a water entry or a food item, so a
+# reply is parsed in a single pass without any pattern scanning past the end
+# of its line. The result is a ParsedPlan of small __slots__ records; lines
+# that look like data but don't parse are reported as ParseErrors with their
+# line number instead of being silently misread.
+
+NUMBER = r"\d+(?:\.\d+)?"
+MEAL_NAMES = ["Breakfast", "Lunch", "Dinner", "Snacks"]
+SECTION_NAMES = {
+    "water": "water",
+    "meal plan": "meals",
+    "total macros": "totals",
+    "totals": "totals",
+    "breakfast": "Breakfast",
+    "lunch": "Lunch",
+    "dinner": "Dinner",
+    "snack": "Snacks",
+    "snacks": "Snacks",
+}
+VALUE_KEYS = {"calorie": "calories", "protein": "protein", "carb": "carbs", "fat": "fats"}
+
+LINE = re.compile(
+    r"^\s*(?:[-*]\s*)?[*#]*\s*(?:"
+    # Section header, e.g. "Meal Plan:" or "**Breakfast:**"
+    r"(?P<header>water|meal plan|total macros|totals|breakfast|lunch|dinner|snacks?)\s*\**\s*:?\s*\**"
+    # Target or total, e.g. "Protein (g): 165" or "Calories: 2200 kcal"
+    r"|(?P<key>calorie|protein|carb|fat)(?:s|ies|ohydrates)?\s*(?:\(\s*g\s*\))?\s*\**\s*:\s*\**\s*"
+    rf"(?P<value>{NUMBER})\s*(?:g|kcal)?(?:\s*\([^)]*\))?"
+    # Water entry, e.g. "08:00 - 400ml"
+    rf"|(?P<hour>\d{{1,2}}):(?P<minute>\d{{2}})\s*[-:]\s*(?P<ml>{NUMBER})\s*ml"
+    # Food item, e.g. "- OATS (150g) - 13.2g protein, 67.7g carbs, 6.5g fats, 382 kcal"
+    rf"|(?P<food>.+?)(?:\s*\((?P<grams>{NUMBER})\s*g\))?(?:\s+-|\s*:)\s+(?P<protein>{NUMBER})\s*g\s+protein\s*,\s*"
+    rf"(?P<carbs>{NUMBER})\s*g\s+carb(?:s|ohydrates)?\s*,\s*(?P<fats>{NUMBER})\s*g\s+fats?\s*,\s*"
+    rf"(?P<kcal>{NUMBER})\s*kcal"
+    r")\s*\.?\s*$",
+    re.IGNORECASE,
+)
+# Lines that mention data but didn't match LINE are worth reporting
+DATA_HINT = re.compile(r"(?i)\d\s*(?:g\b|kcal|ml)|protein|calorie")
+
+
+class ParseError:
+    __slots__ = ("line_number", "line", "message")
+
+    def __init__(self, line_number, line, message):
+        self.line_number = line_number
+        self.line = line
+        self.message = message
+
+    def __repr__(self):
+        return f"line {self.line_number}: {self.message}: {self.line.strip()!r}"
+
+
+class PlanParseError(ValueError):
+    """Raised by parse_plan(strict=True) when a reply has malformed lines"""
+
+    def __init__(self, errors):
+        super().__init__("; ".join(map(repr, errors)))
+        self.errors = errors
+
+
+class Targets:
+    """Calories and macro grams; used for both the targets and the totals block"""
+    __slots__ = ("calories", "protein", "carbs", "fats")
+
+    def __init__(self, calories=None, protein=None, carbs=None, fats=None):
+        self.calories = calories
+        self.protein = protein
+        self.carbs = carbs
+        self.fats = fats
+
+    def __bool__(self):
+        return any(getattr(self, name) is not None for name in self.__slots__)
+
+    def apply(self, calorie_intake, macros):
+        """(calorie_intake, macros) with every value present here replaced"""
+        macros = dict(macros)
+        if self.calories is not None:
+            calorie_intake = int(self.calories)
+        for name, key in (("protein", "Protein (g)"), ("carbs", "Carbohydrates (g)"), ("fats", "Fats (g)")):
+            if getattr(self, name) is not None:
+                macros[key] = int(getattr(self, name))
+        return calorie_intake, macros
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class WaterEntry:
+    __slots__ = ("minute", "ml")
+
+    def __init__(self, minute, ml):
+        self.minute = minute
+        self.ml = ml
+
+    @property
+    def time(self):
+        return f"{self.minute // 60}:{self.minute % 60:02d}"
+
+
+class FoodItem:
+    __slots__ = ("name", "grams", "protein", "carbs", "fats", "kcal")
+
+    def __init__(self, name, grams, protein, carbs, fats, kcal):
+        self.name = name
+        self.grams = grams
+        self.protein = protein
+        self.carbs = carbs
+        self.fats = fats
+        self.kcal = kcal
+
+    def to_list(self):
+        return [self.name, self.grams, self.protein, self.carbs, self.fats, self.kcal]
+
+
+class Meal:
+    __slots__ = ("name", "items")
+
+    def __init__(self, name, items=None):
+        self.name = name
+        self.items = items or []
+
+
+class ParsedPlan:
+    __slots__ = ("targets", "water", "meals", "totals", "errors")
+
+    def __init__(self):
+        self.targets = Targets()
+        self.water = []
+        self.meals = {}
+        self.totals = Targets()
+        self.errors = []
+
+    def food_items(self):
+        return [item for meal in self.meals.values() for item in meal.items]
+
+    def food_macros(self):
+        """(n, 4) float array of protein, carbs, fats, kcal for every item"""
+        items = self.food_items()
+        if not items:
+            return np.zeros((0, 4))
+        return np.array([(item.protein, item.carbs, item.fats, item.kcal) for item in items], dtype=np.float64)
+
+    def water_schedule(self):
+        """WATER_DTYPE schedule of the water entries"""
+        return np.array([(entry.minute, entry.ml) for entry in self.water], dtype=WATER_DTYPE)
+
+    def to_dict(self):
+        """Compact JSON-ready form: food items as [name, grams, protein, carbs, fats, kcal]"""
+        return {
+            "targets": self.targets.to_dict(),
+            "water": [[entry.minute, entry.ml] for entry in self.water],
+            "meals": {name: [item.to_list() for item in meal.items] for name, meal in self.meals.items()},
+            "totals": self.totals.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        plan = cls()
+        plan.targets = Targets(**data.get("targets", {}))
+        plan.water = [WaterEntry(minute, ml) for minute, ml in data.get("water", [])]
+        plan.meals = {
+            name: Meal(name, [FoodItem(*item) for item in items]) for name, items in data.get("meals", {}).items()
+        }
+        plan.totals = Targets(**data.get("totals", {}))
+        return plan
+
+
+def number(text):
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+
+class PlanParser:
+    """Line-at-a-time tokenizer; feed lines in order, then read .plan"""
+
+    def __init__(self):
+        self.plan = ParsedPlan()
+        self.section = "targets"
+        self.meal = None
+        self.line_number = 0
+
+    def error(self, line, message):
+        self.plan.errors.append(ParseError(self.line_number, line, message))
+
+    def feed_line(self, line):
+        """Parse one line; returns the token kind (None for blank or unrecognized lines)"""
+        self.line_number += 1
+        if not line.strip():
+            return None
+        match = LINE.match(line)
+        if match is None:
+            if DATA_HINT.search(line):
+                self.error(line, "unrecognized line")
+            return None
+        plan = self.plan
+
+        if match.group("header"):
+            section = SECTION_NAMES[match.group("header").lower()]
+            if section in MEAL_NAMES:
+                self.meal = plan.meals.setdefault(section, Meal(section))
+                self.section = "meals"
+            else:
+                self.meal = None
+                self.section = section
+            return "header"
+
+        if match.group("key"):
+            block = plan.totals if self.section in ("totals", "meals") else plan.targets
+            setattr(block, VALUE_KEYS[match.group("key").lower()], number(match.group("value")))
+            return "value"
+
+        if match.group("hour"):
+            hour, minute = int(match.group("hour")), int(match.group("minute"))
+            if hour > 23 or minute > 59:
+                self.error(line, "invalid time")
+                return None
+            plan.water.append(WaterEntry(hour * 60 + minute, number(match.group("ml"))))
+            return "water"
+
+        if self.meal is None:
+            self.error(line, "food item outside a meal")
+            return None
+        grams = match.group("grams")
+        self.meal.items.append(FoodItem(
+            # Markdown emphasis around the name, e.g. "**TOFU STIR FRY** (200g)"
+            match.group("food").strip(" \t*#"),
+            number(grams) if grams else None,
+            number(match.group("protein")),
+            number(match.group("carbs")),
+            number(match.group("fats")),
+            number(match.group("kcal")),
+        ))
+        return "food"
+
+
+def parse_plan(text, strict=False):
+    """ParsedPlan for a whole reply"""
+    parser = PlanParser()
+    for line in text.splitlines():
+        parser.feed_line(line)
+    if strict and parser.plan.errors:
+        raise PlanParseError(parser.plan.errors)
+    return parser.plan
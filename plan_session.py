@@ -0,0 +1,285 @@
+import re
+import numpy as np
+from solver import (MACRO_COLUMNS, MEAL_SPLIT, SOLVER_FOODS, TOLERANCE, format_meal_plan, plan_item, polish_portions,
+                    solve_meal, solve_meal_plan, target_vector, totals_dict, within_tolerance)
+from plan_parser import MEAL_NAMES, parse_plan
+from prompt_builder import get_prompt_builder
+from name_index import load_name_index
+
+# --- Plan session ---
+#
+# The plan being customized, kept as structured meals between rounds of the
+# "make adjustments" loop instead of as reply text that has to be
+# regenerated whole. Simple requests are applied locally, re-solving only
+# what they touch:
+#   "increase protein", "less fat by 20g", "more calories to 2600"
+#       -> new targets (never below MIN_CALORIES / MIN_MACRO_GRAMS); the
+#          current portions are re-balanced, and the day is re-solved only if
+#          that can't reach them. Items the model gave without a portion get
+#          the grams their stated kcal imply for the catalog food; a plan with
+#          no portions at all goes to the LLM instead.
+#   "swap dinner", "new breakfast"
+#       -> that meal is re-solved against what the other meals leave over
+#   "no oats", "remove chicken"
+#       -> meals with a matching food are re-solved without it (and it stays
+#          excluded for later rounds)
+# Anything else goes to the LLM as a delta prompt: the current targets, a
+# one-line-per-meal summary and a small food table in, only the changed
+# targets/water/meals out (prompt_builder.delta). The reply is merged into
+# the session, so an unchanged meal is never re-sent or re-generated.
+
+ADJUST_STEP = 0.15
+MIN_CALORIES = 1200
+MIN_MACRO_GRAMS = 20
+DELTA_FOODS = 40
+DELTA_PASSAGES = 1
+
+MACRO_WORDS = {"protein": "Protein (g)", "carb": "Carbohydrates (g)", "fat": "Fats (g)", "calorie": None,
+               "kcal": None}
+KCAL_PER_GRAM = {"Protein (g)": 4, "Carbohydrates (g)": 4, "Fats (g)": 9}
+UP_WORDS = ("increase", "more", "raise", "higher", "boost", "up")
+
+MACRO_REQUEST = re.compile(
+    r"^\s*(?:please\s+)?(?P<direction>increase|more|raise|higher|boost|up|decrease|less|lower|reduce|cut|fewer|down)"
+    r"\s+(?:the\s+|my\s+)?(?P<macro>protein|carb|fat|calorie|kcal)(?:s|ies|ohydrates?)?"
+    r"(?:\s+(?P<mode>to|by)\s+(?P<amount>\d+(?:\.\d+)?)\s*(?P<unit>g|%|kcal)?)?\s*[.!]?\s*$",
+    re.IGNORECASE,
+)
+SWAP_REQUEST = re.compile(
+    r"^\s*(?:please\s+)?"
+    r"(?:(?:swap|replace|change|redo|switch)\s+(?:out\s+)?(?:the\s+|my\s+)?|(?:a\s+)?(?:new|different|another)\s+)"
+    r"(?P<meal>breakfast|lunch|dinner|snacks?)\s*[.!]?\s*$",
+    re.IGNORECASE,
+)
+EXCLUDE_REQUEST = re.compile(
+    r"^\s*(?:please\s+)?(?:no|remove|drop|without|exclude|skip)\s+(?:the\s+)?(?P<food>[a-z][a-z '-]*?)\s*[.!]?\s*$",
+    re.IGNORECASE,
+)
+
+
+def item_macros(items):
+    """(n, 4) protein, carbs, fats, kcal of each item's portion"""
+    if not items:
+        return np.zeros((0, 4))
+    return np.array([(item["protein"], item["carbs"], item["fats"], item["kcal"]) for item in items],
+                    dtype=np.float64)
+
+
+def from_parsed(meal):
+    return [{"food": item.name, "grams": item.grams, "protein": item.protein, "carbs": item.carbs,
+             "fats": item.fats, "kcal": item.kcal} for item in meal.items]
+
+
+class PlanSession:
+    def __init__(self, calorie_intake, macros, water_schedule, macro_index, prompt_foods=None, solver_foods=None,
+                 builder=None, tolerance=TOLERANCE, name_index=None):
+        self.calorie_intake = calorie_intake
+        self.macros = dict(macros)
+        self.water_schedule = water_schedule
+        self.macro_index = macro_index
+        # The foods the first prompt was built from; delta prompts draw on them again
+        self.prompt_foods = prompt_foods
+        self.builder = builder or get_prompt_builder()
+        self.tolerance = tolerance
+        self.meals = {meal: [] for meal in MEAL_SPLIT}
+        self.excluded = []
+        self.rounds = {"local": 0, "llm": 0}
+        self._pool = None
+        self._pool_key = None
+        self._name_index = name_index
+        if solver_foods is not None:
+            self._pool, self._pool_key = solver_foods, self._targets_key()
+
+    @property
+    def name_index(self):
+        # Only needed to infer portions the model left out
+        if self._name_index is None:
+            self._name_index = load_name_index(self.macro_index.catalog)
+        return self._name_index
+
+    def _targets_key(self):
+        return self.calorie_intake, tuple(sorted(self.macros.items()))
+
+    @property
+    def target(self):
+        return target_vector(self.calorie_intake, self.macros)
+
+    def load(self, text):
+        """Take the meals of a plan reply (or format_meal_plan text) as the current plan"""
+        plan = parse_plan(text)
+        self.meals = {meal: from_parsed(plan.meals[meal]) if meal in plan.meals else [] for meal in MEAL_NAMES}
+
+    def totals(self):
+        return item_macros([item for items in self.meals.values() for item in items]).sum(axis=0)
+
+    def plan(self):
+        totals = self.totals()
+        return {"meals": self.meals, "totals": totals_dict(totals),
+                "within_tolerance": within_tolerance(totals, self.target, self.tolerance)}
+
+    def text(self):
+        return format_meal_plan(self.plan())
+
+    # --- Local adjustments ---
+
+    def pool(self):
+        """Solver candidates for the current targets, without excluded foods"""
+        if self._pool is None or self._pool_key != self._targets_key():
+            self._pool = self.macro_index.query_frame(self.macros, k=SOLVER_FOODS)
+            self._pool_key = self._targets_key()
+        food_data = self._pool[self._pool["Calories"] > 0]
+        for word in self.excluded:
+            food_data = food_data[~food_data["Description"].str.contains(word, case=False, regex=False)]
+        return food_data
+
+    def apply_local(self, request):
+        """Apply a simple request without the LLM; returns what was done, or None to ask the LLM"""
+        match = MACRO_REQUEST.match(request)
+        if match:
+            change = self.change_target(**match.groupdict())
+        elif SWAP_REQUEST.match(request):
+            change = self.swap_meal(SWAP_REQUEST.match(request).group("meal"))
+        elif EXCLUDE_REQUEST.match(request):
+            change = self.exclude(EXCLUDE_REQUEST.match(request).group("food"))
+        else:
+            change = None
+        if change is not None:
+            self.rounds["local"] += 1
+        return change
+
+    def change_target(self, direction, macro, mode=None, amount=None, unit=None):
+        key = MACRO_WORDS[macro.lower()]
+        sign = 1 if direction.lower() in UP_WORDS else -1
+        current = self.calorie_intake if key is None else self.macros[key]
+        if amount is None:
+            new = current * (1 + sign * ADJUST_STEP)
+        elif mode == "to":
+            new = float(amount)
+        elif unit == "%":
+            new = current * (1 + sign * float(amount) / 100)
+        else:
+            new = current + sign * float(amount)
+        new = max(MIN_CALORIES if key is None else MIN_MACRO_GRAMS, round(new))
+
+        previous = self.calorie_intake, dict(self.macros)
+        if key is None:
+            # Calories: scale every macro with them
+            scale = new / max(self.calorie_intake, 1)
+            self.macros = {name: max(MIN_MACRO_GRAMS, round(grams * scale)) for name, grams in self.macros.items()}
+            self.calorie_intake = new
+        else:
+            self.set_macro(key, new)
+        how = self.rebalance()
+        if how is None:
+            # No portions to work with: leave the request to the LLM
+            self.calorie_intake, self.macros = previous
+            return None
+        label = "Calories" if key is None else key
+        return f"{label} target {current} -> {new}, {how}"
+
+    def set_macro(self, key, grams):
+        """New grams for one macro, with the calorie target moved by the kcal they add or remove"""
+        delta = grams - self.macros[key]
+        self.macros[key] = grams
+        self.calorie_intake = max(MIN_CALORIES, round(self.calorie_intake + delta * KCAL_PER_GRAM[key]))
+
+    def fill_portions(self, items):
+        """Grams for items stated without a portion, from their kcal and the catalog food"""
+        for item in items:
+            if item["grams"] or not item["kcal"]:
+                continue
+            row, _ = self.name_index.resolve(item["food"])
+            kcal_per_100g = float(self.macro_index.catalog.macros[row][3]) if row is not None else 0.0
+            if kcal_per_100g > 0:
+                item["grams"] = round(item["kcal"] * 100 / kcal_per_100g)
+
+    def rebalance(self):
+        """Fit the portions to the targets (re-solving the day if needed); what was done, or None"""
+        items = [item for meal_items in self.meals.values() for item in meal_items]
+        self.fill_portions(items)
+        adjustable = [i for i, item in enumerate(items) if item["grams"]]
+        if not adjustable:
+            return None
+        per_portion = item_macros(items)
+        fixed = np.delete(per_portion, adjustable, axis=0).sum(axis=0)
+        grams = np.array([items[i]["grams"] for i in adjustable], dtype=np.float64)
+        per_100g = per_portion[adjustable] * 100 / grams[:, None]
+        grams = polish_portions(per_100g, np.arange(len(adjustable)), grams, self.target - fixed)
+        for i, food, g in zip(adjustable, per_100g, grams):
+            items[i].update(plan_item(items[i]["food"], food, g))
+        if not within_tolerance(self.totals(), self.target, self.tolerance):
+            self.resolve()
+            return "day re-solved"
+        return "portions adjusted"
+
+    def resolve(self):
+        """Re-solve the whole day locally"""
+        self.meals = solve_meal_plan(self.pool(), self.calorie_intake, self.macros, self.tolerance)["meals"]
+
+    def solve_meals(self, meals):
+        """Re-solve just these meals for whatever the rest of the day leaves of the targets"""
+        food_data = self.pool()
+        foods = food_data[MACRO_COLUMNS].to_numpy(dtype=np.float64)
+        names = food_data["Description"].tolist()
+        kept = [item for meal, items in self.meals.items() if meal not in meals for item in items]
+        remaining = np.maximum(self.target - item_macros(kept).sum(axis=0), 0)
+        shares = np.array([MEAL_SPLIT[meal] for meal in meals])
+        # Foods already on the plan stay out of the new meals
+        used = {item["food"] for item in kept} | {item["food"] for meal in meals for item in self.meals[meal]}
+        exclude = [i for i, name in enumerate(names) if name in used]
+        for meal, share in zip(meals, shares / shares.sum()):
+            picks = solve_meal(foods, remaining * share, exclude=exclude)
+            rows = np.array([row for row, _ in picks], dtype=np.int64)
+            grams = polish_portions(foods, rows, [g for _, g in picks], remaining * share)
+            self.meals[meal] = [plan_item(names[row], foods[row], g) for row, g in zip(rows, grams)]
+            exclude += rows.tolist()
+
+    def swap_meal(self, meal):
+        meal = "Snacks" if meal.lower().startswith("snack") else meal.capitalize()
+        self.solve_meals([meal])
+        return f"new {meal.lower()}"
+
+    def exclude(self, word):
+        word = word.strip().lower()
+        meals = [meal for meal, items in self.meals.items() if any(word in item["food"].lower() for item in items)]
+        if not meals:
+            return None  # Not on the plan: let the LLM interpret it
+        self.excluded.append(word)
+        self.solve_meals(meals)
+        return f"removed {word} from {', '.join(meal.lower() for meal in meals)}"
+
+    # --- LLM adjustments ---
+
+    def delta_prompt(self, request, passages=None):
+        """Compact follow-up prompt: the plan as it stands plus the request"""
+        if self.excluded:
+            request = f"{request} (avoid: {', '.join(self.excluded)})"
+        food_data = self.prompt_foods if self.prompt_foods is not None else self.pool()
+        for word in self.excluded:
+            food_data = food_data[~food_data["Description"].str.contains(word, case=False, regex=False)]
+        food_data = food_data.iloc[:DELTA_FOODS]
+        return self.builder.delta(self.calorie_intake, self.macros, self.water_schedule, self.meals, request,
+                                  food_data, passages)
+
+    def apply_reply(self, text):
+        """Merge a delta reply; returns the names of the meals it replaced"""
+        plan = parse_plan(text)
+        old_key = self._targets_key()
+        if plan.targets.calories is not None:
+            self.calorie_intake, self.macros = plan.targets.apply(self.calorie_intake, self.macros)
+        else:
+            # Macros only: move the calories with them, as change_target does
+            _, macros = plan.targets.apply(self.calorie_intake, self.macros)
+            for key, grams in macros.items():
+                if grams != self.macros[key]:
+                    self.set_macro(key, grams)
+        if plan.water:
+            self.water_schedule = plan.water_schedule()
+        changed = [meal for meal in MEAL_NAMES if meal in plan.meals and plan.meals[meal].items]
+        for meal in changed:
+            self.meals[meal] = from_parsed(plan.meals[meal])
+        if not changed and self._targets_key() != old_key:
+            # New targets but no new meals: fit the current ones locally
+            self.rebalance()
+        self.rounds["llm"] += 1
+        return changed
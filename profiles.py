@@ -0,0 +1,79 @@
+import numpy as np
+from nutrition_batch import make_profiles, compute_targets
+from hydration import hydration_batch, to_runs
+from helper_functions import ACTIVITY_MULTIPLIERS, GOAL_FACTORS, GOAL_NAMES, get_exercise_water
+
+# --- Client profiles ---
+#
+# Validation of raw profile records (from a batch file or an API request)
+# and their conversion into planning tasks: targets and water schedules for
+# a list of profiles are computed together in a few vectorized calls. Shared
+# by batch_plan.py and service.py.
+
+PROFILE_FIELDS = ["id", "gender", "weight", "height", "age", "activity", "goal", "exercise_minutes",
+                  "wake_hour", "sleep_hour", "workout_hour"]
+DEFAULT_WAKE_HOUR = 7
+DEFAULT_SLEEP_HOUR = 23
+
+
+def validate(record):
+    """Typed profile, or raises ValueError naming the bad field"""
+    try:
+        profile = {
+            "id": record["id"],
+            "gender": str(record["gender"]).strip().lower(),
+            "weight": float(record["weight"]),
+            "height": float(record["height"]),
+            "age": float(record["age"]),
+            "activity": int(record["activity"]),
+            "goal": int(record["goal"]),
+            "exercise_minutes": float(record.get("exercise_minutes") or 0),
+            "wake_hour": int(record.get("wake_hour") or DEFAULT_WAKE_HOUR),
+            "sleep_hour": int(record.get("sleep_hour") or DEFAULT_SLEEP_HOUR),
+            "workout_hour": None if record.get("workout_hour") in ("", None) else int(record["workout_hour"]),
+        }
+    except KeyError as e:
+        raise ValueError(f"missing field {e.args[0]}") from None
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"invalid value: {e}") from None
+    if profile["weight"] <= 0 or profile["height"] <= 0 or profile["age"] <= 0:
+        raise ValueError("weight, height and age must be positive")
+    if profile["activity"] not in ACTIVITY_MULTIPLIERS:
+        raise ValueError("activity must be 1-5")
+    if profile["goal"] not in GOAL_FACTORS:
+        raise ValueError("goal must be 1, 2 or 3")
+    if not 0 <= profile["wake_hour"] <= 23 or not 0 <= profile["sleep_hour"] <= 23 \
+            or profile["wake_hour"] == profile["sleep_hour"]:
+        raise ValueError("wake_hour and sleep_hour must be different hours (0-23)")
+    if profile["workout_hour"] is not None and not 0 <= profile["workout_hour"] <= 23:
+        raise ValueError("workout_hour must be an hour (0-23)")
+    return profile
+
+
+def build_tasks(profiles):
+    """One task dict per profile with its targets and water schedule filled in"""
+    columns = {field: [profile[field] for profile in profiles] for field in PROFILE_FIELDS[1:8]}
+    targets = compute_targets(make_profiles(**columns))
+
+    exercise = np.array(columns["exercise_minutes"], dtype=np.float64)
+    workout = np.array([np.nan if p["workout_hour"] is None else p["workout_hour"] * 60 for p in profiles])
+    entries, offsets = hydration_batch(
+        targets["water_ml"],
+        [p["wake_hour"] * 60 for p in profiles],
+        [p["sleep_hour"] * 60 for p in profiles],
+        exercise_ml=get_exercise_water(exercise),
+        workout_start=workout,
+        workout_minutes=exercise,
+    )
+
+    tasks = []
+    for i, profile in enumerate(profiles):
+        calories, protein, carbs, fats, _ = targets[i].tolist()
+        tasks.append({
+            "id": profile["id"],
+            "goal": GOAL_NAMES[profile["goal"]],
+            "calorie_intake": calories,
+            "macros": {"Protein (g)": protein, "Carbohydrates (g)": carbs, "Fats (g)": fats},
+            "water_schedule": to_runs(entries[offsets[i]:offsets[i + 1]]),
+        })
+    return tasks
@@ -0,0 +1,219 @@
+import threading
+import numpy as np
+from hydration import as_entries, to_runs, format_time
+
+# --- Prompt builder ---
+#
+# Prompts are what we pay for on every LLM round trip, so they are kept
+# small:
+#   - foods go in a compact table (one "name|protein|carbs|fats|kcal" row
+#     per food, values per 100 g, rounded to 0.1 g), formatted a column at a
+#     time with pandas string ops instead of one f-string per iterrows() row
+#   - the water schedule is sent as runs ("7:00 every 60min x16: 240ml")
+#     instead of one entry per drink
+#   - the reply format is spelled out once, without the long list of things
+#     not to write
+#   - reference material is only the few passages knowledge_index picked for
+#     this request, never the whole txts/ folder
+#   - follow-up adjustments in a session (plan_session) send a one-line-per-
+#     meal summary of the current plan and ask for only what changes, with a
+#     smaller food table
+# Each prompt is fitted to a token budget: the fixed part is measured first
+# and the food table gets whatever is left, dropping the lowest-ranked foods
+# (query results come best-first). Every prompt and reply is counted so a
+# session's token use can be reported.
+#
+# Token counts are estimates (CHARS_PER_TOKEN characters per token), which
+# is close enough for budgeting without a tokenizer round trip per prompt.
+
+TOKEN_BUDGET = 1500
+DELTA_TOKEN_BUDGET = 700
+CHARS_PER_TOKEN = 4
+MIN_FOODS = 10
+
+FOOD_COLUMNS = ["Description", "Protein (g)", "Carbohydrates (g)", "Fats (g)", "Calories"]
+FOOD_HEADER = "Foods (name|protein g|carbs g|fats g|kcal, per 100g):\n"
+
+REPLY_RULES = (
+    "Reply with only the lines below, in plain text: no markdown, notes or introductions. "
+    "Use only the listed foods and give each portion in grams.\n"
+)
+MEAL_PLAN_FORMAT = (
+    "Meal Plan:\n"
+    "Breakfast:\n- Food (Ng) - Xg protein, Yg carbs, Zg fats, N kcal\n"
+    "Lunch:\n- ...\nDinner:\n- ...\nSnacks:\n- ...\n\n"
+    "Total Macros:\nProtein: Xg\nCarbs: Yg\nFats: Zg\nCalories: N kcal"
+)
+ADJUSTMENT_FORMAT = (
+    "Calories: N\nProtein (g): N\nCarbohydrates (g): N\nFats (g): N\n\n"
+    "Water:\nHH:MM - Nml\n...\n\n"
+    + MEAL_PLAN_FORMAT
+)
+DELTA_FORMAT = (
+    "Reply in plain text with only what changes; leave out unchanged meals and the totals. "
+    "Use only foods from the plan or the list, with portions in grams.\n"
+    "Changed targets, if any:\nCalories: N\nProtein (g): N\nCarbohydrates (g): N\nFats (g): N\n\n"
+    "Changed water schedule, if any:\nWater:\nHH:MM - Nml\n\n"
+    "Each changed meal in full:\nMeal Plan:\nDinner:\n- Food (Ng) - Xg protein, Yg carbs, Zg fats, N kcal"
+)
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def format_targets(calorie_intake, macros):
+    return (
+        f"Targets: {calorie_intake} kcal, protein {macros['Protein (g)']}g, "
+        f"carbs {macros['Carbohydrates (g)']}g, fats {macros['Fats (g)']}g\n"
+    )
+
+
+def format_water_runs(water_schedule):
+    """Water schedule as runs of equal, equally spaced drinks"""
+    runs = to_runs(as_entries(water_schedule))
+    return "; ".join(
+        f"{format_time(start)}{f' every {step}min x{count}' if count > 1 else ''}: {ml:g}ml"
+        for start, step, count, ml in runs
+    ) or "none"
+
+
+def format_plan_summary(meals):
+    """One line per meal, e.g. Lunch: OATS 150g, MILK 200g"""
+    lines = [
+        f"{meal}: " + ", ".join(
+            f"{item['food']} {item['grams']}g" if item["grams"] is not None else item["food"] for item in items
+        )
+        for meal, items in meals.items() if items
+    ]
+    return "Current plan:\n" + "".join(line + "\n" for line in lines)
+
+
+def format_passages(passages):
+    if not passages:
+        return ""
+    return "Reference notes:\n" + "".join(f"- {passage}\n" for passage in passages)
+
+
+def food_rows(food_data):
+    """pandas Series of compact table rows, one per food"""
+    names = food_data["Description"].astype(str).str.replace(r"[|\s]+", " ", regex=True).str.strip()
+    values = food_data[FOOD_COLUMNS[1:]].to_numpy(dtype=np.float64)
+    grams = [np.char.mod("%g", np.round(values[:, i], 1)) for i in range(3)]
+    kcal = np.char.mod("%d", np.round(values[:, 3]).astype(np.int64))
+    return names.str.cat([*grams, kcal], sep="|")
+
+
+def fit_rows(rows, token_budget):
+    """How many of rows (in order) fit in token_budget"""
+    if token_budget is None:
+        return len(rows)
+    # +1 for each row's newline
+    cumulative = np.cumsum(rows.str.len().to_numpy() + 1)
+    return int(np.searchsorted(cumulative, token_budget * CHARS_PER_TOKEN, side="right"))
+
+
+def food_table(food_data, token_budget=None, min_foods=MIN_FOODS):
+    """(table text, foods included) with as many foods as fit in token_budget"""
+    rows = food_rows(food_data)
+    count = max(min(min_foods, len(rows)), fit_rows(rows, token_budget))
+    return FOOD_HEADER + "".join(row + "\n" for row in rows.iloc[:count]), count
+
+
+def format_food_list(food_data):
+    """The whole frame as a compact table"""
+    return food_table(food_data)[0]
+
+
+class PromptBuilder:
+    def __init__(self, token_budget=TOKEN_BUDGET):
+        self.token_budget = token_budget
+        self.lock = threading.Lock()
+        self.counters = {"prompts": 0, "prompt_tokens": 0, "replies": 0, "reply_tokens": 0,
+                         "foods": 0, "foods_dropped": 0}
+        self.by_kind = {}
+        self.last = None
+
+    def fill(self, kind, before, food_data, after, token_budget=None):
+        """before + food table + after, with the table trimmed to the budget"""
+        token_budget = self.token_budget if token_budget is None else token_budget
+        fixed = estimate_tokens(before + FOOD_HEADER + after)
+        table, foods = food_table(food_data, max(0, token_budget - fixed) if token_budget else None)
+        prompt = before + table + after
+        self.record(kind, prompt, foods, len(food_data) - foods)
+        return prompt
+
+    def meal_plan(self, calorie_intake, macros, food_data, day_name=None, passages=None, token_budget=None):
+        before = (
+            format_targets(calorie_intake, macros)
+            + format_passages(passages)
+            + f"Create a full day's meal plan{f' for {day_name}' if day_name else ''} that meets the targets.\n"
+        )
+        return self.fill("meal_plan", before, food_data, "\n" + REPLY_RULES + MEAL_PLAN_FORMAT, token_budget)
+
+    def adjustment(self, calorie_intake, macros, water_schedule, custom_changes, food_data, passages=None,
+                   token_budget=None):
+        before = (
+            "Current " + format_targets(calorie_intake, macros)
+            + f"Current water: {format_water_runs(water_schedule)}\n"
+            + format_passages(passages)
+            + f"User request: {custom_changes}\n"
+            + "Update the targets, water and meal plan to fit the request.\n"
+        )
+        return self.fill("adjustment", before, food_data, "\n" + REPLY_RULES + ADJUSTMENT_FORMAT, token_budget)
+
+    def delta(self, calorie_intake, macros, water_schedule, meals, request, food_data, passages=None,
+              token_budget=None):
+        """Follow-up adjustment of a plan the model has already produced: summary in, changes out"""
+        before = (
+            "Current " + format_targets(calorie_intake, macros)
+            + f"Current water: {format_water_runs(water_schedule)}\n"
+            + format_plan_summary(meals)
+            + format_passages(passages)
+            + f"User request: {request}\n"
+            + "Change as little of the plan as the request needs.\n"
+        )
+        return self.fill("delta", before, food_data, "\n" + DELTA_FORMAT,
+                         DELTA_TOKEN_BUDGET if token_budget is None else token_budget)
+
+    def record(self, kind, prompt, foods=0, foods_dropped=0):
+        tokens = estimate_tokens(prompt)
+        with self.lock:
+            self.counters["prompts"] += 1
+            self.counters["prompt_tokens"] += tokens
+            self.counters["foods"] += foods
+            self.counters["foods_dropped"] += foods_dropped
+            kind_counters = self.by_kind.setdefault(kind, {"prompts": 0, "prompt_tokens": 0})
+            kind_counters["prompts"] += 1
+            kind_counters["prompt_tokens"] += tokens
+            self.last = {"kind": kind, "tokens": tokens, "foods": foods, "foods_dropped": foods_dropped}
+
+    def record_reply(self, text):
+        with self.lock:
+            self.counters["replies"] += 1
+            self.counters["reply_tokens"] += estimate_tokens(text)
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, total_tokens=self.counters["prompt_tokens"] + self.counters["reply_tokens"],
+                        by_kind={kind: dict(counters) for kind, counters in self.by_kind.items()})
+
+
+_default_builder = None
+
+
+def get_prompt_builder():
+    global _default_builder
+    if _default_builder is None:
+        _default_builder = PromptBuilder()
+    return _default_builder
+
+
+def build_meal_plan_prompt(calorie_intake, macros, food_data, day_name=None, passages=None, builder=None):
+    return (builder or get_prompt_builder()).meal_plan(calorie_intake, macros, food_data, day_name, passages)
+
+
+def build_adjustment_prompt(calorie_intake, macros, water_schedule, custom_changes, food_data, passages=None,
+                            builder=None):
+    return (builder or get_prompt_builder()).adjustment(calorie_intake, macros, water_schedule, custom_changes,
+                                                        food_data, passages)
@@ -0,0 +1,184 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from helper_functions import WEEKLY_SCHEDULE_PATH, load_weekly_schedule
+from week_planner import WEEK_DAYS
+from plan_parser import parse_plan
+from hydration import as_entries, to_runs
+
+# --- Schedule store ---
+#
+# Saved day plans live in one SQLite table keyed by (user, date), in WAL
+# mode so the CLI, the Kivy app and batch jobs can write concurrently
+# without clobbering each other. A save is a single-row upsert in its own
+# transaction, so its cost no longer grows with the stored history, and
+# "this week" is an index range read on the primary key.
+#
+# The old weekly_schedule.json (keyed by day name only) is imported once,
+# the first time the store is opened, with each day name mapped onto the
+# week the file was last written in. The import never overwrites a saved
+# (user, date): rows already in the store win.
+
+SCHEDULE_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schedule.sqlite3")
+DEFAULT_USER = os.environ.get("NUTRIAI_USER", "default")
+BUSY_TIMEOUT_MS = 5000
+
+
+def week_start(day=None):
+    """Monday of the week containing day (default: today)"""
+    day = day or date.today()
+    return day - timedelta(days=day.weekday())
+
+
+def next_date(day_name, today=None):
+    """The next date (today included) that falls on day_name"""
+    today = today or date.today()
+    return today + timedelta(days=(WEEK_DAYS.index(day_name) - today.weekday()) % 7)
+
+
+def upcoming_range(today=None, history_weeks=0):
+    """(start, end) covering this week so far, the next six days and any earlier weeks"""
+    today = today or date.today()
+    return week_start(today) - timedelta(weeks=history_weeks), today + timedelta(days=6)
+
+
+def encode_entry(entry):
+    water_schedule = to_runs(as_entries(entry.get("water_schedule")))
+    # The meal plan is parsed once here so readers get structured meals
+    plan = entry.get("plan") or parse_plan(entry.get("meal_plan", "")).to_dict()
+    return (
+        entry.get("meal_plan", ""),
+        json.dumps(water_schedule),
+        entry.get("calorie_intake"),
+        json.dumps(entry.get("macros", {})),
+        json.dumps(plan, separators=(",", ":")),
+    )
+
+
+def decode_entry(row):
+    meal_plan, water_schedule, calorie_intake, macros, plan = row
+    return {
+        "meal_plan": meal_plan,
+        "water_schedule": json.loads(water_schedule),
+        "calorie_intake": calorie_intake,
+        "macros": json.loads(macros),
+        "plan": json.loads(plan) if plan else parse_plan(meal_plan).to_dict(),
+    }
+
+
+class ScheduleStore:
+    def __init__(self, path=SCHEDULE_DB_PATH, legacy_path=WEEKLY_SCHEDULE_PATH):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.lock = threading.Lock()
+        self.local_writes = 0
+        self._db = None
+
+    @property
+    def db(self):
+        # Opened (and the legacy JSON imported) on first use
+        if self._db is None:
+            db = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False,
+                                 isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS plans ("
+                "user TEXT NOT NULL, date TEXT NOT NULL, meal_plan TEXT NOT NULL, "
+                "water_schedule TEXT NOT NULL, calorie_intake INTEGER, macros TEXT NOT NULL, "
+                "updated REAL NOT NULL, plan TEXT, PRIMARY KEY (user, date)) WITHOUT ROWID"
+            )
+            # Stores created before plans were kept in parsed form
+            if "plan" not in [column[1] for column in db.execute("PRAGMA table_info(plans)")]:
+                db.execute("ALTER TABLE plans ADD COLUMN plan TEXT")
+            db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._db = db
+            self._migrate_legacy()
+        return self._db
+
+    def _write(self, rows, meta=None, overwrite=True):
+        """Upsert [(user, date, entry)] (and any meta keys) in one transaction"""
+        now = time.time()
+        db = self.db
+        on_conflict = (
+            "DO UPDATE SET meal_plan = excluded.meal_plan, water_schedule = excluded.water_schedule, "
+            "calorie_intake = excluded.calorie_intake, macros = excluded.macros, plan = excluded.plan, "
+            "updated = excluded.updated"
+        ) if overwrite else "DO NOTHING"
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany(
+                "INSERT INTO plans (user, date, meal_plan, water_schedule, calorie_intake, macros, plan, updated) "
+                f"VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (user, date) {on_conflict}",
+                [(user, day.isoformat(), *encode_entry(entry), now) for user, day, entry in rows],
+            )
+            db.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (meta or {}).items())
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+        self.local_writes += 1
+
+    def save_day(self, day, entry, user=DEFAULT_USER):
+        with self.lock:
+            self._write([(user, day, entry)])
+
+    def save_days(self, entries, user=DEFAULT_USER):
+        """Save {date: entry} atomically"""
+        with self.lock:
+            self._write([(user, day, entry) for day, entry in entries.items()])
+
+    def get_day(self, day, user=DEFAULT_USER):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT meal_plan, water_schedule, calorie_intake, macros, plan FROM plans WHERE user = ? AND date = ?",
+                (user, day.isoformat()),
+            ).fetchone()
+        return decode_entry(row) if row else None
+
+    def range(self, start, end, user=DEFAULT_USER):
+        """{date: entry} for start <= date <= end, in date order"""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT date, meal_plan, water_schedule, calorie_intake, macros, plan FROM plans "
+                "WHERE user = ? AND date BETWEEN ? AND ? ORDER BY date",
+                (user, start.isoformat(), end.isoformat()),
+            ).fetchall()
+        return {date.fromisoformat(row[0]): decode_entry(row[1:]) for row in rows}
+
+    def week(self, day=None, user=DEFAULT_USER):
+        start = week_start(day)
+        return self.range(start, start + timedelta(days=6), user)
+
+    def version(self):
+        """Changes whenever any process (this one included) commits a write"""
+        with self.lock:
+            return self.db.execute("PRAGMA data_version").fetchone()[0], self.local_writes
+
+    def _migrate_legacy(self, user=DEFAULT_USER):
+        try:
+            stat = os.stat(self.legacy_path)
+        except FileNotFoundError:
+            return
+        if self._db.execute("SELECT 1 FROM meta WHERE key = 'legacy_stamp'").fetchone() is not None:
+            return  # Already imported once; later edits to the file are not ours to replay
+        monday = week_start(datetime.fromtimestamp(stat.st_mtime).date())
+        legacy = load_weekly_schedule(self.legacy_path)
+        self._write([
+            (user, monday + timedelta(days=WEEK_DAYS.index(day_name)), entry)
+            for day_name, entry in legacy.items()
+            if day_name in WEEK_DAYS
+        ], meta={"legacy_stamp": f"{stat.st_mtime_ns}:{stat.st_size}"}, overwrite=False)
+
+
+_default_store = None
+
+
+def get_schedule_store():
+    global _default_store
+    if _default_store is None:
+        _default_store = ScheduleStore()
+    return _default_store
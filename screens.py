@@ -9,7 +9,23 @@ from kivy.metrics import dp
 from kivy.clock import Clock
 from kivy.graphics import Color, Rectangle, Ellipse, RoundedRectangle
 from kivy.core.window import Window
-from components import TopBar, ProfileIconButton
+from kivy.logger import Logger
+from components import TopBar, ProfileIconButton, ChatHistoryView, ScheduleView
+import threading
+from catalog import CATALOG_CSV, FoodCatalog, catalog_dir, is_fresh
+from search_index import load_search_index
+from gemini_client import get_client
+from llm_cache import stream_text
+from helper_functions import build_chat_prompt
+from hydration import summarize as summarize_water
+from plan_parser import MEAL_NAMES
+from schedule_store import get_schedule_store, upcoming_range
+from ui_workers import UIWorkerPool
+from tracing import span, traced
+
+SUGGESTION_LIMIT = 10
+SCHEDULE_POLL_SECONDS = 1.0
+SCHEDULE_HISTORY_WEEKS = 12
 
 # [Keep all your existing screen classes exactly as they were]
 # Only the TopBar in components.py has been modified to include the profile icon
@@ -180,10 +196,90 @@ class DashboardScreen(Screen):
         self.food_input.text_input.hint_text = "Add food..."
         self.food_input.action_button.bind(on_press=self.add_food)
         
+        # Autocomplete suggestions; the buttons are created once and only
+        # relabelled on each keystroke so typing never builds widgets
+        self.suggestions = BoxLayout(
+            orientation='vertical',
+            size_hint_y=None,
+            height=0,
+            padding=(dp(10), 0))
+        self.suggestion_buttons = []
+        for _ in range(SUGGESTION_LIMIT):
+            suggestion = Button(
+                text='',
+                size_hint_y=None,
+                height=0,
+                opacity=0,
+                disabled=True,
+                shorten=True,
+                background_normal='',
+                background_color=(0.95, 0.95, 0.95, 1),
+                color=(0.2, 0.2, 0.2, 1))
+            suggestion.food = None
+            suggestion.bind(on_press=self.pick_suggestion)
+            self.suggestion_buttons.append(suggestion)
+            self.suggestions.add_widget(suggestion)
+        layout.add_widget(self.suggestions)
+        
         input_layout.add_widget(self.food_input)
         layout.add_widget(input_layout)
         
         self.add_widget(layout)
+        
+        # The index is memory-mapped from the catalog cache; load it off the
+        # UI thread in case the search index has to be built first
+        self.search_index = None
+        self._search_trigger = Clock.create_trigger(self.update_suggestions)
+        self.food_input.text_input.bind(text=lambda instance, value: self._search_trigger())
+        threading.Thread(target=self._load_search_index, daemon=True).start()
+    
+    @traced("ui.load_search_index")
+    def _load_search_index(self):
+        # Only an already current catalog: refreshing it is the backend's job,
+        # and a second writer here could race it. Autocomplete stays off until then.
+        try:
+            if not is_fresh(CATALOG_CSV):
+                Logger.info("Autocomplete: food catalog not built or out of date; suggestions off")
+                return
+            index = load_search_index(FoodCatalog(catalog_dir(CATALOG_CSV)))
+        except FileNotFoundError:
+            Logger.info("Autocomplete: food catalog CSV not found; suggestions off")
+            return
+        except Exception as e:
+            Logger.warning(f"Autocomplete: could not load the search index: {e}")
+            return
+        Clock.schedule_once(lambda dt: setattr(self, 'search_index', index))
+    
+    @traced("ui.update_suggestions")
+    def update_suggestions(self, dt):
+        query = self.food_input.text
+        results = []
+        if self.search_index is not None and query.strip():
+            results = self.search_index.search(query, limit=SUGGESTION_LIMIT)
+        
+        for i, suggestion in enumerate(self.suggestion_buttons):
+            food = results[i] if i < len(results) else None
+            suggestion.food = food
+            suggestion.text = f"{food['food']} ({food['kcal']} kcal)" if food else ''
+            suggestion.height = dp(30) if food else 0
+            suggestion.opacity = 1 if food else 0
+            suggestion.disabled = food is None
+        self.suggestions.height = dp(30) * len(results)
+    
+    def pick_suggestion(self, instance):
+        food = instance.food
+        if food is None:
+            return
+        food_entry = Label(
+            text=f"{food['food']}: {food['protein']}g protein, {food['carbs']}g carbs, "
+                 f"{food['fats']}g fats, {food['kcal']} kcal per 100g",
+            size_hint_y=None,
+            height=dp(30),
+            halign='left',
+            shorten=True
+        )
+        self.food_log.add_widget(food_entry)
+        self.food_input.text = ''
     
     def add_food(self, instance):
         food = self.food_input.text
@@ -197,95 +293,104 @@ class DashboardScreen(Screen):
             self.food_log.add_widget(food_entry)
             self.food_input.text = ''
 
+def day_rows(entry):
+    """(name, value) rows for one stored day"""
+    meals = entry["plan"]["meals"]
+    rows = [
+        (f"{meal}:", ", ".join(item[0] for item in meals[meal]) or "-")
+        for meal in MEAL_NAMES if meal in meals
+    ]
+    rows.append(("Water:", summarize_water(entry.get("water_schedule"))))
+    macros = entry.get("macros", {})
+    rows.append(("Targets:", (
+        f"{entry.get('calorie_intake', '?')} kcal, {macros.get('Protein (g)', '?')}g protein, "
+        f"{macros.get('Carbohydrates (g)', '?')}g carbs, {macros.get('Fats (g)', '?')}g fats"
+    )))
+    totals = entry["plan"]["totals"]
+    if totals.get("calories") is not None:
+        rows.append(("Planned:", (
+            f"{totals['calories']} kcal, {totals.get('protein', '?')}g protein, "
+            f"{totals.get('carbs', '?')}g carbs, {totals.get('fats', '?')}g fats"
+        )))
+    return rows
+
+def day_title(day):
+    return f"{day:%A}, {day:%b} {day.day}"
+
 class ScheduleScreen(Screen):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         layout = BoxLayout(orientation='vertical')
         
-        # Schedule content
-        scroll = ScrollView()
-        content = BoxLayout(
-            orientation='vertical',
-            size_hint_y=None,
-            spacing=dp(15),
-            padding=dp(15))
-        content.bind(minimum_height=content.setter('height'))
-        
-        days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-        meals = ["Breakfast", "Lunch", "Dinner", "Snacks"]
-        
-        for day in days:
-            day_card = BoxLayout(
-                orientation='vertical',
-                size_hint_y=None,
-                height=dp(150),
-                spacing=dp(5),
-                padding=dp(10))
-            
-            title = Label(
-                text=day,
-                size_hint_y=None,
-                height=dp(30),
-                color=(0.2, 0.6, 0.8, 1),
-                bold=True
-            )
-            day_card.add_widget(title)
-            
-            for meal in meals:
-                meal_layout = BoxLayout(
-                    orientation='horizontal',
-                    size_hint_y=None,
-                    height=dp(25))
-                
-                meal_label = Label(
-                    text=f"{meal}:",
-                    size_hint_x=0.3,
-                    halign='left'
-                )
-                
-                meal_entry = Label(
-                    text=f"Sample {meal.lower()} meal",
-                    size_hint_x=0.7,
-                    halign='left',
-                    color=(0.4, 0.4, 0.4, 1)
-                )
-                
-                meal_layout.add_widget(meal_label)
-                meal_layout.add_widget(meal_entry)
-                day_card.add_widget(meal_layout)
-            
-            content.add_widget(day_card)
-        
-        scroll.add_widget(content)
-        layout.add_widget(scroll)
+        # Schedule content: one recycled card per stored day, filled from
+        # the schedule store when the screen is first shown
+        self.schedule_view = ScheduleView()
+        layout.add_widget(self.schedule_view)
         self.add_widget(layout)
+        
+        self.store = get_schedule_store()
+        self.schedule = {}
+        self.day_order = []
+        self.poll_stop = None
+    
+    def on_enter(self, *args):
+        # Every store call (version checks included) happens on the poller
+        # thread: the store lock and SQLite's busy wait never reach the UI
+        self.poll_stop = threading.Event()
+        threading.Thread(target=self._poll_schedule, args=(self.poll_stop,), daemon=True).start()
+    
+    def on_leave(self, *args):
+        if self.poll_stop is not None:
+            self.poll_stop.set()
+            self.poll_stop = None
+    
+    def _poll_schedule(self, stop):
+        """Reload the schedule whenever something has been committed since the last load"""
+        loaded = None
+        while not stop.is_set():
+            # The first load opens the store (and may import the legacy JSON)
+            version = self.store.version()
+            if version != loaded:
+                self._load_schedule()
+                loaded = version
+            stop.wait(SCHEDULE_POLL_SECONDS)
+    
+    @traced("ui.load_schedule")
+    def _load_schedule(self):
+        schedule = self.store.range(*upcoming_range(history_weeks=SCHEDULE_HISTORY_WEEKS))
+        Clock.schedule_once(lambda dt: self.apply_schedule(schedule))
+    
+    @traced("ui.apply_schedule")
+    def apply_schedule(self, schedule):
+        day_order = list(schedule)
+        if day_order != self.day_order:
+            self.schedule_view.show_days([(day_title(day), day_rows(schedule[day])) for day in day_order])
+        else:
+            # Same days as before: re-render only the ones whose entry changed
+            self.schedule_view.update_days([
+                (index, day_title(day), day_rows(schedule[day]))
+                for index, day in enumerate(day_order)
+                if schedule[day] != self.schedule.get(day)
+            ])
+        self.schedule = schedule
+        self.day_order = day_order
 
 class ChatScreen(Screen):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         layout = BoxLayout(orientation='vertical')
         
-        # Chat content
-        scroll = ScrollView()
-        self.chat_history = BoxLayout(
-            orientation='vertical',
-            size_hint_y=None,
-            spacing=dp(10),
-            padding=dp(15))
-        self.chat_history.bind(minimum_height=self.chat_history.setter('height'))
+        # Chat content: recycled rows, so the widget count stays bounded
+        self.chat_history = ChatHistoryView()
         
         # Welcome message
-        welcome_msg = Label(
-            text="Welcome to NutriAI!\nHow can I help with your nutrition today?",
-            size_hint_y=None,
-            height=dp(80),
+        self.chat_history.add_message(
+            "Welcome to NutriAI!\nHow can I help with your nutrition today?",
             halign='center',
-            color=(0.2, 0.2, 0.2, 1)
+            min_height=dp(80)
         )
-        self.chat_history.add_widget(welcome_msg)
         
-        scroll.add_widget(self.chat_history)
-        layout.add_widget(scroll)
+        layout.add_widget(self.chat_history)
         
         # Message input with circular send button
         input_layout = BoxLayout(
@@ -301,35 +406,75 @@ class ChatScreen(Screen):
         layout.add_widget(input_layout)
         
         self.add_widget(layout)
+        
+        self.workers = UIWorkerPool()
+        self.active_job = None
     
+    @traced("ui.send_message")
     def send_message(self, instance):
         message = self.user_input.text
         if message.strip():
             # Add user message
-            user_msg = Label(
-                text=message,
-                size_hint_y=None,
-                height=dp(40),
-                halign='right',
-                color=(0.2, 0.2, 0.2, 1)
-            )
-            self.chat_history.add_widget(user_msg)
+            self.chat_history.add_message(message, halign='right')
             self.user_input.text = ''
             
-            # Simulate AI response
-            self.simulate_ai_response(message)
+            # A new message supersedes the reply that is still streaming
+            if self.active_job is not None and not self.active_job.done:
+                self.active_job.cancel()
+                self.active_job.stop_pending()
+                message_id = self.active_job.message_id
+                text = self.chat_history.message_text(message_id)
+                self.chat_history.update_message(message_id, (text + " (stopped)").strip())
+            self.request_ai_response(message)
     
-    def simulate_ai_response(self, message):
-        def add_response(dt):
-            response = Label(
-                text="I'm your NutriAI assistant. Let me help with your nutrition goals!",
-                size_hint_y=None,
-                height=dp(40),
-                halign='left',
-                color=(0.2, 0.2, 0.2, 1)
-            )
-            self.chat_history.add_widget(response)
-        Clock.schedule_once(add_response, 0.5)
+    def request_ai_response(self, message):
+        history = self.chat_history
+        message_id = history.add_message("")
+        reply = {"text": ""}
+        
+        # Pending indicator until the first chunk arrives
+        dots = {"count": 0}
+        def animate(dt):
+            dots["count"] = dots["count"] % 3 + 1
+            history.update_message(message_id, "•" * dots["count"], streaming=True)
+        animate(0)
+        pending = Clock.schedule_interval(animate, 0.3)
+        
+        def stop_pending():
+            # The reply is complete (or stopped): measure it once, for good
+            pending.cancel()
+            history.update_message(message_id, reply["text"])
+        
+        def on_chunk(text):
+            pending.cancel()
+            reply["text"] += text
+            history.update_message(message_id, reply["text"], streaming=True)
+        
+        def on_result(result):
+            stop_pending()
+        
+        def on_error(error):
+            stop_pending()
+            reply["text"] += f"\n⚠️ Error generating response: {error}"
+            history.update_message(message_id, reply["text"].strip())
+        
+        def work(job):
+            # Runs on a worker thread: the chat prompt asks for plain text,
+            # so there is nothing to parse, only chunks to pass on
+            with span("ui.chat_reply"):
+                stream = stream_text(get_client(), build_chat_prompt(message))
+                try:
+                    for chunk in stream:
+                        if job.cancelled:
+                            break
+                        job.emit(chunk)
+                finally:
+                    stream.close()
+        
+        job = self.workers.submit(work, on_chunk=on_chunk, on_result=on_result, on_error=on_error)
+        job.message_id = message_id
+        job.stop_pending = stop_pending
+        self.active_job = job
 
 class ProfileScreen(Screen):
     def __init__(self, **kwargs):
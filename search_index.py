@@ -0,0 +1,219 @@
+import bisect
+import json
+import os
+import re
+import unicodedata
+import numpy as np
+from catalog import map_file
+
+# --- Food search index ---
+#
+# Built once per catalog and persisted next to it:
+#   search_names.bin / search_offsets.i64   normalized descriptions (ascii, lower case)
+#   search_rows.i64                         catalog row id of each normalized name
+#   prefix_order.i32                        names sorted, for prefix range lookups
+#   trigram_codes.i32 / trigram_starts.i64  sorted trigram codes and their posting ranges
+#   trigram_rows.i32                        posting lists (positions into search_rows)
+# A query takes whole-description prefix matches from the sorted array,
+# pulls candidates from the rarest trigram posting lists, and ranks them by
+# how many of the query's trigrams they contain, so a typo only costs the
+# few trigrams it touches.
+
+NAMES_FILE = "search_names.bin"
+OFFSETS_FILE = "search_offsets.i64"
+ROWS_FILE = "search_rows.i64"
+PREFIX_FILE = "prefix_order.i32"
+CODES_FILE = "trigram_codes.i32"
+STARTS_FILE = "trigram_starts.i64"
+POSTINGS_FILE = "trigram_rows.i32"
+INDEX_META_FILE = "search_index.json"
+
+BUILD_BATCH_ROWS = 100_000
+PREFIX_LIMIT = 50
+MAX_POSTINGS = 50_000
+RESCORE_LIMIT = 200
+
+
+def normalize_description(text):
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode("ascii").lower()
+    return " ".join(re.findall(r"[a-z0-9]+", text))
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def trigram_code(gram):
+    a, b, c = gram.encode("ascii")
+    return (a << 16) | (b << 8) | c
+
+
+class SortedNames:
+    """Sequence view of the names in prefix order, for bisect"""
+
+    def __init__(self, index):
+        self.index = index
+
+    def __len__(self):
+        return len(self.index.prefix_order)
+
+    def __getitem__(self, i):
+        return self.index.name(self.index.prefix_order[i])
+
+
+class FoodSearchIndex:
+    def __init__(self, catalog, arrays):
+        self.catalog = catalog
+        # Plain ndarray views of the maps: same pages, no np.memmap indexing overhead
+        for name, value in arrays.items():
+            setattr(self, name, np.asarray(value))
+        self.sorted_names = SortedNames(self)
+
+    @classmethod
+    def build(cls, catalog):
+        rows = catalog.rows
+        normalized = [normalize_description(catalog.description(i)).encode("ascii") for i in rows]
+        lengths = np.array([len(n) for n in normalized], dtype=np.int64)
+        offsets = np.zeros(len(normalized) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        blob = b"".join(normalized)
+        prefix_order = np.array(sorted(range(len(normalized)), key=normalized.__getitem__), dtype=np.int32)
+
+        # Trigrams of " name " for every row, computed a batch of rows at a time
+        pairs = []
+        for lo in range(0, len(normalized), BUILD_BATCH_ROWS):
+            batch = normalized[lo:lo + BUILD_BATCH_ROWS]
+            padded = np.frombuffer(b"".join(b" " + n + b" " for n in batch), dtype=np.uint8).astype(np.int64)
+            sizes = lengths[lo:lo + len(batch)] + 2
+            owner = np.repeat(np.arange(lo, lo + len(batch), dtype=np.int64), sizes)
+            position = np.arange(len(padded)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+            valid = position <= np.repeat(sizes, sizes) - 3
+            starts = np.flatnonzero(valid)
+            codes = (padded[starts] << 16) | (padded[starts + 1] << 8) | padded[starts + 2]
+            pairs.append(np.unique((codes << 32) | owner[starts]))
+        pairs = np.sort(np.concatenate(pairs)) if pairs else np.zeros(0, dtype=np.int64)
+
+        pair_codes = (pairs >> 32).astype(np.int32)
+        codes, first = np.unique(pair_codes, return_index=True)
+        return cls(catalog, {
+            "names": np.frombuffer(blob, dtype=np.uint8),
+            "offsets": offsets,
+            "rows": np.asarray(rows, dtype=np.int64),
+            "prefix_order": prefix_order,
+            "codes": codes.astype(np.int32),
+            "starts": np.append(first, len(pairs)).astype(np.int64),
+            "postings": (pairs & 0xFFFFFFFF).astype(np.int32),
+        })
+
+    def save(self):
+        cache_dir = self.catalog.cache_dir
+        for file_name, attr in FILES:
+            getattr(self, attr).tofile(os.path.join(cache_dir, file_name))
+        with open(os.path.join(cache_dir, INDEX_META_FILE), "w") as f:
+            json.dump({"catalog": self.catalog.meta, "sizes": {attr: len(getattr(self, attr)) for _, attr in FILES}}, f)
+
+    def name(self, i):
+        return self.names[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("ascii")
+
+    def _prefix_candidates(self, query):
+        lo = bisect.bisect_left(self.sorted_names, query)
+        hi = bisect.bisect_left(self.sorted_names, query + "\x7f", lo)
+        return self.prefix_order[lo:min(hi, lo + PREFIX_LIMIT)].tolist()
+
+    def _trigram_candidates(self, grams):
+        wanted = np.array(sorted(trigram_code(g) for g in grams), dtype=np.int32)
+        pos = np.searchsorted(self.codes, wanted)
+        found = pos < len(self.codes)
+        found[found] = self.codes[pos[found]] == wanted[found]
+        pos = pos[found]
+        ranges = sorted(((int(self.starts[p]), int(self.starts[p + 1])) for p in pos), key=lambda r: r[1] - r[0])
+
+        # Rarest lists first, until the posting budget is spent
+        chosen, total = [], 0
+        for start, end in ranges:
+            if chosen and total + end - start > MAX_POSTINGS:
+                break
+            end = min(end, start + MAX_POSTINGS)
+            chosen.append(self.postings[start:end])
+            total += end - start
+        if not chosen:
+            return []
+        hits, counts = np.unique(np.concatenate(chosen), return_counts=True)
+        return hits[np.argsort(-counts, kind="stable")[:RESCORE_LIMIT]].tolist()
+
+    def search(self, query, limit=10):
+        """Ranked, typo-tolerant matches for query, each carrying the food's macros"""
+        query = normalize_description(query)
+        if not query:
+            return []
+        grams = trigrams(" " + query)
+        candidates = set(self._prefix_candidates(query))
+        if grams:
+            candidates.update(self._trigram_candidates(grams))
+
+        scored = []
+        for i in candidates:
+            name = self.name(i)
+            padded = " " + name + " "
+            score = sum(gram in padded for gram in grams) / len(grams) if grams else 0.0
+            if name.startswith(query):
+                score += 1.0
+            elif (" " + query) in (" " + name):
+                score += 0.5
+            scored.append((score - 0.002 * len(name), i))
+        scored.sort(reverse=True)
+
+        results = []
+        for score, i in scored[:limit]:
+            row = int(self.rows[i])
+            protein, carbs, fats, kcal = self.catalog.macros[row].tolist()
+            results.append({
+                "row": row,
+                "food": self.catalog.description(row),
+                "protein": round(protein, 2),
+                "carbs": round(carbs, 2),
+                "fats": round(fats, 2),
+                "kcal": round(kcal),
+                "score": round(score, 3),
+            })
+        return results
+
+
+FILES = [
+    (NAMES_FILE, "names"),
+    (OFFSETS_FILE, "offsets"),
+    (ROWS_FILE, "rows"),
+    (PREFIX_FILE, "prefix_order"),
+    (CODES_FILE, "codes"),
+    (STARTS_FILE, "starts"),
+    (POSTINGS_FILE, "postings"),
+]
+DTYPES = {
+    "names": np.uint8,
+    "offsets": np.int64,
+    "rows": np.int64,
+    "prefix_order": np.int32,
+    "codes": np.int32,
+    "starts": np.int64,
+    "postings": np.int32,
+}
+
+
+def load_search_index(catalog):
+    """Memory-map the persisted index for this catalog, rebuilding it when stale"""
+    cache_dir = catalog.cache_dir
+    try:
+        with open(os.path.join(cache_dir, INDEX_META_FILE), "r") as f:
+            meta = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        meta = None
+
+    if meta is None or meta.get("catalog") != catalog.meta:
+        index = FoodSearchIndex.build(catalog)
+        index.save()
+        return index
+
+    return FoodSearchIndex(catalog, {
+        attr: map_file(cache_dir, file_name, DTYPES[attr], (meta["sizes"][attr],))
+        for file_name, attr in FILES
+    })
@@ -0,0 +1,373 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from functools import partial
+from urllib.parse import urlsplit, parse_qs
+from helper_functions import IncrementalPlanParser
+from prompt_builder import build_meal_plan_prompt, build_adjustment_prompt, get_prompt_builder
+from catalog import CATALOG_CSV, load_catalog
+from macro_index import load_macro_index
+from solver import SOLVER_FOODS, solve_meal_plan, format_meal_plan
+from plan_parser import parse_plan
+from hydration import as_entries, to_runs
+from profiles import validate, build_tasks
+from week_planner import WEEK_DAYS, generate_text_async
+from gemini_client import get_client
+from llm_cache import get_response_cache
+from llm_transport import LLMUnavailableError, get_transport
+from schedule_store import DEFAULT_USER, get_schedule_store, next_date, upcoming_range
+from knowledge_index import get_knowledge_index, plan_query
+from tracing import get_tracer, span
+from name_index import load_name_index
+from plan_check import check_plan
+
+# --- Planning service ---
+#
+# The planning pipeline over a small JSON HTTP API, on asyncio streams with
+# no web framework:
+#
+#   POST /targets    profile                                  -> targets + water schedule
+#   POST /plan       calorie_intake, macros[, goal]            -> meal plan
+#   POST /adjust     calorie_intake, macros, water_schedule,
+#                    request[, goal]                           -> updated targets + meal plan
+#                    (LLM plans also carry "check": catalog-recomputed totals and flags)
+#   GET  /schedule   ?user=&start=&end=                        -> {date: saved plan}
+#   PUT  /schedule   user, date or day, plan fields            -> saved date
+#   GET  /health                                               -> counters
+#   GET  /metrics                                              -> tracing histograms (Prometheus text)
+#
+# The catalog, macro index and food name index (with the search index for
+# reworded names) are loaded once at startup and stay resident.
+# Solver and schedule-store work runs on the service's thread pool, and
+# response-cache lookups on asyncio's default one (week_planner), so the
+# event loop only parses requests and waits. Every LLM call shares the one
+# genai client (and its async connection pool), the response cache and the
+# transport's retry/breaker policy, with at most LLM_CONCURRENCY calls in
+# flight.
+#
+# Backpressure: once MAX_IN_FLIGHT requests are being handled, new ones are
+# answered 503 with Retry-After straight away instead of queueing without
+# bound. To load-test offline, point GEMINI_BASE_URL at stub_llm_server.py
+# and run load_test.py against this service.
+
+MAX_IN_FLIGHT = 64
+LLM_CONCURRENCY = 16
+WORKER_THREADS = min(8, os.cpu_count() or 1)
+MAX_BODY_BYTES = 1024 * 1024
+KEEPALIVE_SECONDS = 15.0
+RETRY_AFTER_SECONDS = 1
+PROMPT_FOODS = 100
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+MACRO_KEYS = ["Protein (g)", "Carbohydrates (g)", "Fats (g)"]
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+def read_targets(body):
+    """(calorie_intake, macros) from a request body, or raises HTTPError 400"""
+    try:
+        calorie_intake = int(body["calorie_intake"])
+        macros = {key: int(body["macros"][key]) for key in MACRO_KEYS}
+    except KeyError as e:
+        raise HTTPError(400, f"missing field {e.args[0]}") from None
+    except (TypeError, ValueError):
+        raise HTTPError(400, "calorie_intake and macros must be numbers") from None
+    if calorie_intake <= 0 or min(macros.values()) < 0:
+        raise HTTPError(400, "targets must be positive")
+    return calorie_intake, macros
+
+
+def read_date(value, name):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise HTTPError(400, f"{name} must be an ISO date (YYYY-MM-DD)") from None
+
+
+def plan_response(text, source, within_tolerance=None):
+    return {
+        "meal_plan": text,
+        "plan": parse_plan(text).to_dict(),
+        "source": source,
+        "within_tolerance": within_tolerance,
+    }
+
+
+class PlanningService:
+    def __init__(self, csv_path=CATALOG_CSV, store=None, client=None, max_in_flight=MAX_IN_FLIGHT,
+                 llm_concurrency=LLM_CONCURRENCY, worker_threads=WORKER_THREADS):
+        self.csv_path = csv_path
+        self.store = store or get_schedule_store()
+        self.client = client
+        self.max_in_flight = max_in_flight
+        self.llm_concurrency = llm_concurrency
+        self.executor = ThreadPoolExecutor(max_workers=worker_threads, thread_name_prefix="plan")
+        self.macro_index = None
+        self.name_index = None
+        self.llm_slots = None
+        self.in_flight = 0
+        self.started = time.time()
+        self.counters = {"requests": 0, "rejected": 0, "errors": 0, "llm_calls": 0, "llm_fallbacks": 0}
+        self.routes = {
+            ("POST", "/targets"): self.targets,
+            ("POST", "/plan"): self.plan,
+            ("POST", "/adjust"): self.adjust,
+            ("GET", "/schedule"): self.get_schedule,
+            ("PUT", "/schedule"): self.put_schedule,
+            ("GET", "/health"): self.health,
+            ("GET", "/metrics"): self.metrics,
+        }
+
+    async def start(self, host="127.0.0.1", port=8080):
+        """Load the catalog and start listening; returns the asyncio server"""
+        self.llm_slots = asyncio.Semaphore(self.llm_concurrency)
+        self.macro_index = await self.run(lambda: load_macro_index(load_catalog(self.csv_path)))
+        self.name_index = await self.run(load_name_index, self.macro_index.catalog)
+        self.client = self.client or get_client()
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def run(self, fn, *args, **kwargs):
+        """fn(*args, **kwargs) on the worker threads"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, partial(fn, *args, **kwargs))
+
+    async def generate(self, prompt):
+        async with self.llm_slots:
+            self.counters["llm_calls"] += 1
+            text = await generate_text_async(self.client, prompt)
+        get_prompt_builder().record_reply(text)
+        return text
+
+    # --- HTTP ---
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line.strip():
+                    break
+                keep_alive = await self.handle_request(request_line, reader, writer)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle_request(self, request_line, reader, writer):
+        """Read one request and write its response; returns whether to keep the connection"""
+        method, target, version = request_line.decode("latin-1").split()
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        keep_alive = (headers.get("connection", "").lower() != "close") and version == "HTTP/1.1"
+
+        length = int(headers.get("content-length") or 0)
+        if length > MAX_BODY_BYTES:
+            self.respond(writer, 413, {"error": "request body too large"}, keep_alive=False)
+            return False
+        raw = await reader.readexactly(length) if length else b""
+
+        self.counters["requests"] += 1
+        if self.in_flight >= self.max_in_flight:
+            self.counters["rejected"] += 1
+            self.respond(writer, 503, {"error": "too many requests in flight"}, keep_alive,
+                         {"Retry-After": str(RETRY_AFTER_SECONDS)})
+            return keep_alive
+
+        self.in_flight += 1
+        try:
+            url = urlsplit(target)
+            handler = self.routes.get((method, url.path))
+            if handler is None:
+                known = any(path == url.path for _, path in self.routes)
+                raise HTTPError(405 if known else 404, f"{method} {url.path} is not supported")
+            try:
+                body = json.loads(raw) if raw else {}
+            except ValueError:
+                raise HTTPError(400, "request body is not valid JSON") from None
+            if not isinstance(body, dict):
+                raise HTTPError(400, "request body must be a JSON object")
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            with span(f"http {method} {url.path}"):
+                status, response, extra = 200, await handler(body, query), {}
+        except HTTPError as e:
+            status, response, extra = e.status, {"error": e.message}, e.headers
+        except Exception as e:
+            self.counters["errors"] += 1
+            status, response, extra = 500, {"error": f"{type(e).__name__}: {e}"}, {}
+        finally:
+            self.in_flight -= 1
+        self.respond(writer, status, response, keep_alive, extra)
+        return keep_alive
+
+    def respond(self, writer, status, body, keep_alive=True, headers=None):
+        """JSON for dicts; str bodies go out as plain text"""
+        if isinstance(body, str):
+            payload, content_type = body.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            payload, content_type = json.dumps(body).encode("utf-8"), "application/json"
+        lines = [
+            f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(payload)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + payload)
+
+    # --- Endpoints ---
+
+    async def targets(self, body, query):
+        try:
+            profile = validate(dict(body, id=str(body.get("id", "profile"))))
+        except ValueError as e:
+            raise HTTPError(400, str(e)) from None
+        task = build_tasks([profile])[0]
+        del task["id"]
+        return task
+
+    def solve(self, calorie_intake, macros):
+        food_data = self.macro_index.query_frame(macros, k=SOLVER_FOODS)
+        return solve_meal_plan(food_data, calorie_intake, macros)
+
+    def prompt_foods(self, macros):
+        return self.macro_index.query_frame(macros, k=PROMPT_FOODS)
+
+    def check(self, text, calorie_intake, macros):
+        return check_plan(parse_plan(text), calorie_intake, macros, self.name_index)
+
+    async def plan(self, body, query):
+        calorie_intake, macros = read_targets(body)
+        local_plan = await self.run(self.solve, calorie_intake, macros)
+        if local_plan["within_tolerance"] or not body.get("use_llm", True):
+            return plan_response(format_meal_plan(local_plan), "local", local_plan["within_tolerance"])
+
+        food_data = await self.run(self.prompt_foods, macros)
+        passages = await self.run(get_knowledge_index().passages, plan_query(macros, body.get("goal")))
+        try:
+            text = await self.generate(build_meal_plan_prompt(calorie_intake, macros, food_data, passages=passages))
+        except LLMUnavailableError:
+            self.counters["llm_fallbacks"] += 1
+            return plan_response(format_meal_plan(local_plan), "local-fallback", False)
+        check = await self.run(self.check, text, calorie_intake, macros)
+        return dict(plan_response(text, "llm", check["within_tolerance"]), check=check)
+
+    async def adjust(self, body, query):
+        calorie_intake, macros = read_targets(body)
+        request = str(body.get("request") or "").strip()
+        if not request:
+            raise HTTPError(400, "missing field request")
+        try:
+            water_schedule = as_entries(body.get("water_schedule"))
+        except (TypeError, ValueError) as e:
+            raise HTTPError(400, f"invalid water_schedule: {e}") from None
+
+        food_data = await self.run(self.prompt_foods, macros)
+        passages = await self.run(get_knowledge_index().passages, plan_query(macros, body.get("goal"), request))
+        prompt = build_adjustment_prompt(calorie_intake, macros, water_schedule, request, food_data, passages)
+        try:
+            text = await self.generate(prompt)
+        except LLMUnavailableError:
+            # Keep the targets and re-solve locally, as the CLI does
+            self.counters["llm_fallbacks"] += 1
+            local_plan = await self.run(self.solve, calorie_intake, macros)
+            response = plan_response(format_meal_plan(local_plan), "local-fallback", local_plan["within_tolerance"])
+        else:
+            parser = IncrementalPlanParser(calorie_intake, macros, water_schedule)
+            parser.feed(text)
+            calorie_intake, macros, water_schedule = parser.close()
+            check = await self.run(self.check, text, calorie_intake, macros)
+            response = dict(plan_response(text, "llm", check["within_tolerance"]), check=check)
+        return dict(response, calorie_intake=calorie_intake, macros=macros,
+                    water_schedule=to_runs(as_entries(water_schedule)))
+
+    async def get_schedule(self, body, query):
+        default_start, default_end = upcoming_range()
+        start = read_date(query["start"], "start") if "start" in query else default_start
+        end = read_date(query["end"], "end") if "end" in query else default_end
+        days = await self.run(self.store.range, start, end, query.get("user", DEFAULT_USER))
+        return {day.isoformat(): entry for day, entry in days.items()}
+
+    async def put_schedule(self, body, query):
+        if "date" in body:
+            day = read_date(body["date"], "date")
+        elif body.get("day") in WEEK_DAYS:
+            day = next_date(body["day"])
+        else:
+            raise HTTPError(400, "date (YYYY-MM-DD) or day (a weekday name) is required")
+        calorie_intake, macros = read_targets(body)
+        meal_plan = body.get("meal_plan")
+        if not isinstance(meal_plan, str):
+            raise HTTPError(400, "meal_plan must be a string")
+        try:
+            water_schedule = to_runs(as_entries(body.get("water_schedule")))
+        except (TypeError, ValueError) as e:
+            raise HTTPError(400, f"invalid water_schedule: {e}") from None
+        entry = {"meal_plan": meal_plan, "water_schedule": water_schedule,
+                 "calorie_intake": calorie_intake, "macros": macros}
+        await self.run(self.store.save_day, day, entry, str(body.get("user") or DEFAULT_USER))
+        return {"date": day.isoformat()}
+
+    async def health(self, body, query):
+        return dict(
+            self.counters,
+            in_flight=self.in_flight,
+            uptime=time.time() - self.started,
+            llm_cache=get_response_cache().stats(),
+            prompts=get_prompt_builder().stats(),
+            llm_transport=get_transport().stats(),
+        )
+
+    async def metrics(self, body, query):
+        if not get_tracer().enabled:
+            raise HTTPError(404, "tracing is off; start the service with NUTRIAI_TRACE=1")
+        return get_tracer().prometheus_text()
+
+
+async def serve(host, port, **options):
+    service = PlanningService(**options)
+    server = await service.start(host, port)
+    print(f"NutriAI service listening on http://{host}:{port}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the NutriAI planning service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--catalog", default=CATALOG_CSV, help="food catalog CSV")
+    parser.add_argument("--max-in-flight", type=int, default=MAX_IN_FLIGHT,
+                        help="requests handled at once before answering 503")
+    parser.add_argument("--llm-concurrency", type=int, default=LLM_CONCURRENCY)
+    parser.add_argument("--threads", type=int, default=WORKER_THREADS, help="solver/storage threads")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, csv_path=args.catalog, max_in_flight=args.max_in_flight,
+                          llm_concurrency=args.llm_concurrency, worker_threads=args.threads))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import numpy as np
+
+# --- Local meal-plan solver ---
+#
+# Picks foods and portion sizes from the macro matrix of a candidate pool so
+# the day's protein, carbs, fats and kcal land within a tolerance of the
+# targets. Catalog macros are per 100 g, so a portion of g grams contributes
+# row * g / 100. Each meal is filled greedily (the food/portion pair that
+# most reduces the meal's relative squared error, evaluated for every pair
+# at once), then portions are nudged across the whole day until no single
+# step improves the daily totals.
+
+MEAL_SPLIT = {"Breakfast": 0.25, "Lunch": 0.30, "Dinner": 0.30, "Snacks": 0.15}
+PORTIONS_G = np.arange(50, 301, 25, dtype=np.float64)
+PORTION_STEP_G = 25
+PORTION_RANGE_G = (25, 400)
+MAX_ITEMS_PER_MEAL = 3
+POLISH_ROUNDS = 60
+TOLERANCE = 0.05
+# Candidate pool a plan is solved from (nearest foods by macro split)
+SOLVER_FOODS = 1000
+
+MACRO_COLUMNS = ["Protein (g)", "Carbohydrates (g)", "Fats (g)", "Calories"]
+
+
+def target_vector(calorie_intake, macros):
+    return np.array([
+        macros["Protein (g)"],
+        macros["Carbohydrates (g)"],
+        macros["Fats (g)"],
+        calorie_intake,
+    ], dtype=np.float64)
+
+
+def relative_error(totals, target):
+    """Sum of squared relative deviations; works on (..., 4) arrays"""
+    return (((totals - target) / np.maximum(target, 1)) ** 2).sum(axis=-1)
+
+
+def solve_meal(foods, target, max_items=MAX_ITEMS_PER_MEAL, exclude=()):
+    """Greedy food/portion picks for one meal; returns [(row, grams), ...]"""
+    per_portion = foods[:, None, :] * (PORTIONS_G / 100)[None, :, None]
+    blocked = np.zeros(len(foods), dtype=bool)
+    blocked[list(exclude)] = True
+
+    totals = np.zeros(4)
+    best_err = relative_error(totals, target)
+    picks = []
+    for _ in range(max_items):
+        err = relative_error(totals + per_portion, target)
+        err[blocked] = np.inf
+        row, portion = np.unravel_index(np.argmin(err), err.shape)
+        if err[row, portion] >= best_err:
+            break
+        best_err = err[row, portion]
+        totals = totals + per_portion[row, portion]
+        blocked[row] = True
+        picks.append((int(row), float(PORTIONS_G[portion])))
+    return picks
+
+
+def polish_portions(foods, rows, grams, target, rounds=POLISH_ROUNDS):
+    """Move single portions by one step while that improves the daily totals"""
+    grams = np.asarray(grams, dtype=np.float64).copy()
+    if not len(rows):
+        return grams
+    items = foods[rows] / 100
+    steps = np.array([-PORTION_STEP_G, PORTION_STEP_G], dtype=np.float64)
+    low, high = PORTION_RANGE_G
+
+    for _ in range(rounds):
+        totals = items.T @ grams
+        current = relative_error(totals, target)
+        candidate = totals + items[:, None, :] * steps[None, :, None]
+        err = relative_error(candidate, target)
+        new_grams = grams[:, None] + steps[None, :]
+        err[(new_grams < low) | (new_grams > high)] = np.inf
+        item, step = np.unravel_index(np.argmin(err), err.shape)
+        if err[item, step] >= current:
+            break
+        grams[item] = new_grams[item, step]
+    return grams
+
+
+def plan_item(name, per_100g, grams):
+    """One plan item (the dicts in a solved plan's meals) for grams of a food"""
+    protein, carbs, fats, kcal = (np.asarray(per_100g, dtype=np.float64) * grams / 100).tolist()
+    return {
+        "food": name,
+        "grams": int(grams),
+        "protein": round(protein, 2),
+        "carbs": round(carbs, 2),
+        "fats": round(fats, 2),
+        "kcal": round(kcal),
+    }
+
+
+def within_tolerance(totals, target, tolerance=TOLERANCE):
+    return bool((np.abs(totals - target) / np.maximum(target, 1) <= tolerance).all())
+
+
+def totals_dict(totals):
+    totals = np.asarray(totals, dtype=np.float64).tolist()
+    return {
+        "Protein (g)": round(totals[0], 2),
+        "Carbohydrates (g)": round(totals[1], 2),
+        "Fats (g)": round(totals[2], 2),
+        "Calories": round(totals[3]),
+    }
+
+
+def solve_meal_plan(food_data, calorie_intake, macros, tolerance=TOLERANCE):
+    """Build a full day's plan from the foods in food_data (catalog columns)"""
+    food_data = food_data[food_data["Calories"] > 0]
+    foods = food_data[MACRO_COLUMNS].to_numpy(dtype=np.float64)
+    names = food_data["Description"].tolist()
+    target = target_vector(calorie_intake, macros)
+
+    rows, grams, meal_of = [], [], []
+    for meal, share in MEAL_SPLIT.items():
+        for row, g in solve_meal(foods, target * share, exclude=rows):
+            rows.append(row)
+            grams.append(g)
+            meal_of.append(meal)
+    grams = polish_portions(foods, np.array(rows, dtype=np.int64), grams, target)
+
+    meals = {meal: [] for meal in MEAL_SPLIT}
+    for row, g, meal in zip(rows, grams, meal_of):
+        meals[meal].append(plan_item(names[row], foods[row], g))
+
+    totals = foods[rows].T @ grams / 100 if rows else np.zeros(4)
+    return {
+        "meals": meals,
+        "totals": totals_dict(totals),
+        "within_tolerance": within_tolerance(totals, target, tolerance),
+    }
+
+
+def format_meal_plan(plan):
+    """Render a solved plan in the same text format the LLM is asked for"""
+    lines = ["Meal Plan:"]
+    for meal, items in plan["meals"].items():
+        lines.append(f"{meal}:")
+        for item in items:
+            portion = f" ({item['grams']}g)" if item["grams"] is not None else ""
+            lines.append(
+                f"- {item['food']}{portion} - {item['protein']}g protein, "
+                f"{item['carbs']}g carbs, {item['fats']}g fats, {item['kcal']} kcal"
+            )
+    totals = plan["totals"]
+    lines += [
+        "",
+        "Total Macros:",
+        f"Protein: {totals['Protein (g)']}g",
+        f"Carbs: {totals['Carbohydrates (g)']}g",
+        f"Fats: {totals['Fats (g)']}g",
+        f"Calories: {totals['Calories']} kcal",
+    ]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# --- Startup benchmark ---
+#
+# Times importing each entry module in a fresh interpreter (so nothing is
+# already cached in sys.modules) and reports which heavy dependencies the
+# import pulled in. "app" also builds the Kivy widget tree, which is what
+# the first frame waits for:
+#
+#   python startup_benchmark.py --repeat 5
+
+HEAVY_MODULES = ["pandas", "google.genai", "datascience", "matplotlib"]
+TARGETS = {
+    "helper_functions": "import helper_functions",
+    "backend": "import backend",
+    "screens": "import screens",
+    "app": "import main; main.MainApp().build()",
+}
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def time_target(code, heavy=HEAVY_MODULES):
+    """(seconds, heavy modules loaded) for one cold import"""
+    env = dict(os.environ, KIVY_NO_ARGS="1", KIVY_NO_CONSOLELOG="1")
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(code=code, heavy=heavy)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "probe failed")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    return report["seconds"], report["loaded"]
+
+
+def run(targets, repeat):
+    results = {}
+    for name in targets:
+        try:
+            runs = [time_target(TARGETS[name]) for _ in range(repeat)]
+        except RuntimeError as e:
+            results[name] = {"error": str(e)}
+            continue
+        times = sorted(seconds for seconds, _ in runs)
+        results[name] = {"median_ms": times[len(times) // 2] * 1000, "best_ms": times[0] * 1000, "heavy": runs[-1][1]}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold import time of the NutriAI entry points")
+    parser.add_argument("targets", nargs="*", default=list(TARGETS), help=f"any of {', '.join(TARGETS)}")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+    unknown = [name for name in args.targets if name not in TARGETS]
+    if unknown:
+        parser.error(f"unknown target(s): {', '.join(unknown)}")
+
+    results = run(args.targets, args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name, result in results.items():
+        if "error" in result:
+            print(f"{name:18} failed: {result['error']}")
+        else:
+            heavy = ", ".join(result["heavy"]) or "none"
+            print(f"{name:18} {result['median_ms']:8.1f} ms median  {result['best_ms']:8.1f} ms best  heavy: {heavy}")
+
+
+if __name__ == "__main__":
+    main()
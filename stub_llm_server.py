@@ -0,0 +1,191 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- Local stand-in for the Gemini API ---
+#
+# Replays canned responses over the same REST routes the genai SDK calls
+# (models/<model>:generateContent and :streamGenerateContent?alt=sse), with
+# configurable latency, a slow tail and an error rate, so retry, deadline
+# and circuit-breaker behaviour can be exercised offline:
+#
+#   python stub_llm_server.py --port 8765 --latency 0.8 --slow-rate 0.05 --error-rate 0.1
+#   GEMINI_BASE_URL=http://127.0.0.1:8765 python backend.py
+
+CANNED_MEAL_PLAN = (
+    "Meal Plan:\n"
+    "Breakfast:\n- ROLLED OATS - 13.2g protein, 67.7g carbs, 6.5g fats, 382 kcal\n"
+    "Lunch:\n- GRILLED CHICKEN BREAST - 31.0g protein, 0.0g carbs, 3.6g fats, 156 kcal\n"
+    "Dinner:\n- BROWN RICE - 2.6g protein, 23.0g carbs, 0.9g fats, 111 kcal\n"
+    "Snacks:\n- GREEK YOGURT, PLAIN - 10.0g protein, 3.6g carbs, 0.4g fats, 58 kcal\n\n"
+    "Total Macros:\nProtein: 56.8g\nCarbs: 94.3g\nFats: 11.4g\nCalories: 707 kcal\n"
+)
+CANNED_ADJUSTMENT = (
+    "Calories: 2200\nProtein (g): 165\nCarbohydrates (g): 248\nFats (g): 61\n\n"
+    "Water:\n08:00 - 400ml\n11:00 - 400ml\n14:00 - 400ml\n17:00 - 400ml\n20:00 - 400ml\n\n"
+    + CANNED_MEAL_PLAN
+)
+CANNED_CHAT = "Aim for a palm-sized portion of protein at every meal and drink water steadily through the day."
+
+ROUTE = re.compile(r"/(?P<version>[^/]+)/models/(?P<model>[^/:]+):(?P<method>generateContent|streamGenerateContent)")
+
+
+def canned_reply(prompt, responses):
+    for needle, text in responses.items():
+        if needle in prompt:
+            return text
+    if "User request:" in prompt:
+        return CANNED_ADJUSTMENT
+    if "Meal Plan:" in prompt:
+        return CANNED_MEAL_PLAN
+    return CANNED_CHAT
+
+
+def response_body(text, prompt):
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP", "index": 0}],
+        "usageMetadata": {
+            "promptTokenCount": len(prompt) // 4,
+            "candidatesTokenCount": len(text) // 4,
+            "totalTokenCount": (len(prompt) + len(text)) // 4,
+        },
+    }
+
+
+class StubConfig:
+    def __init__(self, latency=0.5, jitter=0.2, slow_rate=0.0, slow_latency=10.0, error_rate=0.0,
+                 error_status=503, chunk_chars=40, chunk_delay=0.02, responses=None, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.chunk_chars = chunk_chars
+        self.chunk_delay = chunk_delay
+        self.responses = responses or {}
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "errors": 0, "slow": 0}
+
+    def draw(self):
+        """(delay, fail) for the next request"""
+        with self.lock:
+            self.counters["requests"] += 1
+            delay = max(0.0, self.rng.gauss(self.latency, self.jitter))
+            if self.rng.random() < self.slow_rate:
+                delay += self.slow_latency
+                self.counters["slow"] += 1
+            fail = self.rng.random() < self.error_rate
+            if fail:
+                self.counters["errors"] += 1
+            return delay, fail
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    config = StubConfig()
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._send_json(200, self.config.counters)
+        else:
+            self._send_json(404, {"error": {"code": 404, "message": "not found", "status": "NOT_FOUND"}})
+
+    def do_POST(self):
+        match = ROUTE.match(self.path.split("?")[0])
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not match:
+            self._send_json(404, {"error": {"code": 404, "message": "not found", "status": "NOT_FOUND"}})
+            return
+
+        prompt = "".join(
+            part.get("text", "")
+            for content in request.get("contents", [])
+            for part in content.get("parts", [])
+        )
+        delay, fail = self.config.draw()
+        time.sleep(delay)
+        if fail:
+            status = self.config.error_status
+            self._send_json(status, {"error": {"code": status, "message": "stub failure", "status": "UNAVAILABLE"}})
+            return
+
+        text = canned_reply(prompt, self.config.responses)
+        if match.group("method") == "generateContent":
+            self._send_json(200, response_body(text, prompt))
+            return
+
+        # Server-sent events, one small chunk of text per event
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        size = self.config.chunk_chars
+        for i in range(0, len(text), size):
+            event = json.dumps(response_body(text[i:i + size], prompt))
+            self.wfile.write(f"data: {event}\r\n\r\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(self.config.chunk_delay)
+        self.close_connection = True
+
+
+def make_server(host="127.0.0.1", port=8765, config=None):
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"config": config or StubConfig()})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve canned Gemini responses for offline testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="mean response latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="latency standard deviation (s)")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of requests in the slow tail")
+    parser.add_argument("--slow-latency", type=float, default=10.0, help="extra latency of slow requests (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--responses", help="JSON file mapping prompt substrings to canned replies")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    responses = None
+    if args.responses:
+        with open(args.responses, "r", encoding="utf-8") as f:
+            responses = json.load(f)
+    config = StubConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        slow_rate=args.slow_rate,
+        slow_latency=args.slow_latency,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        responses=responses,
+        seed=args.seed,
+    )
+    server = make_server(args.host, args.port, config)
+    print(f"Stub Gemini server on http://{args.host}:{args.port} (GEMINI_BASE_URL)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
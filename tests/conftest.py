@@ -0,0 +1,32 @@
+import csv
+import os
+import sys
+import pytest
+
+# The modules live flat at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import SOURCE_COLUMNS  # noqa: E402
+
+# description, protein, carbs, fats per 100 g
+FOODS = [
+    ("ROLLED OATS", 13.2, 67.7, 6.5),
+    ("GRILLED CHICKEN BREAST", 31.0, 0.0, 3.6),
+    ("BROWN RICE", 2.6, 23.0, 0.9),
+    ("GREEK YOGURT, PLAIN", 10.0, 3.6, 0.4),
+]
+
+
+def write_catalog_csv(path, foods):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(SOURCE_COLUMNS)
+        writer.writerows(foods)
+
+
+@pytest.fixture
+def catalog_csv(tmp_path):
+    """Source CSV holding FOODS; the catalog cache is built next to it"""
+    path = str(tmp_path / "foods.csv")
+    write_catalog_csv(path, FOODS)
+    return path
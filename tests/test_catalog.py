@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+from conftest import FOODS, write_catalog_csv
+from catalog import build_catalog, is_fresh, load_catalog, read_meta, refresh_catalog
+
+
+def catalog_foods(catalog):
+    """{description: (protein, carbs, fats, calories)} of the live rows"""
+    frame = catalog.frame()
+    return {row[0]: tuple(row[1:]) for row in frame.itertuples(index=False)}
+
+
+def test_build(catalog_csv):
+    catalog = build_catalog(catalog_csv)
+    assert len(catalog) == len(FOODS)
+    assert catalog_foods(catalog)["BROWN RICE"] == (2.6, 23.0, 0.9, 110.0)
+    assert is_fresh(catalog_csv)
+
+
+def test_refresh_unchanged(catalog_csv):
+    build_catalog(catalog_csv)
+    stats = refresh_catalog(catalog_csv)
+    assert stats == {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": len(FOODS)}
+
+
+def test_append(catalog_csv):
+    build_catalog(catalog_csv)
+    write_catalog_csv(catalog_csv, FOODS + [("BANANA", 1.1, 22.8, 0.3), ("BANANA", 1.1, 22.8, 0.3)])
+    stats = refresh_catalog(catalog_csv)
+    assert stats["inserted"] == 1  # the repeated row is stored once
+    assert stats["unchanged"] == len(FOODS)
+    catalog = load_catalog(catalog_csv)
+    assert len(catalog) == len(FOODS) + 1
+    assert catalog.description(len(FOODS)) == "BANANA"
+
+
+def test_update_in_place(catalog_csv):
+    catalog = build_catalog(catalog_csv)
+    rice_row = [catalog.description(i) for i in catalog.rows].index("BROWN RICE")
+    write_catalog_csv(catalog_csv, [food if food[0] != "BROWN RICE" else ("BROWN RICE", 3.0, 25.0, 1.0) for food in FOODS])
+    stats = refresh_catalog(catalog_csv)
+    assert stats["updated"] == 1 and stats["inserted"] == 0 and stats["deleted"] == 0
+    catalog = load_catalog(catalog_csv)
+    # Same row, new macros; nothing appended
+    assert read_meta(catalog.cache_dir)["rows"] == len(FOODS)
+    assert catalog.description(rice_row) == "BROWN RICE"
+    np.testing.assert_allclose(catalog.macros[rice_row], [3.0, 25.0, 1.0, 121.0], rtol=1e-6)
+
+
+def test_delete_leaves_tombstone(catalog_csv):
+    write_catalog_csv(catalog_csv, FOODS + [(f"FOOD {i}", 1.0, 2.0, 3.0) for i in range(6)])
+    build_catalog(catalog_csv)
+    write_catalog_csv(catalog_csv, FOODS + [(f"FOOD {i}", 1.0, 2.0, 3.0) for i in range(1, 6)])
+    stats = refresh_catalog(catalog_csv)
+    assert stats["deleted"] == 1
+    catalog = load_catalog(catalog_csv)
+    meta = read_meta(catalog.cache_dir)
+    # 1 of 10 rows deleted stays below the compaction ratio: the slot is kept
+    assert meta["rows"] == 10 and meta["deleted"] == 1
+    assert len(catalog) == 9
+    assert "FOOD 0" not in catalog_foods(catalog)
+
+
+def test_compaction(catalog_csv):
+    build_catalog(catalog_csv)
+    write_catalog_csv(catalog_csv, FOODS[:2])
+    stats = refresh_catalog(catalog_csv)
+    assert stats["deleted"] == 2
+    catalog = load_catalog(catalog_csv)
+    meta = read_meta(catalog.cache_dir)
+    # Half the rows were tombstones, so the store was rewritten without them
+    assert meta["rows"] == 2 and meta["deleted"] == 0
+    assert list(catalog.rows) == [0, 1]
+    assert set(catalog_foods(catalog)) == {"ROLLED OATS", "GRILLED CHICKEN BREAST"}
+
+    # The compacted store refreshes like any other
+    write_catalog_csv(catalog_csv, FOODS[:2] + [("BANANA", 1.1, 22.8, 0.3)])
+    assert refresh_catalog(catalog_csv)["inserted"] == 1
+    assert [load_catalog(catalog_csv).description(i) for i in range(3)][-1] == "BANANA"
+
+
+def test_missing_csv(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        refresh_catalog(str(tmp_path / "missing.csv"))
+
+
+def test_chunked_refresh(catalog_csv):
+    """Changes spread across small chunks give the same store as a single pass"""
+    foods = FOODS + [(f"FOOD {i}", 1.0, 2.0, float(i)) for i in range(7)]
+    write_catalog_csv(catalog_csv, foods)
+    refresh_catalog(catalog_csv, chunk_rows=3)
+
+    changed = [food for food in foods if food[0] not in ("BROWN RICE", "FOOD 2")]
+    changed[0] = ("ROLLED OATS", 14.0, 66.0, 7.0)
+    changed += [("BANANA", 1.1, 22.8, 0.3), ("FOOD 6", 1.0, 2.0, 6.0), ("BANANA", 1.1, 22.8, 0.3)]
+    write_catalog_csv(catalog_csv, changed)
+    stats = refresh_catalog(catalog_csv, chunk_rows=3)
+    assert stats == {"inserted": 1, "updated": 1, "deleted": 2, "unchanged": len(foods) - 3}
+    assert read_meta(load_catalog(catalog_csv).cache_dir)["last_refresh"] == stats
+
+    single = build_catalog(catalog_csv, cache_dir=str(catalog_csv) + ".single")
+    assert catalog_foods(load_catalog(catalog_csv)) == catalog_foods(single)
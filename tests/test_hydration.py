@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from hydration import (
+    WATER_DTYPE, as_entries, format_schedule, from_runs, hydration_batch, hydration_schedule, summarize, to_runs,
+)
+
+
+def schedule(pairs):
+    return np.array(pairs, dtype=WATER_DTYPE)
+
+
+def assert_same(entries, expected):
+    assert entries.dtype == WATER_DTYPE
+    assert entries.tolist() == expected.tolist()
+
+
+def test_even_day_is_one_run():
+    entries = hydration_schedule(3200, 7 * 60, 23 * 60)
+    assert len(entries) == 16
+    assert to_runs(entries) == [[420, 60, 16, 200.0]]
+    assert_same(from_runs(to_runs(entries)), entries)
+
+
+def test_window_across_midnight():
+    entries = hydration_schedule(1800, 20 * 60, 6 * 60, interval=120)
+    assert entries["minute"].tolist() == [1200, 1320, 0, 120, 240]
+    assert to_runs(entries) == [[1200, 120, 5, 360.0]]
+    assert_same(from_runs(to_runs(entries)), entries)
+
+
+def test_workout_splits_runs():
+    entries = hydration_schedule(3000, 7 * 60, 23 * 60, exercise_ml=600, workout_start=17 * 60, workout_minutes=60)
+    runs = to_runs(entries)
+    assert [run[3] for run in runs] == [150.0, 450.0, 150.0]
+    assert sum(run[2] for run in runs) == len(entries)
+    assert entries["ml"].sum() == pytest.approx(3000, abs=len(entries))
+    assert_same(from_runs(runs), entries)
+
+
+def test_irregular_schedule():
+    entries = schedule([(480, 400), (600, 400), (615, 250), (1380, 100)])
+    runs = to_runs(entries)
+    assert runs == [[480, 120, 2, 400.0], [615, 0, 1, 250.0], [1380, 0, 1, 100.0]]
+    assert_same(from_runs(runs), entries)
+
+
+def test_empty():
+    empty = np.empty(0, dtype=WATER_DTYPE)
+    assert to_runs(empty) == []
+    assert_same(from_runs([]), empty)
+    assert summarize([]) == "No water schedule"
+
+
+def test_batch_matches_single():
+    water = np.array([2500, 3100, 1800])
+    entries, offsets = hydration_batch(water, [420, 360, 1200], [1380, 1320, 360], interval=[60, 90, 120])
+    for i in range(len(water)):
+        single = hydration_schedule(water[i], [420, 360, 1200][i], [1380, 1320, 360][i], [60, 90, 120][i])
+        assert_same(entries[offsets[i]:offsets[i + 1]], single)
+
+
+def test_invalid_window():
+    with pytest.raises(ValueError):
+        hydration_schedule(2000, 420, 420)
+
+
+def test_stored_forms():
+    entries = hydration_schedule(1000, 8 * 60, 12 * 60)
+    legacy = ["8:00", "250.0ml", "9:00", "250.0ml", "10:00", "250.0ml", "11:00", "250.0ml"]
+    assert_same(as_entries(legacy), entries)
+    assert_same(as_entries(to_runs(entries)), entries)
+    assert format_schedule(to_runs(entries)) == "8:00 - 250ml, 9:00 - 250ml, 10:00 - 250ml, 11:00 - 250ml"
+    assert summarize(entries) == "4 drinks, 8:00 to 11:00 (1000ml)"
+    with pytest.raises(ValueError):
+        as_entries(["noon", "250ml"])
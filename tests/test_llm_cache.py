@@ -0,0 +1,120 @@
+import sqlite3
+import pytest
+import llm_cache
+from llm_cache import ResponseCache
+
+MODEL = "gemini-2.0-flash"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "cache.sqlite3")
+
+
+def disk_keys(path):
+    with sqlite3.connect(path) as db:
+        return {row[0] for row in db.execute("SELECT key FROM responses")}
+
+
+def last_used(path, prompt):
+    with sqlite3.connect(path) as db:
+        return db.execute("SELECT last_used FROM responses WHERE key = ?",
+                          (llm_cache.cache_key(MODEL, prompt),)).fetchone()[0]
+
+
+def test_hit_and_miss(clock, cache_path):
+    cache = ResponseCache(path=cache_path)
+    assert cache.get(MODEL, "plan for me") is None
+    cache.put(MODEL, "plan for me", "Meal Plan:")
+    assert cache.get(MODEL, "  plan\nfor   me ") == "Meal Plan:"
+    assert cache.get(MODEL, "Plan for me") is None
+    assert cache.get("other-model", "plan for me") is None
+    cache.put(MODEL, "blocked", None)
+    assert cache.get(MODEL, "blocked") is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 4)
+    # A fresh process finds it on disk
+    assert ResponseCache(path=cache_path).get(MODEL, "plan for me") == "Meal Plan:"
+
+
+def test_ttl(clock, cache_path):
+    cache = ResponseCache(path=cache_path, ttl=60)
+    cache.put(MODEL, "old", "stale")
+    clock.now += 61
+    assert cache.get(MODEL, "old") is None
+    assert disk_keys(cache_path) == set()
+    assert cache.stats()["disk_bytes"] == 0
+
+    # Expired rows are also purged by the next put
+    cache.put(MODEL, "a", "x")
+    clock.now += 61
+    cache.put(MODEL, "b", "y")
+    assert disk_keys(cache_path) == {llm_cache.cache_key(MODEL, "b")}
+
+
+def test_memory_lru(clock, cache_path):
+    cache = ResponseCache(path=cache_path, memory_max_bytes=20)
+    cache.put(MODEL, "a", "a" * 8)
+    cache.put(MODEL, "b", "b" * 8)
+    cache.get(MODEL, "a")
+    cache.put(MODEL, "c", "c" * 8)
+    assert list(cache.memory) == [llm_cache.cache_key(MODEL, "a"), llm_cache.cache_key(MODEL, "c")]
+    assert cache.stats()["memory_bytes"] == 16
+
+    # Evicted from memory, still served from disk
+    assert cache.get(MODEL, "b") == "b" * 8
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_disk_lru(clock, cache_path):
+    cache = ResponseCache(path=cache_path, disk_max_bytes=20)
+    cache.put(MODEL, "a", "a" * 8)
+    clock.now += 1
+    cache.put(MODEL, "b", "b" * 8)
+    clock.now += 1
+    # Only queued, but written before the next put evicts
+    cache.get(MODEL, "a")
+    clock.now += 1
+    cache.put(MODEL, "c", "c" * 8)
+    assert disk_keys(cache_path) == {llm_cache.cache_key(MODEL, "a"), llm_cache.cache_key(MODEL, "c")}
+    assert cache.stats()["disk_bytes"] == 16
+
+
+def test_touches_are_batched(clock, cache_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "TOUCH_BATCH", 3)
+    cache = ResponseCache(path=cache_path)
+    for prompt in "abc":
+        cache.put(MODEL, prompt, "x")
+    created = clock.now
+
+    clock.now += 10
+    cache.get(MODEL, "a")
+    cache.get(MODEL, "a")
+    assert last_used(cache_path, "a") == created
+    cache.flush()
+    assert last_used(cache_path, "a") == clock.now
+
+    # A full batch of distinct entries is written in one go
+    clock.now += 10
+    cache.get(MODEL, "a")
+    cache.get(MODEL, "b")
+    assert last_used(cache_path, "b") == created
+    cache.get(MODEL, "c")
+    assert cache.touched == {}
+    assert [last_used(cache_path, prompt) for prompt in "abc"] == [clock.now] * 3
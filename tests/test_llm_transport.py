@@ -0,0 +1,215 @@
+import threading
+import pytest
+from llm_transport import (
+    CircuitBreaker, CircuitOpenError, DeadlineExceededError, LLMTransport, LLMUnavailableError,
+    RetriesExhaustedError, is_retryable,
+)
+from stub_llm_server import CANNED_CHAT, StubConfig, make_server
+
+MODEL = "gemini-2.0-flash"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = make_server(port=0, config=StubConfig())
+    # Streams abandoned by a test end in broken pipes on the server side
+    server.handle_error = lambda request, client_address: None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def stub(server):
+    """The stub's config, reset to fast, reliable answers for each test"""
+    config = server.RequestHandlerClass.config
+    config.latency, config.jitter, config.error_rate, config.error_status = 0.0, 0.0, 0.0, 503
+    config.chunk_chars, config.chunk_delay = 40, 0.0
+    return config
+
+
+@pytest.fixture
+def client(server):
+    from google import genai
+    from google.genai import types
+
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    return genai.Client(api_key="test", http_options=types.HttpOptions(base_url=base_url))
+
+
+def make_transport(clock=None, **kwargs):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30.0, clock=clock or FakeClock())
+    options = dict(deadline=5.0, max_retries=2, base_delay=0.01, max_delay=0.05, breaker=breaker, rng=lambda: 1.0)
+    options.update(kwargs)
+    return LLMTransport(**options)
+
+
+def generate(transport, client, prompt="hello"):
+    return transport.call(client.models.generate_content, model=MODEL, contents=prompt).text
+
+
+def test_is_retryable():
+    import httpx
+
+    request = httpx.Request("POST", "http://127.0.0.1/")
+
+    def status_error(status):
+        return httpx.HTTPStatusError("status", request=request, response=httpx.Response(status, request=request))
+
+    assert not is_retryable(status_error(400))
+    assert not is_retryable(status_error(401))
+    assert is_retryable(status_error(503))
+    assert is_retryable(httpx.ReadTimeout("timed out", request=request))
+    assert is_retryable(httpx.ConnectError("refused", request=request))
+    assert not is_retryable(httpx.DecodingError("bad body", request=request))
+    assert is_retryable(TimeoutError())
+    assert not is_retryable(ValueError())
+
+
+def test_call(stub, client):
+    transport = make_transport()
+    assert generate(transport, client) == CANNED_CHAT
+    assert transport.counters["retries"] == 0
+    assert transport.breaker.state == "closed"
+
+
+def test_retries_then_gives_up(stub, client):
+    stub.error_rate = 1.0
+    transport = make_transport(breaker=CircuitBreaker(failure_threshold=10))
+    before = stub.counters["requests"]
+    with pytest.raises(RetriesExhaustedError):
+        generate(transport, client)
+    assert stub.counters["requests"] - before == 3
+    assert transport.counters["retries"] == 2
+    assert transport.counters["failures"] == 3
+
+
+def test_non_retryable_error_is_not_retried(stub, client):
+    from google.genai.errors import ClientError
+
+    stub.error_rate, stub.error_status = 1.0, 400
+    transport = make_transport()
+    before = stub.counters["requests"]
+    with pytest.raises(ClientError):
+        generate(transport, client)
+    assert stub.counters["requests"] - before == 1
+    assert transport.counters["retries"] == 0
+    assert transport.counters["failures"] == 0
+    assert transport.breaker.failures == 0
+
+
+def test_deadline(stub, client):
+    stub.latency = 1.0
+    transport = make_transport(deadline=0.2)
+    with pytest.raises(DeadlineExceededError):
+        generate(transport, client)
+    assert transport.counters["deadlines"] == 1
+    assert transport.breaker.failures == 1
+
+
+def test_backoff_stops_at_the_deadline(stub, client):
+    stub.error_rate = 1.0
+    # The first backoff already runs past the deadline
+    transport = make_transport(deadline=0.5, base_delay=1.0, max_delay=1.0)
+    with pytest.raises(DeadlineExceededError):
+        generate(transport, client)
+    assert transport.counters["retries"] == 0
+
+
+def test_breaker_opens_then_recovers(stub, client):
+    clock = FakeClock()
+    transport = make_transport(clock=clock, max_retries=0)
+    stub.error_rate = 1.0
+    for _ in range(2):
+        with pytest.raises(RetriesExhaustedError):
+            generate(transport, client)
+    assert transport.breaker.state == "open"
+
+    # Open: fails fast without reaching the service
+    stub.error_rate = 0.0
+    before = stub.counters["requests"]
+    with pytest.raises(CircuitOpenError):
+        generate(transport, client)
+    assert stub.counters["requests"] == before
+    assert transport.counters["short_circuits"] == 1
+
+    # Half-open: one trial call decides
+    clock.now += 30.0
+    assert transport.breaker.state == "half-open"
+    assert generate(transport, client) == CANNED_CHAT
+    assert transport.breaker.state == "closed"
+
+
+def test_failed_trial_reopens(stub, client):
+    clock = FakeClock()
+    transport = make_transport(clock=clock, max_retries=0)
+    stub.error_rate = 1.0
+    for _ in range(2):
+        with pytest.raises(RetriesExhaustedError):
+            generate(transport, client)
+    clock.now += 30.0
+    with pytest.raises(RetriesExhaustedError):
+        generate(transport, client)
+    assert transport.breaker.state == "open"
+
+
+def test_non_retryable_trial_leaves_breaker_half_open(stub, client):
+    from google.genai.errors import ClientError
+
+    clock = FakeClock()
+    transport = make_transport(clock=clock, max_retries=0)
+    stub.error_rate = 1.0
+    for _ in range(2):
+        with pytest.raises(RetriesExhaustedError):
+            generate(transport, client)
+    clock.now += 30.0
+    stub.error_status = 400
+    with pytest.raises(ClientError):
+        generate(transport, client)
+    # No verdict either way: the next call is the trial again
+    assert transport.breaker.state == "half-open"
+    assert not transport.breaker.trial_running
+    stub.error_rate = 0.0
+    assert generate(transport, client) == CANNED_CHAT
+    assert transport.breaker.state == "closed"
+
+
+def test_stream(stub, client):
+    transport = make_transport()
+    chunks = transport.stream(client.models.generate_content_stream, model=MODEL, contents="hello")
+    assert "".join(chunk.text for chunk in chunks) == CANNED_CHAT
+    assert transport.breaker.state == "closed"
+
+
+def test_stream_deadline_mid_stream(stub, client):
+    stub.chunk_chars, stub.chunk_delay = 10, 0.5
+    transport = make_transport(deadline=0.3)
+    chunks = transport.stream(client.models.generate_content_stream, model=MODEL, contents="hello")
+    assert next(chunks).text == CANNED_CHAT[:10]
+    with pytest.raises(DeadlineExceededError):
+        next(chunks)
+    assert transport.breaker.failures == 1
+
+
+def test_stream_interrupted(stub):
+    def reply():
+        yield "first"
+        raise ConnectionResetError("connection reset by peer")
+
+    transport = make_transport()
+    chunks = transport.stream(reply)
+    assert next(chunks) == "first"
+    with pytest.raises(LLMUnavailableError, match="stream interrupted"):
+        next(chunks)
+    assert transport.counters["failures"] == 1
+    assert transport.breaker.failures == 1
@@ -0,0 +1,86 @@
+import pytest
+from catalog import build_catalog
+from name_index import load_name_index
+from plan_check import check_plan, format_check
+from plan_parser import parse_plan
+
+MACROS = {"Protein (g)": 113.6, "Carbohydrates (g)": 188.6, "Fats (g)": 22.8}
+CALORIES = 1412
+
+
+@pytest.fixture
+def name_index(catalog_csv):
+    return load_name_index(build_catalog(catalog_csv))
+
+
+def plan(lines, totals=""):
+    return parse_plan("Meal Plan:\nLunch:\n" + "\n".join(lines) + "\n" + totals, strict=True)
+
+
+# 200 g of each food: exactly the targets above
+DAY = [
+    "- ROLLED OATS (200g) - 26.4g protein, 135.4g carbs, 13g fats, 764 kcal",
+    "- GRILLED CHICKEN BREAST (200g) - 62g protein, 0g carbs, 7.2g fats, 312 kcal",
+    "- BROWN RICE (200g) - 5.2g protein, 46g carbs, 1.8g fats, 220 kcal",
+    "- GREEK YOGURT, PLAIN (200g) - 20g protein, 7.2g carbs, 0.8g fats, 116 kcal",
+]
+
+
+def test_plan_on_target(name_index):
+    check = check_plan(plan(DAY), CALORIES, MACROS, name_index)
+    assert check["flags"] == []
+    assert check["within_tolerance"]
+    assert check["totals"] == {"Protein (g)": 113.6, "Carbohydrates (g)": 188.6, "Fats (g)": 22.8, "Calories": 1412}
+    assert check["meals"]["Lunch"] == check["totals"]
+    assert [item["match"] for item in check["items"]] == ["exact"] * 4
+    assert "Matches the catalog and the targets" in format_check(check)
+
+
+def test_off_target(name_index):
+    check = check_plan(plan(DAY[:2]), CALORIES, MACROS, name_index)
+    assert not check["within_tolerance"]
+    assert any(flag.startswith("Carbs adds up to 135.4g") for flag in check["flags"])
+    assert check["deviation"]["Calories"] == pytest.approx((1076 - 1412) / 1412, abs=1e-3)
+
+
+def test_wrong_stated_total(name_index):
+    check = check_plan(plan(DAY, "Total Macros:\nCalories: 1900 kcal\n"), CALORIES, MACROS, name_index)
+    assert check["flags"] == ["Stated total calories 1900 kcal, but the foods add up to 1412 kcal"]
+
+
+def test_item_kcal_off(name_index):
+    day = DAY[:2] + ["- BROWN RICE (200g) - 2.6g protein, 23g carbs, 0.9g fats, 110 kcal"] + DAY[3:]
+    check = check_plan(plan(day), CALORIES, MACROS, name_index)
+    # The catalog wins: the day still adds up
+    assert check["within_tolerance"]
+    assert check["flags"] == ["BROWN RICE: stated 110 kcal, the catalog gives 220 kcal for 200g"]
+
+
+def test_portion_inferred_from_kcal(name_index):
+    check = check_plan(plan(["- BROWN RICE - 2.6g protein, 23g carbs, 0.9g fats, 330 kcal"]),
+                       CALORIES, MACROS, name_index)
+    item = check["items"][0]
+    assert item["grams"] == 300
+    assert item["Carbohydrates (g)"] == pytest.approx(69.0)
+
+
+def test_unknown_food_keeps_stated_macros(name_index):
+    check = check_plan(plan(DAY + ["- DRAGON FRUIT (100g) - 1g protein, 13g carbs, 0g fats, 56 kcal"]),
+                       CALORIES, MACROS, name_index, fuzzy=False)
+    unknown = check["items"][-1]
+    assert unknown["catalog_food"] is None and unknown["match"] is None
+    assert unknown["Calories"] == 56
+    assert "DRAGON FRUIT: not in the catalog, stated macros used" in check["flags"]
+    assert check["totals"]["Calories"] == 1412 + 56
+
+
+def test_reworded_name(name_index):
+    line = "- Grilled chicken breast (200g) - 62g protein, 0g carbs, 7.2g fats, 312 kcal"
+    item = check_plan(plan([line]), CALORIES, MACROS, name_index)["items"][0]
+    # Normalization makes this an exact hit despite the case
+    assert (item["catalog_food"], item["match"]) == ("GRILLED CHICKEN BREAST", "exact")
+
+    line = "- Chicken breast grilled (200g) - 62g protein, 0g carbs, 7.2g fats, 312 kcal"
+    assert check_plan(plan([line]), CALORIES, MACROS, name_index, fuzzy=False)["items"][0]["match"] is None
+    item = check_plan(plan([line]), CALORIES, MACROS, name_index)["items"][0]
+    assert (item["catalog_food"], item["match"]) == ("GRILLED CHICKEN BREAST", "fuzzy")
@@ -0,0 +1,79 @@
+import pytest
+from plan_parser import ParsedPlan, PlanParseError, parse_plan
+from stub_llm_server import CANNED_ADJUSTMENT, CANNED_MEAL_PLAN
+
+
+def test_canned_adjustment():
+    plan = parse_plan(CANNED_ADJUSTMENT, strict=True)
+    assert plan.targets.to_dict() == {"calories": 2200, "protein": 165, "carbs": 248, "fats": 61}
+    assert [(entry.time, entry.ml) for entry in plan.water][:2] == [("8:00", 400), ("11:00", 400)]
+    assert list(plan.meals) == ["Breakfast", "Lunch", "Dinner", "Snacks"]
+    assert plan.meals["Snacks"].items[0].name == "GREEK YOGURT, PLAIN"
+    assert plan.totals.to_dict() == {"calories": 707, "protein": 56.8, "carbs": 94.3, "fats": 11.4}
+
+
+def test_meal_plan_without_targets():
+    plan = parse_plan(CANNED_MEAL_PLAN)
+    assert not plan.targets
+    assert not plan.errors
+    assert plan.food_macros().sum(axis=0).tolist() == pytest.approx([56.8, 94.3, 11.4, 707])
+
+
+def test_markdown_and_portions():
+    plan = parse_plan(
+        "**Meal Plan:**\n"
+        "### Lunch:\n"
+        "- **TOFU STIR FRY** (200g) - 20g protein, 10g carbs, 8g fats, 192 kcal\n"
+        "* ## OATS: 5g protein, 27.5g carbohydrates, 3g fat, 150 kcal.\n"
+        "**Protein (g):** 150\n",
+        strict=True,
+    )
+    tofu, oats = plan.meals["Lunch"].items
+    assert (tofu.name, tofu.grams, tofu.kcal) == ("TOFU STIR FRY", 200, 192)
+    assert (oats.name, oats.grams, oats.carbs) == ("OATS", None, 27.5)
+    # A value inside the meal plan belongs to the totals, not the targets
+    assert plan.totals.protein == 150 and plan.targets.protein is None
+
+
+def test_targets_apply():
+    plan = parse_plan("Calories: 2500 kcal\nFats (g): 70\n")
+    calorie_intake, macros = plan.targets.apply(2000, {"Protein (g)": 150, "Carbohydrates (g)": 225, "Fats (g)": 56})
+    assert calorie_intake == 2500
+    assert macros == {"Protein (g)": 150, "Carbohydrates (g)": 225, "Fats (g)": 70}
+
+
+def test_errors_are_reported_with_line_numbers():
+    text = "Water:\n25:00 - 300ml\nLunch:\n- RICE - lots of protein\n- BEANS - 5g protein, 9g carbs, 1g fats, 65 kcal\n"
+    plan = parse_plan(text)
+    assert [(error.line_number, error.message) for error in plan.errors] == [
+        (2, "invalid time"), (4, "unrecognized line"),
+    ]
+    assert [item.name for item in plan.meals["Lunch"].items] == ["BEANS"]
+    with pytest.raises(PlanParseError) as raised:
+        parse_plan(text, strict=True)
+    assert len(raised.value.errors) == 2
+
+
+def test_food_outside_a_meal():
+    plan = parse_plan("- RICE - 2g protein, 23g carbs, 1g fats, 110 kcal\n")
+    assert plan.errors[0].message == "food item outside a meal"
+    assert not plan.meals
+
+
+def test_round_trip():
+    plan = parse_plan(CANNED_ADJUSTMENT)
+    again = ParsedPlan.from_dict(plan.to_dict())
+    assert again.to_dict() == plan.to_dict()
+    assert again.water_schedule().tolist() == plan.water_schedule().tolist()
+
+
+def test_incremental_matches_whole_reply():
+    from helper_functions import IncrementalPlanParser
+
+    parser = IncrementalPlanParser(2000, {"Protein (g)": 150, "Carbohydrates (g)": 225, "Fats (g)": 56}, None)
+    for i in range(0, len(CANNED_ADJUSTMENT), 7):
+        parser.feed(CANNED_ADJUSTMENT[i:i + 7])
+    calorie_intake, macros, water_schedule = parser.close()
+    assert (calorie_intake, macros["Protein (g)"]) == (2200, 165)
+    assert len(water_schedule) == 5
+    assert parser.plan.to_dict() == parse_plan(CANNED_ADJUSTMENT).to_dict()
@@ -0,0 +1,135 @@
+import pytest
+from conftest import FOODS, write_catalog_csv
+from catalog import build_catalog
+from macro_index import load_macro_index
+from plan_session import MIN_CALORIES, MIN_MACRO_GRAMS, PlanSession
+
+MORE_FOODS = [
+    ("SALMON FILLET", 20.0, 0.0, 13.0),
+    ("LENTILS, COOKED", 9.0, 20.0, 0.4),
+    ("ALMONDS", 21.0, 22.0, 49.0),
+    ("BANANA", 1.1, 22.8, 0.3),
+    ("EGG WHITES", 11.0, 0.7, 0.2),
+    ("WHOLE WHEAT PASTA", 5.0, 30.0, 1.0),
+    ("OLIVE OIL", 0.0, 0.0, 100.0),
+    ("TOFU, FIRM", 15.0, 2.0, 8.0),
+]
+MACROS = {"Protein (g)": 113.6, "Carbohydrates (g)": 188.6, "Fats (g)": 22.8}
+CALORIES = 1412
+# 200 g of each catalog food: exactly the targets above
+PLAN = """Meal Plan:
+Breakfast:
+- ROLLED OATS (200g) - 26.4g protein, 135.4g carbs, 13g fats, 764 kcal
+Lunch:
+- GRILLED CHICKEN BREAST (200g) - 62g protein, 0g carbs, 7.2g fats, 312 kcal
+Dinner:
+- BROWN RICE (200g) - 5.2g protein, 46g carbs, 1.8g fats, 220 kcal
+Snacks:
+- GREEK YOGURT, PLAIN (200g) - 20g protein, 7.2g carbs, 0.8g fats, 116 kcal
+"""
+
+
+@pytest.fixture
+def macro_index(tmp_path):
+    path = str(tmp_path / "foods.csv")
+    write_catalog_csv(path, FOODS + MORE_FOODS)
+    return load_macro_index(build_catalog(path))
+
+
+@pytest.fixture
+def session(macro_index):
+    session = PlanSession(CALORIES, MACROS, None, macro_index)
+    session.load(PLAN)
+    return session
+
+
+def foods(session):
+    return {meal: [item["food"] for item in items] for meal, items in session.meals.items()}
+
+
+def test_load(session):
+    assert foods(session)["Lunch"] == ["GRILLED CHICKEN BREAST"]
+    assert session.plan()["within_tolerance"]
+    assert session.totals().tolist() == pytest.approx([113.6, 188.6, 22.8, 1412])
+
+
+def test_increase_macro(session):
+    change = session.apply_local("increase protein")
+    assert change == "Protein (g) target 113.6 -> 131, portions adjusted"
+    # The calorie target moves by the kcal the extra protein adds
+    assert session.calorie_intake == 1482
+    assert session.macros["Protein (g)"] == 131
+    assert session.plan()["within_tolerance"]
+    assert session.rounds == {"local": 1, "llm": 0}
+
+
+def test_targets_are_clamped(session):
+    assert session.apply_local("less fat to 5g").startswith(f"Fats (g) target 22.8 -> {MIN_MACRO_GRAMS}")
+    assert session.apply_local("fewer calories by 1000").startswith(f"Calories target 1387 -> {MIN_CALORIES}")
+    # Calories scale every macro with them
+    assert session.macros == {"Protein (g)": 98, "Carbohydrates (g)": 163, "Fats (g)": MIN_MACRO_GRAMS}
+    assert session.plan()["within_tolerance"]
+
+
+def test_no_portions_goes_to_llm(macro_index):
+    session = PlanSession(CALORIES, MACROS, None, macro_index)
+    assert session.apply_local("increase protein") is None
+    assert (session.calorie_intake, session.macros) == (CALORIES, MACROS)
+    assert session.rounds["local"] == 0
+
+
+def test_swap_meal(session):
+    before = foods(session)
+    assert session.apply_local("swap dinner") == "new dinner"
+    after = foods(session)
+    assert after["Dinner"] and "BROWN RICE" not in after["Dinner"]
+    assert {meal: after[meal] for meal in ("Breakfast", "Lunch", "Snacks")} == \
+        {meal: before[meal] for meal in ("Breakfast", "Lunch", "Snacks")}
+
+
+def test_exclude(session):
+    assert session.apply_local("no oats") == "removed oats from breakfast"
+    assert session.excluded == ["oats"]
+    assert not any("OATS" in food for items in foods(session).values() for food in items)
+    # Later re-solves keep it out too
+    session.apply_local("new lunch")
+    assert not any("OATS" in food for food in foods(session)["Lunch"])
+    # Not on the plan: left to the LLM
+    assert session.apply_local("no anchovies") is None
+
+
+def test_unknown_request(session):
+    assert session.apply_local("make it vegetarian") is None
+    assert session.rounds["local"] == 0
+
+
+def test_delta_prompt(session):
+    session.apply_local("no yogurt")
+    prompt = session.delta_prompt("make it spicy")
+    assert "User request: make it spicy (avoid: yogurt)" in prompt
+    assert "Lunch: GRILLED CHICKEN BREAST 200g" in prompt
+    foods_table = prompt[prompt.index("Foods ("):]
+    assert "SALMON FILLET|" in foods_table and "GREEK YOGURT" not in foods_table
+
+
+def test_apply_reply_meals(session):
+    changed = session.apply_reply("Dinner:\n- SALMON FILLET (150g) - 30g protein, 0g carbs, 19.5g fats, 296 kcal\n")
+    assert changed == ["Dinner"]
+    assert foods(session) == {"Breakfast": ["ROLLED OATS"], "Lunch": ["GRILLED CHICKEN BREAST"],
+                              "Dinner": ["SALMON FILLET"], "Snacks": ["GREEK YOGURT, PLAIN"]}
+    assert (session.calorie_intake, session.macros) == (CALORIES, MACROS)
+    assert session.rounds == {"local": 0, "llm": 1}
+
+
+def test_apply_reply_targets(session):
+    # New macros without meals: calories follow them and the portions are refit
+    assert session.apply_reply("Protein (g): 130\n") == []
+    assert session.macros["Protein (g)"] == 130
+    assert session.calorie_intake == round(CALORIES + (130 - 113.6) * 4)
+    assert session.plan()["within_tolerance"]
+
+    session.apply_reply("Calories: 2000\nProtein (g): 150\nCarbohydrates (g): 250\nFats (g): 44\n\n"
+                        "Water:\n08:00 - 400ml\n12:00 - 400ml\n")
+    assert (session.calorie_intake, session.macros) == \
+        (2000, {"Protein (g)": 150, "Carbohydrates (g)": 250, "Fats (g)": 44})
+    assert session.water_schedule is not None and len(session.water_schedule) == 2
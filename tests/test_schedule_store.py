@@ -0,0 +1,108 @@
+import json
+import os
+import time
+from datetime import date, datetime
+import pytest
+from schedule_store import ScheduleStore, upcoming_range, week_start
+
+# A Wednesday, and the Monday of its week
+WEDNESDAY = date(2024, 5, 15)
+MONDAY = date(2024, 5, 13)
+
+
+def entry(meal, calories=2000):
+    return {
+        "meal_plan": f"Meal Plan:\nLunch:\n- {meal} (100g) - 10g protein, 20g carbs, 5g fats, 165 kcal\n",
+        "water_schedule": ["8:00", "250.0ml", "9:00", "250.0ml"],
+        "calorie_intake": calories,
+        "macros": {"Protein (g)": 150},
+    }
+
+
+@pytest.fixture
+def legacy_path(tmp_path):
+    path = str(tmp_path / "weekly_schedule.json")
+    with open(path, "w") as f:
+        json.dump({"Monday": entry("BROWN RICE"), "Friday": entry("ROLLED OATS"), "Someday": entry("BANANA")}, f)
+    stamp = time.mktime(datetime.combine(WEDNESDAY, datetime.min.time()).timetuple()) + 12 * 3600
+    os.utime(path, (stamp, stamp))
+    return path
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ScheduleStore(path=str(tmp_path / "schedule.sqlite3"), legacy_path=str(tmp_path / "missing.json"))
+
+
+def test_dates():
+    assert week_start(WEDNESDAY) == MONDAY
+    assert upcoming_range(WEDNESDAY, history_weeks=1) == (date(2024, 5, 6), date(2024, 5, 21))
+
+
+def test_round_trip(store):
+    store.save_day(WEDNESDAY, entry("BROWN RICE"))
+    saved = store.get_day(WEDNESDAY)
+    assert saved["calorie_intake"] == 2000
+    assert saved["water_schedule"] == [[480, 60, 2, 250.0]]
+    assert saved["plan"]["meals"]["Lunch"] == [["BROWN RICE", 100, 10, 20, 5, 165]]
+    assert store.get_day(MONDAY) is None
+
+
+def test_users_and_dates_are_separate_rows(store):
+    store.save_day(WEDNESDAY, entry("BROWN RICE"))
+    store.save_day(WEDNESDAY, entry("ROLLED OATS"), user="other")
+    store.save_day(MONDAY, entry("GREEK YOGURT"))
+    # The same (user, date) is replaced
+    store.save_day(WEDNESDAY, entry("BANANA", calories=1800))
+
+    assert list(store.week(WEDNESDAY)) == [MONDAY, WEDNESDAY]
+    assert store.get_day(WEDNESDAY)["calorie_intake"] == 1800
+    assert "BANANA" in store.get_day(WEDNESDAY)["meal_plan"]
+    assert "ROLLED OATS" in store.get_day(WEDNESDAY, user="other")["meal_plan"]
+    assert list(store.range(WEDNESDAY, WEDNESDAY, user="nobody")) == []
+
+
+def test_save_days_is_atomic(store):
+    with pytest.raises(AttributeError):
+        store.save_days({MONDAY: entry("BROWN RICE"), WEDNESDAY: None})
+    assert store.week(WEDNESDAY) == {}
+
+
+def test_version_changes_on_write(store):
+    before = store.version()
+    store.save_day(WEDNESDAY, entry("BROWN RICE"))
+    assert store.version() != before
+
+
+def test_legacy_import(tmp_path, legacy_path):
+    db_path = str(tmp_path / "schedule.sqlite3")
+    store = ScheduleStore(path=db_path, legacy_path=legacy_path)
+    # Day names land in the week the file was last written in; unknown names are skipped
+    week = store.week(WEDNESDAY)
+    assert list(week) == [MONDAY, date(2024, 5, 17)]
+    assert "BROWN RICE" in week[MONDAY]["meal_plan"]
+
+
+def test_legacy_import_never_overwrites(tmp_path, legacy_path):
+    db_path = str(tmp_path / "schedule.sqlite3")
+    ScheduleStore(path=db_path, legacy_path=str(tmp_path / "missing.json")).save_day(MONDAY, entry("GREEK YOGURT"))
+
+    store = ScheduleStore(path=db_path, legacy_path=legacy_path)
+    week = store.week(WEDNESDAY)
+    assert "GREEK YOGURT" in week[MONDAY]["meal_plan"]
+    assert "ROLLED OATS" in week[date(2024, 5, 17)]["meal_plan"]
+
+
+def test_legacy_import_runs_once(tmp_path, legacy_path):
+    db_path = str(tmp_path / "schedule.sqlite3")
+    ScheduleStore(path=db_path, legacy_path=legacy_path).db
+    store = ScheduleStore(path=db_path, legacy_path=legacy_path)
+    store.save_day(date(2024, 5, 17), entry("GREEK YOGURT"))
+
+    # A later edit to the file is not replayed over the store
+    with open(legacy_path, "w") as f:
+        json.dump({"Tuesday": entry("BANANA")}, f)
+    reopened = ScheduleStore(path=db_path, legacy_path=legacy_path)
+    week = reopened.week(WEDNESDAY)
+    assert list(week) == [MONDAY, date(2024, 5, 17)]
+    assert "GREEK YOGURT" in week[date(2024, 5, 17)]["meal_plan"]
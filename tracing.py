@@ -0,0 +1,282 @@
+import atexit
+import bisect
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from functools import wraps
+from prompt_builder import estimate_tokens
+
+# --- Tracing ---
+#
+# Nested timing spans, histograms and counters for finding where a slow
+# session spends its time. Off by default; turn it on with
+#
+#   NUTRIAI_TRACE=1 python backend.py              # record in memory
+#   NUTRIAI_TRACE=trace.jsonl python backend.py    # ...and write JSON lines at exit
+#   NUTRIAI_TRACE=trace.prom python main.py        # ...or a Prometheus text dump
+#
+# or tracing.enable() from code. Spans nest through a ContextVar, so they
+# follow asyncio tasks, and a span opened on a worker thread starts a new
+# trace. Every finished span feeds a per-name latency histogram; LLM calls
+# also record latency, time to first chunk and estimated prompt/response
+# tokens.
+#
+# When tracing is off, span() returns a shared no-op object and traced()
+# functions make one attribute check before calling straight through.
+
+TRACE_ENV = "NUTRIAI_TRACE"
+MAX_SPANS = 10_000
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+METRIC_PREFIX = "nutriai_"
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self):
+        return {"buckets": list(self.buckets), "counts": list(self.counts), "count": self.count, "sum": self.sum}
+
+
+class NullSpan:
+    """What span() returns while tracing is off"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    __slots__ = ("tracer", "name", "attrs", "id", "parent", "trace", "start", "wall_start", "duration", "token")
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.duration = None
+
+    def __enter__(self):
+        parent = self.tracer.current.get()
+        self.id = next(self.tracer.ids)
+        self.parent = parent.id if parent else None
+        self.trace = parent.trace if parent else self.id
+        self.token = self.tracer.current.set(self)
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        self.tracer.current.reset(self.token)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.tracer.finish(self)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self):
+        return {
+            "type": "span", "name": self.name, "trace": self.trace, "id": self.id, "parent": self.parent,
+            "start": self.wall_start, "ms": self.duration * 1000, "attrs": self.attrs,
+        }
+
+
+class Tracer:
+    def __init__(self, enabled=False, max_spans=MAX_SPANS):
+        self.enabled = enabled
+        self.spans = deque(maxlen=max_spans)
+        self.histograms = {}
+        self.counters = {}
+        self.current = contextvars.ContextVar("nutriai_span", default=None)
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def span(self, name, **attrs):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, attrs)
+
+    def finish(self, span):
+        with self.lock:
+            self.spans.append(span)
+        self.observe("span_seconds", span.duration, LATENCY_BUCKETS, span=span.name)
+
+    def add_span(self, name, start, duration, **attrs):
+        """Record a span measured by hand (e.g. across a generator's yields) under the current span"""
+        if not self.enabled:
+            return
+        span = Span(self, name, attrs)
+        parent = self.current.get()
+        span.id = next(self.ids)
+        span.parent = parent.id if parent else None
+        span.trace = parent.trace if parent else span.id
+        span.wall_start = time.time() - (time.perf_counter() - start)
+        span.duration = duration
+        self.finish(span)
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def count(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def record_llm(self, operation, start, prompt, reply, cached, first_chunk=None, error=None):
+        """Latency, time to first chunk and estimated tokens of one LLM call"""
+        if not self.enabled:
+            return
+        seconds = time.perf_counter() - start
+        outcome = "error" if error else "cached" if cached else "ok"
+        self.count("llm_calls_total", operation=operation, outcome=outcome)
+        self.add_span(f"llm.{operation}", start, seconds, cached=cached, error=error,
+                      prompt_tokens=estimate_tokens(prompt), response_tokens=estimate_tokens(reply or ""))
+        if error:
+            return
+        self.observe("llm_latency_seconds", seconds, operation=operation, cached=str(bool(cached)).lower())
+        if first_chunk is not None:
+            self.observe("llm_first_chunk_seconds", first_chunk, operation=operation)
+        self.observe("llm_prompt_tokens", estimate_tokens(prompt), TOKEN_BUCKETS, operation=operation)
+        self.observe("llm_response_tokens", estimate_tokens(reply or ""), TOKEN_BUCKETS, operation=operation)
+
+    def reset(self):
+        with self.lock:
+            self.spans.clear()
+            self.histograms.clear()
+            self.counters.clear()
+
+    # --- Export ---
+
+    def records(self):
+        """Spans, then histogram and counter snapshots, as JSON-ready dicts"""
+        with self.lock:
+            spans = list(self.spans)
+            histograms = list(self.histograms.items())
+            counters = list(self.counters.items())
+        records = [span.to_dict() for span in spans]
+        records += [dict(type="histogram", name=name, labels=dict(labels), **histogram.snapshot())
+                    for (name, labels), histogram in histograms]
+        records += [{"type": "counter", "name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in counters]
+        return records
+
+    def export_jsonl(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(record) + "\n" for record in self.records())
+
+    def prometheus_text(self):
+        """Histograms and counters in the Prometheus text exposition format"""
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+        lines, typed = [], set()
+        for (name, labels), histogram in histograms:
+            metric = METRIC_PREFIX + name
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                cumulative += count
+                lines.append(f"{metric}_bucket{format_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{metric}_sum{format_labels(labels)} {histogram.sum:.6f}")
+            lines.append(f"{metric}_count{format_labels(labels)} {histogram.count}")
+        for (name, labels), value in counters:
+            metric = METRIC_PREFIX + name
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """Prometheus text for a .prom path, JSON lines otherwise"""
+        if path.endswith(".prom"):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(self.prometheus_text())
+        else:
+            self.export_jsonl(path)
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+_tracer = Tracer()
+
+
+def get_tracer():
+    return _tracer
+
+
+def enable(path=None):
+    """Start recording; with a path, the trace is written there at exit"""
+    _tracer.enabled = True
+    if path:
+        atexit.register(_tracer.export, path)
+
+
+def disable():
+    _tracer.enabled = False
+
+
+def span(name, **attrs):
+    if not _tracer.enabled:
+        return NULL_SPAN
+    return Span(_tracer, name, attrs)
+
+
+def traced(name=None):
+    """Decorator: run the function inside a span (the function's name by default)"""
+    def decorate(fn):
+        span_name = name or fn.__qualname__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _tracer.enabled:
+                return fn(*args, **kwargs)
+            with Span(_tracer, span_name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+_setting = os.environ.get(TRACE_ENV, "").strip()
+if _setting and _setting.lower() not in ("0", "false", "no", "off"):
+    enable(None if _setting.lower() in ("1", "true", "yes", "on") else _setting)
@@ -0,0 +1,99 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from kivy.clock import Clock
+
+# --- Background work for the Kivy screens ---
+#
+# LLM calls and plan parsing run on a small thread pool; everything that
+# touches widgets is posted back with Clock.schedule_once. Streamed chunks
+# are buffered and flushed at most once per frame, and a cancelled job
+# simply stops delivering: its worker checks job.cancelled between chunks
+# and its callbacks are dropped.
+
+WORKER_THREADS = 4
+
+
+class Job:
+    def __init__(self, on_chunk=None, on_result=None, on_error=None):
+        self.on_chunk = on_chunk
+        self.on_result = on_result
+        self.on_error = on_error
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._flush_pending = False
+        self.done = False
+        self.future = None
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def emit(self, chunk):
+        """Called from the worker thread: hand a chunk to the UI"""
+        if self.cancelled:
+            return
+        with self._lock:
+            self._buffer.append(chunk)
+            if self._flush_pending:
+                return
+            self._flush_pending = True
+        Clock.schedule_once(self._flush)
+
+    def _flush(self, dt=None):
+        with self._lock:
+            text = "".join(self._buffer)
+            self._buffer = []
+            self._flush_pending = False
+        if text and not self.cancelled and self.on_chunk:
+            self.on_chunk(text)
+
+    def _finish(self, result=None, error=None):
+        self.done = True
+        if self.cancelled:
+            return
+        self._flush()
+        if error is not None:
+            if self.on_error:
+                self.on_error(error)
+        elif self.on_result:
+            self.on_result(result)
+
+
+class UIWorkerPool:
+    def __init__(self, max_workers=WORKER_THREADS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ui-worker")
+        self.jobs = set()
+        self.lock = threading.Lock()
+
+    def submit(self, fn, on_chunk=None, on_result=None, on_error=None):
+        """Run fn(job) off the UI thread; callbacks fire on the UI thread"""
+        job = Job(on_chunk, on_result, on_error)
+
+        def run():
+            try:
+                result = fn(job)
+            except Exception as e:
+                Clock.schedule_once(lambda dt, error=e: job._finish(error=error))
+            else:
+                Clock.schedule_once(lambda dt: job._finish(result=result))
+            finally:
+                with self.lock:
+                    self.jobs.discard(job)
+
+        with self.lock:
+            self.jobs.add(job)
+        job.future = self.executor.submit(run)
+        return job
+
+    def shutdown(self, cancel=False):
+        """Stop taking work; with cancel, running jobs are told to stop at their next chunk"""
+        if cancel:
+            with self.lock:
+                jobs = list(self.jobs)
+            for job in jobs:
+                job.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,71 @@
+import asyncio
+import time
+from llm_cache import GEMINI_MODEL, get_response_cache
+from llm_transport import get_transport
+from tracing import get_tracer
+
+# --- Concurrent week planning ---
+#
+# One day-plan request per weekday, issued together through the genai async
+# client (client.aio). A semaphore caps how many are in flight and every
+# request gets its own timeout, so a full week costs roughly the latency of
+# the slowest single request instead of seven round trips back to back.
+# Response cache lookups and writes go through asyncio.to_thread so a disk
+# hit never blocks the other requests.
+
+WEEK_DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+WEEK_CONCURRENCY = 7
+DAY_TIMEOUT_SECONDS = 30.0
+
+
+async def generate_text_async(client, contents, model=GEMINI_MODEL, cache=None, transport=None):
+    """Async counterpart of llm_cache.generate_text"""
+    cache = cache or get_response_cache()
+    start = time.perf_counter()
+    # The cache may hit SQLite; keep that off the event loop
+    text = await asyncio.to_thread(cache.get, model, contents)
+    cached = text is not None
+    if text is None:
+        transport = transport or get_transport()
+        try:
+            response = await transport.acall(client.aio.models.generate_content, model=model, contents=contents)
+        except Exception as e:
+            get_tracer().record_llm("generate_async", start, contents, None, False, error=type(e).__name__)
+            raise
+        except asyncio.CancelledError:
+            # wait_for() cancels the call when its timeout expires
+            get_tracer().record_llm("generate_async", start, contents, None, False, error="timeout")
+            raise
+        text = response.text
+        await asyncio.to_thread(cache.put, model, contents, text)
+    get_tracer().record_llm("generate_async", start, contents, text, cached)
+    return text
+
+
+async def plan_day(client, day_name, prompt, semaphore, timeout, model, cache):
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            text = await asyncio.wait_for(generate_text_async(client, prompt, model, cache), timeout)
+            error = None
+        except asyncio.TimeoutError:
+            text, error = None, f"timed out after {timeout:.0f}s"
+        except Exception as e:
+            text, error = None, str(e)
+        return day_name, {"text": text, "latency": time.perf_counter() - start, "error": error}
+
+
+async def plan_week_async(client, day_prompts, concurrency=WEEK_CONCURRENCY,
+                          timeout=DAY_TIMEOUT_SECONDS, model=GEMINI_MODEL, cache=None):
+    """Run every {day_name: prompt} request concurrently; returns {day_name: result}"""
+    semaphore = asyncio.Semaphore(concurrency)
+    results = await asyncio.gather(*(
+        plan_day(client, day_name, prompt, semaphore, timeout, model, cache)
+        for day_name, prompt in day_prompts.items()
+    ))
+    return dict(results)
+
+
+def plan_week(client, day_prompts, concurrency=WEEK_CONCURRENCY, timeout=DAY_TIMEOUT_SECONDS,
+              model=GEMINI_MODEL, cache=None):
+    return asyncio.run(plan_week_async(client, day_prompts, concurrency, timeout, model, cache))